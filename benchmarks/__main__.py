@@ -0,0 +1,113 @@
+# benchmarks/__main__.py
+#
+# Whole suite as one JSON document, for tracking regressions between
+# releases and comparing against Pi-class CPU budgets.
+#
+#   python -m benchmarks --out bench.json
+#   python -m benchmarks --compare bench.json      # exit 1 on regressions
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from . import bench_hotpath, bench_payloads, bench_stats
+
+SUITES = {
+    "payloads": bench_payloads.run,
+    "stats": bench_stats.run,
+    "hotpath": bench_hotpath.run,
+}
+
+# Timed metrics by key suffix (on the leaf or any parent key); others are not compared
+_LOWER_IS_BETTER = ("_us", "_us_per_sample", "seconds")
+_HIGHER_IS_BETTER = ("msgs_per_s", "kb_per_s")
+
+
+def _git_revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def environment():
+    return {
+        "timestamp": int(time.time()),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def _leaves(tree, prefix=""):
+    for key, value in tree.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            yield from _leaves(value, path)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield path, value
+
+
+def compare(baseline, current, tolerance):
+    """Timed values that got worse than the baseline by more than `tolerance` (fraction)."""
+    base = dict(_leaves(baseline.get("results", {})))
+    regressions = []
+    for path, now in _leaves(current["results"]):
+        old = base.get(path)
+        if not old:
+            continue
+        parts = path.split(".")
+        if any(p.endswith(_LOWER_IS_BETTER) for p in parts):
+            change = now / old - 1.0
+        elif any(p.endswith(_HIGHER_IS_BETTER) for p in parts):
+            change = old / now - 1.0 if now else float("inf")
+        else:
+            continue
+        if change > tolerance:
+            regressions.append({"metric": path, "baseline": old, "current": now,
+                                "worse_by": round(change, 3)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the SensorBox benchmark suite")
+    parser.add_argument("suites", nargs="*", help=f"suites to run (default: all of {', '.join(SUITES)})")
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="allowed slowdown vs. baseline before it counts as a regression")
+    args = parser.parse_args()
+    unknown = [name for name in args.suites if name not in SUITES]
+    if unknown:
+        parser.error(f"unknown suite(s): {', '.join(unknown)}")
+
+    report = {"environment": environment(), "results": {}}
+    for name in args.suites or SUITES:
+        report["results"][name] = SUITES[name]()
+
+    exit_code = 0
+    if args.compare:
+        with open(args.compare, "r") as f:
+            report["regressions"] = compare(json.load(f), report, args.tolerance)
+        exit_code = 1 if report["regressions"] else 0
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
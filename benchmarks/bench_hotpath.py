@@ -0,0 +1,168 @@
+# benchmarks/bench_hotpath.py
+#
+# Per-stage cost of the sensor -> broker path, plus end-to-end drain
+# throughput against the in-process loopback broker (or a real broker
+# with --broker host:port).
+# Run from the repo root:  python -m benchmarks.bench_hotpath
+
+import contextlib
+import json
+import os
+import random
+import sys
+import time
+import timeit
+from collections import deque
+
+from config import DEFAULTS
+from network import LoopbackClient, attach_callbacks, flush_buffer
+from sensors.simulated import SimulatedBME680Sensor, SimulatedVEML7700Sensor, SimulatedSoundSensor
+from utils import metrics
+from utils.clock import get_clock
+from utils.payload_builder import (
+    build_bme_payload,
+    build_veml_payload,
+    build_sound_payload,
+)
+from utils.payload_compiler import PayloadCompiler
+from utils.stats_manager import init_stats, update_stats, finalize_stats, StatsAccumulator
+
+from .bench_payloads import NODE, IDS, IP, MAC, BME, AQ_SCORES, AQ_LABELS, LUX, DB
+
+BME_KEYS = ["temperature", "humidity", "pressure", "gas"]
+TOPIC = "bench/data"
+
+
+def best_us(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+@contextlib.contextmanager
+def quiet():
+    """Keep flush_buffer's rate-limited progress lines and setup_mqtt's output out of the timings."""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def stage_costs(number=2000):
+    """Microseconds per call of each stage, best of 5."""
+    sim = {"seed": 1}
+    rng = random.Random(1)
+    bme = SimulatedBME680Sensor(sim, rng)
+    veml = SimulatedVEML7700Sensor(sim, rng)
+    sound = SimulatedSoundSensor(sim, rng)
+    sample = bme.read()
+
+    stats = init_stats(BME_KEYS)
+    for _ in range(50):
+        update_stats(stats, bme.read())
+    acc = StatsAccumulator(BME_KEYS)
+    for _ in range(50):
+        acc.update(bme.read())
+
+    compiler = PayloadCompiler(NODE, IDS)
+    document = json.loads(build_bme_payload(NODE, BME, IP, MAC, AQ_SCORES, AQ_LABELS, IDS))
+
+    stages = {
+        "read_bme_sim": lambda: bme.read(),
+        "read_veml_sim": lambda: veml.read(),
+        "read_sound_sim": lambda: sound.read(),
+        "update_stats": lambda: update_stats(stats, sample),
+        "accumulator_update": lambda: acc.update(sample),
+        "finalize_stats": lambda: finalize_stats(stats),
+        "accumulator_finalize": lambda: acc.finalize(),
+        "build_bme_payload": lambda: build_bme_payload(NODE, BME, IP, MAC, AQ_SCORES, AQ_LABELS, IDS),
+        "build_veml_payload": lambda: build_veml_payload(NODE, LUX, IP, MAC, IDS),
+        "build_sound_payload": lambda: build_sound_payload(NODE, DB, IP, MAC, IDS),
+        "compiled_bme": lambda: compiler.bme(BME, IP, MAC, AQ_SCORES, AQ_LABELS),
+        "json_dumps_bme": lambda: json.dumps(document),
+        "metrics_observe": lambda: metrics.observe("bench", 1.2e-4),
+    }
+    return {name: round(best_us(fn, number), 3) for name, fn in stages.items()}
+
+
+def _loopback():
+    """In-process broker with the node's callbacks, so PUBACKs reach the window."""
+    client = LoopbackClient({}, clock=get_clock())
+    attach_callbacks(client, {})
+    return client
+
+
+def flush_cost(number=2000, window=None):
+    """Microseconds per flush_buffer call that publishes one buffered message."""
+    client = _loopback()
+    message = build_sound_payload(NODE, DB, IP, MAC, IDS)
+    buffer = deque()
+
+    def one():
+        buffer.append(message)
+        flush_buffer(client, buffer, TOPIC, window=window)
+
+    with quiet():
+        us = best_us(one, number)
+        flush_buffer(client, buffer, TOPIC, window=window)   # reap the last acks
+    return round(us, 3)
+
+
+def _broker_client(spec):
+    """paho client on host:port (plain TCP, no auth) for --broker runs."""
+    from network import setup_mqtt
+
+    host, _, port = spec.partition(":")
+    config = {"mqtt": {"use_tls": False}}
+    with quiet():
+        client = setup_mqtt(host, int(port or 1883), config=config, enable_debug_log=False)
+    deadline = time.monotonic() + 10
+    while not client.is_connected():
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"could not connect to broker {spec}")
+        time.sleep(0.05)
+    return client
+
+
+def drain_throughput(messages=5000, window=None, batch_bytes=None, broker=None):
+    """Messages/s for draining a full backlog into the broker."""
+    client = _broker_client(broker) if broker else _loopback()
+    payloads = PayloadCompiler(NODE, IDS)
+    buffer = deque(payloads.sound(DB, IP, MAC) for _ in range(messages))
+    sent = sum(len(m) for m in buffer)
+
+    t0 = time.perf_counter()
+    with quiet():
+        while buffer:
+            before = len(buffer)
+            flush_buffer(client, buffer, TOPIC, window=window, batch_bytes=batch_bytes)
+            if window and len(buffer) == before:
+                time.sleep(0.001)        # real broker: wait for PUBACKs
+    elapsed = time.perf_counter() - t0
+    if broker:
+        client.loop_stop()
+        client.disconnect()
+    return {
+        "messages": messages,
+        "seconds": round(elapsed, 4),
+        "msgs_per_s": round(messages / elapsed, 1),
+        "payload_kb_per_s": round(sent / 1024 / elapsed, 1),
+    }
+
+
+def run(number=2000, messages=5000, broker=None):
+    batch = DEFAULTS["buffer"]["batch_max_bytes"] or 4096
+    return {
+        "stages_us": stage_costs(number),
+        "flush_buffer_us": {
+            "single": flush_cost(number),
+            "windowed": flush_cost(number, window=20),
+        },
+        "drain": {
+            "single": drain_throughput(messages, broker=broker),
+            "windowed": drain_throughput(messages, window=20, broker=broker),
+            "windowed_batched": drain_throughput(messages, window=20, batch_bytes=batch, broker=broker),
+        },
+        "broker": broker or "loopback",
+    }
+
+
+if __name__ == "__main__":
+    broker = sys.argv[sys.argv.index("--broker") + 1] if "--broker" in sys.argv else None
+    print(json.dumps(run(broker=broker), indent=2))
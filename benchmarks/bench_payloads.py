@@ -0,0 +1,69 @@
+# benchmarks/bench_payloads.py
+#
+# Microbenchmark: payload_builder functions vs. precompiled templates.
+# Run from the repo root:  python -m benchmarks.bench_payloads
+
+import timeit
+
+from config import DEFAULTS
+from utils.payload_builder import (
+    build_bme_payload,
+    build_veml_payload,
+    build_sound_payload,
+    build_IPMAC_payload,
+    build_IamAlive_payload,
+)
+from utils.payload_compiler import PayloadCompiler
+
+NODE = "node1"
+IDS = DEFAULTS["sensorIds"]
+IP, MAC = "192.168.1.23", "b8:27:eb:12:34:56"
+
+BME = {
+    "temperature": {"avg": 22.41, "min": 21.9, "max": 23.05},
+    "humidity":    {"avg": 41.2, "min": 40.01, "max": 43.77},
+    "pressure":    {"avg": 1012.35, "min": 1012.1, "max": 1012.6},
+    "gas":         {"avg": 48211.5, "min": 45002.0, "max": 51234.25},
+}
+AQ_SCORES = {"avg": 66.99, "min": 61.41, "max": 72.34}
+AQ_LABELS = {"avg": "Fair", "min": "Fair", "max": "Fair"}
+LUX = {"lux": {"avg": 312.4, "min": 300.0, "max": 330.12}}
+DB = {"dB": {"avg": 48.3, "min": 41.0, "max": 66.78}}
+
+
+def cases(compiler):
+    return {
+        "bme": (lambda: build_bme_payload(NODE, BME, IP, MAC, AQ_SCORES, AQ_LABELS, IDS),
+                lambda: compiler.bme(BME, IP, MAC, AQ_SCORES, AQ_LABELS)),
+        "veml": (lambda: build_veml_payload(NODE, LUX, IP, MAC, IDS),
+                 lambda: compiler.veml(LUX, IP, MAC)),
+        "sound": (lambda: build_sound_payload(NODE, DB, IP, MAC, IDS),
+                  lambda: compiler.sound(DB, IP, MAC)),
+        "ipmac": (lambda: build_IPMAC_payload(NODE, IP, MAC, IDS),
+                  lambda: compiler.ipmac(IP, MAC)),
+        "alive": (lambda: build_IamAlive_payload(NODE, IDS),
+                  lambda: compiler.alive()),
+    }
+
+
+def best_us(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def run(number=2000):
+    compiler = PayloadCompiler(NODE, IDS)
+    results = {}
+    for name, (builder, compiled) in cases(compiler).items():
+        # Output must match byte for byte (timestamps may tick between calls)
+        a, b = builder(), compiled()
+        if a != b and builder() != compiled():
+            raise AssertionError(f"{name}: compiled payload differs from builder output")
+        old, new = best_us(builder, number), best_us(compiled, number)
+        results[name] = {"builder_us": round(old, 2), "compiled_us": round(new, 2),
+                         "speedup": round(old / new, 2)}
+    return results
+
+
+if __name__ == "__main__":
+    for name, r in run().items():
+        print(f"{name:6s} builder {r['builder_us']:7.2f}us  compiled {r['compiled_us']:7.2f}us  x{r['speedup']}")
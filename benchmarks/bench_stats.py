@@ -0,0 +1,69 @@
+# benchmarks/bench_stats.py
+#
+# Microbenchmark: dict-based init/update/finalize_stats vs. StatsAccumulator.
+# Run from the repo root:  python -m benchmarks.bench_stats
+
+import random
+import timeit
+
+from utils.stats_manager import init_stats, update_stats, finalize_stats, StatsAccumulator
+
+BME_KEYS = ["temperature", "humidity", "pressure", "gas"]
+WINDOW = 200    # samples per window
+
+
+def _samples(n):
+    rnd = random.Random(42)
+    return [
+        {"temperature": rnd.gauss(22, 0.5), "humidity": rnd.gauss(40, 2),
+         "pressure": rnd.gauss(1012, 0.3), "gas": rnd.gauss(48000, 900), "altitude": 30.0}
+        for _ in range(n)
+    ]
+
+
+def run(number=50):
+    samples = _samples(WINDOW)
+    db = [s["gas"] for s in samples]
+
+    def dict_window():
+        stats = init_stats(BME_KEYS)
+        for s in samples:
+            update_stats(stats, s)
+        return finalize_stats(stats)
+
+    acc = StatsAccumulator(BME_KEYS)
+
+    def slotted_window():
+        acc.reset()
+        for s in samples:
+            acc.update(s)
+        return acc.finalize()
+
+    def dict_batch():
+        stats = init_stats(["dB"])
+        for v in db:
+            update_stats(stats, {"dB": v})
+        return finalize_stats(stats)
+
+    acc_db = StatsAccumulator(["dB"])
+
+    def slotted_batch():
+        acc_db.reset()
+        acc_db.update_many("dB", db)
+        return acc_db.finalize()
+
+    results = {}
+    for name, old, new in (("window_update", dict_window, slotted_window),
+                           ("batch_update_many", dict_batch, slotted_batch)):
+        t_old = min(timeit.repeat(old, number=number, repeat=5)) / number / WINDOW * 1e6
+        t_new = min(timeit.repeat(new, number=number, repeat=5)) / number / WINDOW * 1e6
+        results[name] = {"dict_us_per_sample": round(t_old, 3),
+                         "slotted_us_per_sample": round(t_new, 3),
+                         "speedup": round(t_old / t_new, 2)}
+    return results
+
+
+if __name__ == "__main__":
+    for name, r in run().items():
+        print(f"{name:18s} dict {r['dict_us_per_sample']:6.3f}us/sample  "
+              f"slotted {r['slotted_us_per_sample']:6.3f}us/sample  x{r['speedup']}")
@@ -5,7 +5,9 @@ DEFAULTS = {
         "VEML7700": 10,
         "SOUND": 6,
         "IP_REFRESH": 300,
-        "IamAlive": 3600
+        "IamAlive": 3600,
+        "FLUSH": 1.0,         # uplink retry period; new data, reconnects and PUBACKs wake it early
+        "CONFIG_WATCH": 5.0   # how often config.json is checked for edits (hot-applied, no reboot)
     },
     "mqtt": {
         "host": "0.0.0.0",
@@ -16,17 +18,168 @@ DEFAULTS = {
         "password": "",          # <-- set if your broker requires auth
         "use_tls": True,         # optional
         "ca_cert": "",           # optional: path to CA file (e.g., "/etc/ssl/certs/ca-certificates.crt")
+        "client_cert": "",       # optional: client certificate for mutual TLS
+        "client_key": "",        # optional: private key of client_cert
         "insecure_tls": False    # optional: allow self-signed (not recommended for production)
     },
     "device": {
         "nodeId": "node1"
     },
     "buffer": {
-        "maxlen": 1000
+        "maxlen": 1000,
+        "drain_mode": "single",   # "single" (one publish per loop) or "windowed" (ack-driven)
+        "inflight_window": 20,    # max QoS1 messages awaiting PUBACK in windowed mode
+        "backend": "memory",      # "memory" (deque, lost on reboot) or "sqlite" (crash-safe disk queue)
+        "path": "",               # sqlite file; empty -> uplink_queue.db next to config.json
+        "max_bytes": 8388608,     # sqlite backend: evict oldest beyond this many payload bytes
+        "commit_every": 50,       # sqlite backend: group-commit after this many changes ...
+        "commit_interval": 5.0,   # ... or after this many seconds
+        "batch_max_bytes": 0,     # >0: coalesce queued SensorData messages into one publish up to this size
+        "batch_linger": 2.0,      # seconds a partial batch may wait for more messages
+        "compact_factor": 10,     # near the cap, merge this many queued windows of a sensor into one (0 = evict oldest)
+        "compact_at": 0.9,        # fill (of maxlen / max_bytes) that starts a compaction ...
+        "compact_to": 0.6,        # ... which merges the oldest windows until the fill is below this
+        "drain_policy": "fifo",   # send order: "fifo", "freshest" (live data first, then backfill) or "aoi"
+        "live_age": 120,          # freshest: messages younger than this (s) count as live
+        "aoi_scan": 64            # aoi: newest messages searched for each stream's freshest reading
     }
 }
 
 
+# Per-sensor sampling periods (seconds between reads), independent of the
+# publish windows in "intervals"
+DEFAULTS["sampling"] = {
+    "BME680": 3.0,       # gas measurement needs heater time; faster adds nothing
+    "VEML7700": 1.0,
+    "SOUND": 0.05        # 20 Hz
+}
+
+# BME680 measurement settings (one forced-mode cycle per read)
+DEFAULTS["bme680"] = {
+    "temperature_oversample": 8,
+    "humidity_oversample": 2,
+    "pressure_oversample": 4,
+    "filter_size": 3,
+    "heater_temperature": 320,   # °C
+    "heater_duration": 150,      # ms
+    "include_altitude": False    # altitude is derived from pressure and not published
+}
+
+# Sound burst mode: ADS1115 in continuous conversion; each SOUND sample is a
+# burst of `burst_samples` readings at `sps`, and the window publishes Leq
+# (energy average) as avg, Lmin/Lmax as min/max, and exceedance levels
+# through the SOUND percentiles (p90 == L10). Turns on threaded acquisition.
+DEFAULTS["sound"] = {
+    "burst": False,
+    "sps": 250,              # ADS1115 data rate: 8, 16, 32, 64, 128, 250, 475 or 860
+    "burst_samples": 125     # readings per burst (0.5 s at 250 SPS)
+}
+
+# Acquisition: "threaded" runs each sensor in its own worker thread; the
+# shared I2C bus is then arbitrated per transaction (sensors/acquisition.py)
+DEFAULTS["acquisition"] = {
+    "threaded": False,
+    "ring_size": 512,            # per-sensor sample ring (grown to hold two publish windows)
+    "report_interval": 300       # seconds between sampling jitter/latency reports (0 = off)
+}
+
+# Streaming percentiles (P² estimator, constant memory) per channel, e.g. [10, 50, 90].
+# Each percentile is published for every key of the channel whose "<prefix>_pNN"
+# slot in sensorIds is non-empty (e.g. "sound_p90").
+DEFAULTS["quantiles"] = {
+    "BME680": [],
+    "VEML7700": [],
+    "SOUND": [10, 50, 90]
+}
+
+# Simulated sensors (sensors/simulated.py) for load tests without hardware.
+# The SENSORBOX_SIMULATE=1 environment variable overrides "enabled".
+DEFAULTS["simulation"] = {
+    "enabled": False,
+    "seed": None,                                               # fixed seed -> reproducible runs
+    "latency": {"BME680": 0.0, "VEML7700": 0.0, "SOUND": 0.0},  # seconds added to each read
+    "fault_rate": {"BME680": 0.0, "VEML7700": 0.0, "SOUND": 0.0},  # probability a read raises
+    "traces": {"BME680": "", "VEML7700": "", "SOUND": ""}       # CSV/JSONL to replay instead of signals
+}
+
+# Uplink payload encoding: "json" (default) or "compact" (binary, see utils/compact_codec.py)
+DEFAULTS["payload"] = {
+    "encoding": "json",
+    "compress": False,       # compact only: zlib the body when it gets smaller
+    "decimals": 2,           # compact only: values are rounded to this many decimals
+    "report_stats": False    # print encoded size and encode time per message
+}
+
+# Report-by-exception: a publish window is held back unless one of its avg/min/max
+# moved by at least the key's threshold since the last sent window; after
+# max_silence seconds the next window is sent anyway. Empty thresholds = always publish.
+# Example: "BME680": {"thresholds": {"temperature": 0.2, "humidity": 1.0, "pressure": 0.5, "gas": 2000}}
+DEFAULTS["deadband"] = {
+    "BME680":   {"thresholds": {}, "max_silence": 900},
+    "VEML7700": {"thresholds": {}, "max_silence": 900},
+    "SOUND":    {"thresholds": {}, "max_silence": 900}
+}
+
+# Adaptive periods: after each publish window the channel's activity
+# (max over keys of max(std, change of avg) / ref) stretches the publish and
+# sampling periods by "grow" when below "low" and shrinks them by "shrink"
+# when above "high", within each [min, max] bound. "refs" are the per-key
+# changes that count as "something is happening".
+DEFAULTS["adaptive"] = {
+    "enabled": False,
+    "low": 0.25,
+    "high": 1.0,
+    "grow": 1.5,
+    "shrink": 0.5,
+    "BME680": {
+        "refs": {"temperature": 0.1, "humidity": 0.5, "pressure": 0.1, "gas": 1000.0},
+        "publish": [45, 300],
+        "sampling": [3.0, 15.0]
+    },
+    "VEML7700": {"refs": {"lux": 10.0}, "publish": [10, 120], "sampling": [1.0, 10.0]},
+    "SOUND": {"refs": {"dB": 6.0}, "publish": [6, 60], "sampling": [0.05, 0.5]}   # dB varies a lot within any window
+}
+
+# Backfill: after an outage, messages older than min_age are replayed oldest
+# first on their own topic, packed into zlib-compressed batches (utils/backfill.py),
+# while the primary topic keeps carrying live data. One batch is in flight at
+# a time and batches start at most every "interval" seconds, which caps the rate.
+DEFAULTS["backfill"] = {
+    "enabled": False,
+    "topic": "",               # empty -> "<mqtt.topic>/backfill"
+    "qos": 1,
+    "min_age": 120,            # seconds; older messages are historical
+    "batch_max_bytes": 65536,  # uncompressed payload bytes per batch
+    "interval": 2.0,           # seconds between batches
+    "level": 6                 # zlib compression level
+}
+
+# Message numbering (utils/sequence.py): every SensorData message carries the
+# boot epoch (a counter bumped and persisted on each start) and a per-epoch
+# sequence number, so ingestion can drop duplicates and detect gaps
+DEFAULTS["sequence"] = {
+    "enabled": True,
+    "path": ""                 # boot epoch file; empty -> boot_epoch next to config.json
+}
+
+# Node self-metrics: per-stage latency histograms (read, stats, build, enqueue,
+# publish, ack, MQTT callback) and counters, sent as a "NodeMetrics" message next to IamAlive
+DEFAULTS["metrics"] = {
+    "interval": 300,         # seconds between NodeMetrics messages (0 = off)
+    "topic": "",             # empty -> "<nodeId>/metrics"
+    "qos": 0
+}
+
+# Logging (utils/log.py): records below "level" or over the per-key rate limit
+# are kept in a ring that is printed on the next ERROR or on demand
+DEFAULTS["logging"] = {
+    "level": "INFO",          # DEBUG, INFO, WARNING or ERROR
+    "rate_limit": 10.0,       # min seconds between lines with the same key
+    "rate_limits": {"uplink.sent": 60.0},   # per-key overrides
+    "ring_size": 200,
+    "paho_debug": False       # paho's own DEBUG logging (very chatty)
+}
+
 # Per-sensor measurement offsets 
 DEFAULTS["offsets"] = {
     "BME680": {
@@ -87,8 +240,31 @@ DEFAULTS["sensorIds"] = {
     "sound_min": "60a6932f-25ac-4702-ba19-a461eccd8557",
     "sound_max": "bb3f059d-130b-41d4-94d8-e8c951350e83",
 
+    # Sound percentiles (see DEFAULTS["quantiles"]); empty = not provisioned, not sent
+    "sound_p10": "",
+    "sound_p50": "",
+    "sound_p90": "",
+
     # System messages
     "ip_msg":   "62fca2aa205c550094bca93f",
     "mac_msg":  "63089b5b205c5513f43719c6",
-    "alive_msg": "ebfaf8fc-f984-4abf-8e69-5fbf97923939"
+    "alive_msg": "ebfaf8fc-f984-4abf-8e69-5fbf97923939",
+
+    # BME680 / VEML7700 percentiles (see DEFAULTS["quantiles"]); kept last so the
+    # compact codec's dictionary codes of the slots above do not move
+    "temp_p10": "",
+    "temp_p50": "",
+    "temp_p90": "",
+    "hum_p10": "",
+    "hum_p50": "",
+    "hum_p90": "",
+    "press_p10": "",
+    "press_p50": "",
+    "press_p90": "",
+    "gas_p10": "",
+    "gas_p50": "",
+    "gas_p90": "",
+    "lux_p10": "",
+    "lux_p50": "",
+    "lux_p90": ""
 }
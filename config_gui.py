@@ -2,6 +2,7 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from utils import load_config, save_config
+from utils.config_runtime import diff_config, needs_reboot
 
 def f2float(s, default=0.0):
     try:
@@ -30,6 +31,12 @@ def save_changes():
     config["intervals"]["IP_REFRESH"] = f2float(entry_iprefresh.get(), 300)
     config["intervals"]["IamAlive"]   = f2float(entry_iamalive.get(), 3600)
 
+    # ---- Sampling periods ----
+    cfg_sampling = config.setdefault("sampling", {})
+    cfg_sampling["BME680"]   = f2float(entry_smp_bme.get(), 3.0)
+    cfg_sampling["VEML7700"] = f2float(entry_smp_veml.get(), 1.0)
+    cfg_sampling["SOUND"]    = f2float(entry_smp_sound.get(), 0.05)
+
     # ---- MQTT core ----
     config["mqtt"]["host"]         = entry_host.get().strip()
     config["mqtt"]["port"]         = int(f2float(entry_port.get(), 1883))
@@ -81,15 +88,28 @@ def save_changes():
     cfg_sensor["sound_avg"]      = entries_sensor["sound_avg"].get().strip()
     cfg_sensor["sound_min"]      = entries_sensor["sound_min"].get().strip()
     cfg_sensor["sound_max"]      = entries_sensor["sound_max"].get().strip()
+    cfg_sensor["sound_p10"]      = entries_sensor["sound_p10"].get().strip()
+    cfg_sensor["sound_p50"]      = entries_sensor["sound_p50"].get().strip()
+    cfg_sensor["sound_p90"]      = entries_sensor["sound_p90"].get().strip()
 
     cfg_sensor["ip_msg"]         = entries_sensor["ip_msg"].get().strip()
     cfg_sensor["mac_msg"]        = entries_sensor["mac_msg"].get().strip()
     cfg_sensor["alive_msg"]      = entries_sensor["alive_msg"].get().strip()
 
-    save_config(config, reboot=True)
+    # Only reboot for settings the running node reads once at startup; the rest
+    # (intervals, offsets, sensor IDs, credentials...) it picks up from config.json
+    changed = diff_config(load_config(), config)
+    reboot = bool(needs_reboot(changed))
+    save_config(config, reboot=reboot)
+    if reboot:
+        note = "The system will reboot."
+    elif changed:
+        note = "Changes are applied by the running node within a few seconds."
+    else:
+        note = "Nothing changed."
     messagebox.showinfo(
         "Config Saved",
-        "Configuration updated successfully!\nThe system will reboot."
+        f"Configuration updated successfully!\n{note}"
     )
 
 def toggle_password():
@@ -133,6 +153,9 @@ sensorIds_cfg = config.setdefault("sensorIds", {
     "sound_avg": "",
     "sound_min": "",
     "sound_max": "",
+    "sound_p10": "",
+    "sound_p50": "",
+    "sound_p90": "",
     "ip_msg": "",
     "mac_msg": "",
     "alive_msg": ""
@@ -335,6 +358,28 @@ entry_iamalive.grid(row=1, column=3, padx=6, pady=3, sticky="we")
 for c in (1, 3, 5):
     frame_int.grid_columnconfigure(c, weight=1)
 
+# Sampling periods
+frame_smp = ttk.LabelFrame(left_col, text="Sampling (seconds between reads)")
+frame_smp.pack(fill="x", expand=True, pady=6)
+
+ttk.Label(frame_smp, text="BME680").grid(row=0, column=0, sticky="w")
+entry_smp_bme = ttk.Entry(frame_smp, width=8)
+entry_smp_bme.insert(0, config.get("sampling", {}).get("BME680", 3.0))
+entry_smp_bme.grid(row=0, column=1, padx=6, pady=3, sticky="we")
+
+ttk.Label(frame_smp, text="VEML7700").grid(row=0, column=2, sticky="w")
+entry_smp_veml = ttk.Entry(frame_smp, width=8)
+entry_smp_veml.insert(0, config.get("sampling", {}).get("VEML7700", 1.0))
+entry_smp_veml.grid(row=0, column=3, padx=6, pady=3, sticky="we")
+
+ttk.Label(frame_smp, text="SOUND").grid(row=0, column=4, sticky="w")
+entry_smp_sound = ttk.Entry(frame_smp, width=8)
+entry_smp_sound.insert(0, config.get("sampling", {}).get("SOUND", 0.05))
+entry_smp_sound.grid(row=0, column=5, padx=6, pady=3, sticky="we")
+
+for c in (1, 3, 5):
+    frame_smp.grid_columnconfigure(c, weight=1)
+
 # Save button
 save_bar = ttk.Frame(left_col)
 save_bar.pack(fill="x", expand=True, pady=(10, 20))
@@ -384,6 +429,9 @@ for label, key in [
     ("Sound avg", "sound_avg"),
     ("Sound min", "sound_min"),
     ("Sound max", "sound_max"),
+    ("Sound p10", "sound_p10"),
+    ("Sound p50", "sound_p50"),
+    ("Sound p90", "sound_p90"),
     ("IP msg", "ip_msg"),
     ("MAC msg", "mac_msg"),
     ("Alive msg", "alive_msg"),
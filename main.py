@@ -1,51 +1,99 @@
 #!/usr/bin/env python3
-import time
-import board
-import busio
-from collections import deque
+import json
+from time import perf_counter
 
-from sensors import BME680Sensor, VEML7700Sensor, SoundSensor
-from network import setup_mqtt, flush_buffer, start_watchdog   # <<-- UPDATED
+from sensors import create_sensors, JitterStats, AcquisitionWorker
+from network import (
+    setup_mqtt,
+    attach_callbacks,
+    flush_buffer,
+    start_watchdog,
+    set_wakeup,
+    set_config_handler,
+    request_reboot,
+    apply_credentials,
+    inflight_ids,
+    set_drain_policy,
+    get_drain_policy,
+    create_policy,
+    flush_backfill,
+)
 from utils import (
     get_ip_address,
     get_mac_address,
     gas_to_air_quality_fixed,
     air_quality_label,
     load_config,
-    init_stats,
-    update_stats,
-    finalize_stats,
-)
-from utils.payload_builder import (
-    build_bme_payload,
-    build_veml_payload,
-    build_sound_payload,
-    build_IPMAC_payload,
-    build_IamAlive_payload,
+    StatsAccumulator,
+    create_buffer,
+    BacklogCompactor,
 )
+from utils import log, metrics
+from utils.clock import get_clock
+from utils.config_runtime import ConfigRuntime
+from utils.deadband import Deadband
+from utils.adaptive import AdaptiveInterval
+from utils.scheduler import Scheduler
+from utils.acoustics import NoiseWindow
+from utils.payload_builder import configure_encoding, get_utc_timestamp
+from utils.payload_compiler import PayloadCompiler
+from utils.sequence import configure_sequence
 
-def main():
+def main(config=None, client=None, run_for=None, probe=None):
+    """
+    Run the node. Soak runs (see soak.py) pass their own config and client,
+    install a virtual clock first and stop after `run_for` clock seconds;
+    `probe(scheduler, buffer)` is called once before the loop starts.
+    """
     # Load runtime configuration (merged with DEFAULTS in config.py)
-    config = load_config()
+    if config is None:
+        config = load_config()
+    clock = get_clock()
+    log.configure(config.get("logging", {}))
 
     # Grab sensorIds from config (these are now editable via GUI and stored in config["sensorIds"])
     sensorIds = config.get("sensorIds", {})
 
-    # Init I2C & sensors
-    i2c = busio.I2C(board.SCL, board.SDA)
-    bme = BME680Sensor(i2c)
-    veml = VEML7700Sensor(i2c)
-    sound = SoundSensor(i2c)
+    # Wire encoding for SensorData messages (JSON unless config["payload"] says otherwise)
+    configure_encoding(config.get("payload", {}), sensorIds)
+    # Boot epoch + per-message sequence numbers (config["sequence"])
+    configure_sequence(config.get("sequence", {}))
+
+    # Init I2C & sensors (threaded acquisition shares the bus through an arbiter;
+    # simulated sensors when config["simulation"] or SENSORBOX_SIMULATE says so)
+    acq_cfg = config.get("acquisition", {})
+    threaded = bool(acq_cfg.get("threaded", False))
+    if config.get("sound", {}).get("burst") and not threaded and client is None:
+        # A burst blocks for burst_samples/sps; on the scheduler thread it would
+        # hold back publish, flush and watchdog every cycle
+        log.warning("acq.burst", "sound.burst needs threaded acquisition; enabling it")
+        threaded = True
+    i2c, bme, veml, sound = create_sensors(config, threaded=threaded)
+
+    # MQTT setup (an injected client only gets our callbacks)
+    injected_client = client is not None
+    if injected_client:
+        attach_callbacks(client, config)
+    else:
+        mqtt_host = config["mqtt"]["host"]
+        mqtt_port = config["mqtt"]["port"]
+        client = setup_mqtt(mqtt_host, mqtt_port, config=config)
 
-    # MQTT setup
-    mqtt_host = config["mqtt"]["host"]
-    mqtt_port = config["mqtt"]["port"]
-    client = setup_mqtt(mqtt_host, mqtt_port, config=config)
+    # Uplink buffer: in-memory deque or crash-safe disk queue (config["buffer"]["backend"])
+    buffer = create_buffer(config["buffer"])
+    buffer_commit = getattr(buffer, "maybe_commit", None)
 
-    # --- NEW: start watchdog thread (topic == nodeId) ---
-    start_watchdog(client, config)
+    # Drain mode: "windowed" keeps several QoS1 messages in flight until PUBACK
+    drain_window = None
+    if config["buffer"].get("drain_mode") == "windowed":
+        drain_window = int(config["buffer"].get("inflight_window", 20))
 
-    buffer = deque(maxlen=int(config["buffer"]["maxlen"]))
+    # Send order of the backlog: FIFO, freshest-first or AoI-greedy (config["buffer"]["drain_policy"])
+    set_drain_policy(create_policy(config["buffer"]))
+
+    # Coalescing: merge queued SensorData messages into one publish (0 = off)
+    batch_bytes = int(config["buffer"].get("batch_max_bytes", 0)) or None
+    batch_linger = float(config["buffer"].get("batch_linger", 2.0))
 
     # Device identity
     myMac = get_mac_address()
@@ -53,145 +101,478 @@ def main():
     prev_ip = ip  # track last known IP to detect changes
     print(f"MAC: {myMac}, Initial IP: {ip}")
 
-    # Send initial IP + MAC immediately
-    buffer.append(build_IPMAC_payload(config["device"]["nodeId"], ip, myMac, sensorIds))
+    nodeId = config["device"]["nodeId"]
+    MQTT_TOPIC = config["mqtt"]["topic"]
 
-    # Initialize timers (monotonic timestamps)
-    last_bme = 0
-    last_veml = 0
-    last_sound = 0
-    last_ip_refresh = 0
-    last_IamAlive = 0
+    # Intervals are parsed once; the scheduler sleeps until the next deadline
+    intervals = config["intervals"]
+    BME680_INTERVAL      = float(intervals.get("BME680", 45))
+    VEML7700_INTERVAL    = float(intervals.get("VEML7700", 10))
+    SOUND_INTERVAL       = float(intervals.get("SOUND", 6))
+    IP_REFRESH_INTERVAL  = float(intervals.get("IP_REFRESH", 300))
+    IAMALIVE_INTERVAL    = float(intervals.get("IamAlive", 3600))
+    FLUSH_INTERVAL       = float(intervals.get("FLUSH", 1.0))
+    CONFIG_WATCH_INTERVAL = float(intervals.get("CONFIG_WATCH", 5.0))
 
-    # Rolling stats accumulators for avg/min/max per channel
-    stats_bme = init_stats(["temperature", "humidity", "pressure", "gas"])
-    stats_veml = init_stats(["lux"])
-    stats_sound = init_stats(["dB"])
+    # Sampling periods, per sensor and independent of the publish intervals
+    sampling = config.get("sampling", {})
+    BME680_SAMPLE        = float(sampling.get("BME680", 3.0))
+    VEML7700_SAMPLE      = float(sampling.get("VEML7700", 1.0))
+    SOUND_SAMPLE         = float(sampling.get("SOUND", 0.05))
 
-    print("Starting sensor loop with avg/min/max statistics...")
+    # Per-sensor offsets
+    offsets = config.get("offsets", {})
+    bme_off   = offsets.get("BME680", {})
+    veml_off  = offsets.get("VEML7700", {})
+    sound_off = offsets.get("SOUND", {})
+
+    # Optional streaming percentiles per channel
+    quantiles = config.get("quantiles", {})
+    bme_q   = quantiles.get("BME680", [])
+    veml_q  = quantiles.get("VEML7700", [])
+    sound_q = quantiles.get("SOUND", [])
 
-    while True:
-        now = time.monotonic()
+    # Rolling stats accumulators for avg/min/max per channel (reset in place per window)
+    stats_bme = StatsAccumulator(["temperature", "humidity", "pressure", "gas"], bme_q)
+    stats_veml = StatsAccumulator(["lux"], veml_q)
+    stats_sound = StatsAccumulator(["dB"], sound_q)
 
-        # Read current intervals from config
-        intervals = config["intervals"]
-        BME680_INTERVAL      = float(intervals.get("BME680", 45))
-        VEML7700_INTERVAL    = float(intervals.get("VEML7700", 10))
-        SOUND_INTERVAL       = float(intervals.get("SOUND", 6))
-        IP_REFRESH_INTERVAL  = float(intervals.get("IP_REFRESH", 300))
-        IAMALIVE_INTERVAL    = float(intervals.get("IamAlive", 3600))
+    # Sound burst mode: continuous ADC conversion, Leq/Lmin/Lmax/exceedance per window
+    sound_cfg = config.get("sound", {})
+    sound_burst = bool(sound_cfg.get("burst", False))
+    noise = NoiseWindow()
+    min_sound_period = 0.0
+    if sound_burst:
+        sps = int(sound_cfg.get("sps", 250))
+        burst_samples = int(sound_cfg.get("burst_samples", 125))
+        sound.start_burst(sps, burst_samples)
+        min_sound_period = burst_samples / sps
+        SOUND_SAMPLE = max(SOUND_SAMPLE, min_sound_period)
+        print(f"Sound burst mode: {burst_samples} samples @ {sps} SPS")
 
-        nodeId = config["device"]["nodeId"]
-        MQTT_TOPIC = config["mqtt"]["topic"]
+    # nodeId/sensorIds are serialized into message templates once
+    payloads = PayloadCompiler(nodeId, sensorIds, quantiles)
 
-        # === Read sensors every loop and update rolling stats ===
-        offsets = config.get("offsets", {})
-        bme_off   = offsets.get("BME680", {})
-        veml_off  = offsets.get("VEML7700", {})
-        sound_off = offsets.get("SOUND", {})
+    scheduler = Scheduler(clock)
 
-        # BME680 read + apply offsets
-        bme_vals = bme.read()
+    # --- NEW: start watchdog (topic == nodeId); an injected client is only
+    # driven from the scheduler thread, so its watchdog runs there too ---
+    start_watchdog(client, config, scheduler if injected_client else None)
+
+    # Near the buffer cap, merge the oldest windows of each sensor into wider
+    # ones (coarser data instead of none; config["buffer"]["compact_*"])
+    compactor = BacklogCompactor(sensorIds, config["buffer"].get("compact_factor", 10),
+                                 config["buffer"].get("compact_at", 0.9),
+                                 config["buffer"].get("compact_to", 0.6),
+                                 periods=config["intervals"], energy=sound_burst)
+
+    maxlen = getattr(buffer, "maxlen", None)
+
+    def compact_backlog():
+        t0 = perf_counter()
+        before = len(buffer)
+        removed = compactor.compact(buffer, inflight_ids())
+        if removed:
+            metrics.incr("compacted", removed)
+            log.info("backlog.compact", "Backlog near its cap: %d -> %d messages (%d windows merged so far, %.0f ms)",
+                     before, len(buffer), compactor.merged, (perf_counter() - t0) * 1e3)
+
+    def enqueue(message):
+        t0 = perf_counter()
+        if compactor.under_pressure(buffer):
+            compact_backlog()
+        if maxlen and len(buffer) >= maxlen:
+            metrics.incr("drops")       # deque evicts the oldest entry
+        buffer.append(message)
+        metrics.observe("enqueue", perf_counter() - t0)
+        scheduler.trigger("flush")
+
+    # Send initial IP + MAC immediately
+    enqueue(payloads.ipmac(ip, myMac))
+
+    # === Sampling: apply offsets and update rolling stats ===
+    def ingest_bme(bme_vals):
         for k in ("temperature", "humidity", "pressure", "gas"):
             if k in bme_vals:
                 bme_vals[k] = bme_vals[k] + float(bme_off.get(k, 0.0))
-        update_stats(stats_bme, bme_vals)
+        stats_bme.update(bme_vals)
 
-        # VEML7700 read + apply offset
-        veml_vals = veml.read()
+    def ingest_veml(veml_vals):
         if "lux" in veml_vals:
             veml_vals["lux"] = veml_vals["lux"] + float(veml_off.get("lux", 0.0))
-        update_stats(stats_veml, veml_vals)
+        stats_veml.update(veml_vals)
 
-        # Sound read + apply offset
-        sound_vals = sound.read()
+    def ingest_sound(sound_vals):
         if "dB" in sound_vals:
             sound_vals["dB"] = sound_vals["dB"] + float(sound_off.get("dB", 0.0))
-        update_stats(stats_sound, sound_vals)
-
-        # === Refresh IP and detect changes ===
-        if now - last_ip_refresh >= IP_REFRESH_INTERVAL:
-            ip = get_ip_address()
-            if ip != prev_ip:
-                print(f"IP changed! Old={prev_ip}, New={ip}")
-                prev_ip = ip
-                buffer.append(build_IPMAC_payload(nodeId, ip, myMac, sensorIds))
-            last_ip_refresh = now
-
-        # === I am Alive message ===
-        if now - last_IamAlive >= IAMALIVE_INTERVAL:
-            buffer.append(build_IamAlive_payload(nodeId, sensorIds))
-            last_IamAlive = now
-
-        # === Periodic BME680 publish ===
-        if now - last_bme >= BME680_INTERVAL:
-            final_bme = finalize_stats(stats_bme)
-
-            # Convert gas values to AQ score + label for avg/min/max
-            aq_scores = {}
-            aq_labels = {}
-            for key in ["avg", "min", "max"]:
-                gas_val = final_bme["gas"][key]
-                if gas_val is not None:
-                    score = gas_to_air_quality_fixed(gas_val)
-                    aq_scores[key] = score
-                    aq_labels[key] = air_quality_label(score)
-                else:
-                    aq_scores[key] = None
-                    aq_labels[key] = "Unknown"
-
-            buffer.append(
-                build_bme_payload(
-                    nodeId,
-                    final_bme,
-                    ip,
-                    myMac,
-                    aq_scores,
-                    aq_labels,
-                    sensorIds
-                )
-            )
-
-            # reset rolling stats for next window
-            stats_bme = init_stats(["temperature", "humidity", "pressure", "gas"])
-            last_bme = now
-
-        # === Periodic VEML7700 publish ===
-        if now - last_veml >= VEML7700_INTERVAL:
-            buffer.append(
-                build_veml_payload(
-                    nodeId,
-                    finalize_stats(stats_veml),
-                    ip,
-                    myMac,
-                    sensorIds
-                )
-            )
-            stats_veml = init_stats(["lux"])
-            last_veml = now
-
-        # === Periodic Sound publish ===
-        if now - last_sound >= SOUND_INTERVAL:
-            buffer.append(
-                build_sound_payload(
-                    nodeId,
-                    finalize_stats(stats_sound),
-                    ip,
-                    myMac,
-                    sensorIds
-                )
-            )
-            stats_sound = init_stats(["dB"])
-            last_sound = now
-
-        # Try to publish whatever is in buffer
-        flush_buffer(client, buffer, MQTT_TOPIC)
-
-        # tiny sleep to avoid 100% CPU
-        time.sleep(0.1)
+        stats_sound.update(sound_vals)
+
+    def ingest_sound_burst(levels):
+        noise.add(levels, float(sound_off.get("dB", 0.0)))
+
+    # Per-sensor sampling: worker threads + rings, or scheduler tasks on this thread
+    channels = {
+        "BME680":   (bme.read, ingest_bme, BME680_SAMPLE, BME680_INTERVAL),
+        "VEML7700": (veml.read, ingest_veml, VEML7700_SAMPLE, VEML7700_INTERVAL),
+        "SOUND":    (sound.read_burst, ingest_sound_burst, SOUND_SAMPLE, SOUND_INTERVAL) if sound_burst
+                    else (sound.read, ingest_sound, SOUND_SAMPLE, SOUND_INTERVAL),
+    }
+    workers = {}
+    jitter = {}
+
+    def ring_slots(window, period):
+        """Two publish windows of samples, never below acquisition.ring_size."""
+        return max(int(acq_cfg.get("ring_size", 512)), int(2 * window / period) + 1)
+
+    for name, (read, ingest, period, window) in channels.items():
+        if threaded:
+            workers[name] = AcquisitionWorker(name, read, period, ring_slots(window, period))
+            jitter[name] = workers[name].jitter
+        else:
+            jitter[name] = JitterStats(period)
+
+    def make_sampler(name):
+        read, ingest, _, _ = channels[name]
+        stats = jitter[name]
+
+        def sample():
+            start = clock.monotonic()
+            t0 = perf_counter()
+            try:
+                values = read()
+                t1 = perf_counter()
+                metrics.observe("read", t1 - t0)
+                ingest(values)
+                metrics.observe("stats", perf_counter() - t1)
+            except Exception as e:
+                metrics.incr("read_errors")
+                log.warning(f"acq.{name}", "%s read error: %s", name, e)
+            stats.mark(start, clock.monotonic() - start)
+        return sample
+
+    def set_sampling_period(name, period):
+        if name == "SOUND":
+            period = max(period, min_sound_period)
+        jitter[name].period = period
+        if threaded:
+            workers[name].period = period
+            fit_ring(name)
+        else:
+            scheduler.set_interval(f"sample_{name}", period)
+
+    def fit_ring(name):
+        """Threaded mode: grow the channel's ring after its sampling or publish period changed."""
+        worker = workers.get(name)
+        if worker is None:
+            return
+        slots = ring_slots(scheduler.interval(f"publish_{name}"), worker.period)
+        if slots > worker.ring.size:
+            worker.ring.resize(slots)
+            log.info(f"acq.{name}", "%s ring grown to %d samples", name, slots)
+
+    def drain(name):
+        """Threaded mode: move buffered samples into the channel's stats."""
+        worker = workers.get(name)
+        if worker is not None:
+            ingest = channels[name][1]
+            t0 = perf_counter()
+            for _, values in worker.ring.drain():
+                ingest(values)
+            metrics.observe("stats", perf_counter() - t0)
+
+    def report_timing():
+        for name, stats in jitter.items():
+            print(f"[ACQ] {name}: {stats.summary()}")
+            stats.reset()
+        if threaded and i2c is not None:
+            print(f"[ACQ] {i2c.summary()}")
+
+    # === Refresh IP and detect changes ===
+    def refresh_ip():
+        nonlocal ip, prev_ip
+        ip = get_ip_address()
+        if ip != prev_ip:
+            print(f"IP changed! Old={prev_ip}, New={ip}")
+            prev_ip = ip
+            enqueue(payloads.ipmac(ip, myMac))
+
+    # === I am Alive message ===
+    def send_IamAlive():
+        enqueue(payloads.alive())
+
+    # === Report-by-exception: hold back windows that did not move (config["deadband"]) ===
+    def make_deadbands(cfg):
+        for name in ("BME680", "VEML7700", "SOUND"):
+            db_cfg = cfg.get("deadband", {}).get(name, {})
+            deadbands[name].configure(db_cfg.get("thresholds"), db_cfg.get("max_silence", 900))
+
+    deadbands = {name: Deadband() for name in ("BME680", "VEML7700", "SOUND")}
+    make_deadbands(config)
+
+    def changed_enough(name, final):
+        if deadbands[name].should_publish(final, clock.monotonic()):
+            return True
+        metrics.incr(f"suppressed_{name}")
+        return False
+
+    # === Adaptive periods: stretch when quiet, shrink on activity (config["adaptive"]) ===
+    adaptive = {}
+
+    def make_adaptive(cfg):
+        ad_cfg = cfg.get("adaptive", {})
+        adaptive.clear()
+        if not ad_cfg.get("enabled", False):
+            return
+        tuning = {k: ad_cfg[k] for k in ("low", "high", "grow", "shrink") if k in ad_cfg}
+        for name in ("BME680", "VEML7700", "SOUND"):
+            ch = ad_cfg.get(name, {})
+            bounds = {t: ch[t] for t in ("publish", "sampling") if ch.get(t)}
+            if ch.get("refs") and bounds:
+                adaptive[name] = AdaptiveInterval(ch["refs"], bounds, **tuning)
+
+    make_adaptive(config)
+
+    def adapt(name, final):
+        controller = adaptive.get(name)
+        if controller is None:
+            return
+        bases = {"publish": float(config["intervals"][name]),
+                 "sampling": float(config["sampling"][name])}
+        periods = controller.update(final, bases)
+        if "publish" in periods and periods["publish"] != scheduler.interval(f"publish_{name}"):
+            scheduler.set_interval(f"publish_{name}", periods["publish"])
+            fit_ring(name)
+            log.info(f"adaptive.{name}", "%s activity=%.2f -> publish every %.1fs, sample every %.2fs",
+                     name, controller.activity, periods["publish"],
+                     periods.get("sampling", bases["sampling"]))
+        if "sampling" in periods and periods["sampling"] != jitter[name].period:
+            set_sampling_period(name, periods["sampling"])
+        metrics.gauge(f"interval_{name}", round(scheduler.interval(f"publish_{name}"), 2))
+        metrics.gauge(f"sampling_{name}", round(jitter[name].period, 3))
+
+    # === Periodic BME680 publish ===
+    def publish_bme():
+        drain("BME680")
+        final_bme = stats_bme.finalize()
+        adapt("BME680", final_bme)
+        if not changed_enough("BME680", final_bme):
+            stats_bme.reset()
+            return
+
+        # Convert gas values to AQ score + label for avg/min/max
+        aq_scores = {}
+        aq_labels = {}
+        for key in ["avg", "min", "max"]:
+            gas_val = final_bme["gas"][key]
+            if gas_val is not None:
+                score = gas_to_air_quality_fixed(gas_val)
+                aq_scores[key] = score
+                aq_labels[key] = air_quality_label(score)
+            else:
+                aq_scores[key] = None
+                aq_labels[key] = "Unknown"
+
+        t0 = perf_counter()
+        message = payloads.bme(final_bme, ip, myMac, aq_scores, aq_labels)
+        metrics.observe("build", perf_counter() - t0)
+        enqueue(message)
+
+        # reset rolling stats for next window
+        stats_bme.reset()
+
+    # === Periodic VEML7700 publish ===
+    def publish_veml():
+        drain("VEML7700")
+        final_veml = stats_veml.finalize()
+        stats_veml.reset()
+        adapt("VEML7700", final_veml)
+        if not changed_enough("VEML7700", final_veml):
+            return
+        t0 = perf_counter()
+        message = payloads.veml(final_veml, ip, myMac)
+        metrics.observe("build", perf_counter() - t0)
+        enqueue(message)
+
+    # === Periodic Sound publish ===
+    def publish_sound():
+        drain("SOUND")
+        if sound_burst:
+            final_sound = {"dB": noise.finalize(sound_q)}
+            noise.reset()
+        else:
+            final_sound = stats_sound.finalize()
+            stats_sound.reset()
+        adapt("SOUND", final_sound)
+        if not changed_enough("SOUND", final_sound):
+            return
+        t0 = perf_counter()
+        message = payloads.sound(final_sound, ip, myMac)
+        metrics.observe("build", perf_counter() - t0)
+        enqueue(message)
+
+    # === Node metrics: stage histograms + counters, next to IamAlive ===
+    metrics_cfg = config.get("metrics", {})
+    METRICS_INTERVAL = float(metrics_cfg.get("interval", 300))
+    metrics_topic = metrics_cfg.get("topic") or f"{nodeId}/metrics"
+    metrics_qos = int(metrics_cfg.get("qos", 0))
+
+    def send_metrics():
+        metrics.gauge("buffer_depth", len(buffer))
+        for name, deadband in deadbands.items():
+            metrics.gauge(f"suppressed_total_{name}", deadband.suppressed)
+        for name, worker in workers.items():
+            metrics.gauge(f"ring_overruns_{name}", worker.ring.overruns)
+        if hasattr(bme, "latency_max"):
+            metrics.gauge("bme680_latency_max_ms", round(bme.latency_max * 1e3, 2))
+            bme.latency_max = 0.0
+        if hasattr(buffer, "dropped"):
+            metrics.gauge("buffer_dropped", buffer.dropped)
+        for stream, age in get_drain_policy().aoi().items():
+            metrics.gauge(f"aoi_{stream}", round(age, 1))   # node-side Age of Information
+        if not client.is_connected():
+            return      # keep accumulating; the next window covers the outage
+        client.publish(metrics_topic, metrics.build_metrics_payload(nodeId, get_utc_timestamp()),
+                       qos=metrics_qos)
+
+    # === Backfill: after an outage, history goes out in compressed batches on
+    # its own topic while live data keeps the primary path (config["backfill"]) ===
+    backfill_cfg = config.get("backfill", {})
+
+    def live_age():
+        return float(backfill_cfg.get("min_age", 120)) if backfill_cfg.get("enabled") else None
+
+    def backfill():
+        flush_backfill(client, buffer, backfill_cfg.get("topic") or f"{MQTT_TOPIC}/backfill",
+                       qos=int(backfill_cfg.get("qos", 1)), min_age=live_age(),
+                       batch_bytes=int(backfill_cfg.get("batch_max_bytes", 65536)),
+                       level=int(backfill_cfg.get("level", 6)))
+        if buffer_commit:
+            buffer_commit()
+
+    def apply_backfill(cfg, paths):
+        interval = float(backfill_cfg.get("interval", 2.0))
+        if not backfill_cfg.get("enabled"):
+            scheduler.remove("backfill")
+        elif scheduler.has("backfill"):
+            scheduler.set_interval("backfill", interval)
+        else:
+            scheduler.add("backfill", interval, backfill)
+
+    # === Uplink: publish whatever is in buffer ===
+    def flush():
+        before = len(buffer)
+        flush_buffer(client, buffer, MQTT_TOPIC, window=drain_window,
+                     batch_bytes=batch_bytes, linger=batch_linger, live_age=live_age())
+
+        # Single-message mode: keep draining while each pass makes progress
+        if drain_window is None and buffer and len(buffer) < before:
+            scheduler.trigger("flush")
+
+        # Disk queue: commit the pending group once it is old enough
+        if buffer_commit:
+            buffer_commit()
+
+    # Same order as the old loop: sample, IP, heartbeat, publish, flush
+    if threaded:
+        for worker in workers.values():
+            worker.start()
+    else:
+        for name in channels:
+            scheduler.add(f"sample_{name}", channels[name][2], make_sampler(name))
+    scheduler.add("ip_refresh", IP_REFRESH_INTERVAL, refresh_ip)
+    scheduler.add("IamAlive", IAMALIVE_INTERVAL, send_IamAlive)
+    if METRICS_INTERVAL > 0:
+        scheduler.add("metrics", METRICS_INTERVAL, send_metrics, delay=METRICS_INTERVAL)
+    scheduler.add("publish_BME680", BME680_INTERVAL, publish_bme)
+    scheduler.add("publish_VEML7700", VEML7700_INTERVAL, publish_veml)
+    scheduler.add("publish_SOUND", SOUND_INTERVAL, publish_sound)
+    scheduler.add("flush", FLUSH_INTERVAL, flush)
+    apply_backfill(config, [])
+    report_interval = float(acq_cfg.get("report_interval", 300))
+    if report_interval > 0:
+        scheduler.add("acq_report", report_interval, report_timing, delay=report_interval)
+
+    # === Remote / on-disk config changes: hot-applied per component ===
+    runtime = ConfigRuntime(config, reboot=request_reboot)
+    TASK_OF_INTERVAL = {
+        "BME680": "publish_BME680", "VEML7700": "publish_VEML7700", "SOUND": "publish_SOUND",
+        "IP_REFRESH": "ip_refresh", "IamAlive": "IamAlive", "FLUSH": "flush",
+        "CONFIG_WATCH": "config_watch",
+    }
+
+    def apply_intervals(cfg, paths):
+        for path in paths:
+            name = path.split(".", 1)[1]
+            if name in TASK_OF_INTERVAL:
+                scheduler.set_interval(TASK_OF_INTERVAL[name], float(cfg["intervals"][name]))
+                if name in channels:
+                    fit_ring(name)
+
+    def apply_sampling(cfg, paths):
+        for path in paths:
+            name = path.split(".", 1)[1]
+            if name not in channels:
+                continue
+            set_sampling_period(name, float(cfg["sampling"][name]))
+
+    def apply_sensor_ids(cfg, paths):
+        configure_encoding(cfg.get("payload", {}), cfg["sensorIds"])
+        payloads.refresh(nodeId, cfg["sensorIds"], quantiles)
+        compactor.set_sensor_ids(cfg["sensorIds"])
+
+    def apply_topic(cfg, paths):
+        nonlocal MQTT_TOPIC
+        MQTT_TOPIC = cfg["mqtt"]["topic"]
+
+    def apply_metrics(cfg, paths):
+        nonlocal metrics_topic, metrics_qos
+        metrics_cfg = cfg["metrics"]
+        metrics_topic = metrics_cfg.get("topic") or f"{nodeId}/metrics"
+        metrics_qos = int(metrics_cfg.get("qos", 0))
+        interval = float(metrics_cfg.get("interval", 300))
+        if interval <= 0:
+            scheduler.remove("metrics")
+        elif scheduler.has("metrics"):
+            scheduler.set_interval("metrics", interval)
+        else:
+            scheduler.add("metrics", interval, send_metrics, delay=interval)
+
+    runtime.register("intervals", apply_intervals)
+    runtime.register("sampling", apply_sampling)
+    runtime.register("sensorIds", apply_sensor_ids)
+    runtime.register("mqtt_auth", lambda cfg, paths: apply_credentials(client, cfg["mqtt"]))
+    runtime.register("mqtt_topic", apply_topic)
+    runtime.register("metrics", apply_metrics)
+    runtime.register("logging", lambda cfg, paths: log.configure(cfg["logging"]))
+    runtime.register("deadband", lambda cfg, paths: make_deadbands(cfg))
+    runtime.register("adaptive", lambda cfg, paths: make_adaptive(cfg))
+    runtime.register("backfill", apply_backfill)
+    # offsets need no applier: ingest_* read the live (merged in place) dicts
+
+    def on_remote_config(payload):
+        """Command worker thread: parse here, apply on the scheduler thread."""
+        try:
+            partial = json.loads(payload)
+        except ValueError:
+            print("?? Config message was not valid JSON; ignoring.")
+            return
+        print("??? Received new config:", partial)
+        scheduler.call_soon(lambda: runtime.apply(partial))
+
+    set_config_handler(on_remote_config)
+    scheduler.add("config_watch", CONFIG_WATCH_INTERVAL, runtime.check_file, delay=CONFIG_WATCH_INTERVAL)
+
+    # Reconnects and PUBACKs wake the scheduler so the uplink drains immediately
+    set_wakeup(lambda: scheduler.trigger("flush"))
+
+    if probe is not None:
+        probe(scheduler, buffer)
+
+    print("Starting sensor loop with avg/min/max statistics...")
+    until = None if run_for is None else clock.monotonic() + float(run_for)
+    scheduler.run_forever(until)
+    return buffer
 
 
 if __name__ == "__main__":
     main()
-    
-    
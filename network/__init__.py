@@ -1,3 +1,25 @@
-from .mqtt_handler import setup_mqtt, flush_buffer, start_watchdog
+from .mqtt_handler import (
+    setup_mqtt,
+    attach_callbacks,
+    flush_buffer,
+    start_watchdog,
+    set_wakeup,
+    set_system_hooks,
+    register_command,
+    set_config_handler,
+    request_reboot,
+    apply_credentials,
+    inflight_ids,
+    set_drain_policy,
+    get_drain_policy,
+    flush_backfill,
+    backfill_report,
+)
+from .drain import create_policy, POLICIES
+from .loopback import LoopbackClient
 
-__all__ = ["setup_mqtt", "flush_buffer", "start_watchdog"]
+__all__ = ["setup_mqtt", "attach_callbacks", "flush_buffer", "start_watchdog", "set_wakeup",
+           "set_system_hooks", "register_command", "set_config_handler", "request_reboot", "apply_credentials",
+           "inflight_ids", "set_drain_policy", "get_drain_policy", "create_policy", "POLICIES",
+           "flush_backfill", "backfill_report",
+           "LoopbackClient"]
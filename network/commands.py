@@ -0,0 +1,69 @@
+# network/commands.py
+#
+# Inbound MQTT work (config updates, remote commands) runs here on a
+# worker thread, so paho's network thread only enqueues and returns:
+# keepalives, PUBACKs and watchdog echoes are never stuck behind a JSON
+# parse, a config file write or a reboot.
+
+import queue
+import threading
+
+from utils import log, metrics
+
+
+class CommandDispatcher:
+    """
+    Bounded work queue + worker thread with one handler per command name.
+
+    submit() never blocks: when the queue is full the command is dropped
+    and counted (a flood of pushes must not back up into the paho thread).
+    Handlers are called as handler(payload) on the worker thread.
+    """
+
+    def __init__(self, maxsize=32):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._handlers = {}
+        self._thread = None
+
+    def register(self, name, handler):
+        """Install (or replace) the handler for `name`."""
+        self._handlers[name] = handler
+
+    def submit(self, name, payload=None):
+        """Queue a command from any thread; False if it was dropped."""
+        try:
+            self._queue.put_nowait((name, payload))
+            return True
+        except queue.Full:
+            metrics.incr("commands_dropped")
+            log.warning("cmd.queue", "Command queue full; dropped %r", name)
+            return False
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="commands", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._queue.put((None, None))
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            name, payload = self._queue.get()
+            if name is None:
+                return
+            self._handle(name, payload)
+
+    def _handle(self, name, payload):
+        handler = self._handlers.get(name)
+        if handler is None:
+            log.warning("cmd.unknown", "No handler for command %r; ignoring", name)
+            return
+        try:
+            handler(payload)
+            metrics.incr("commands")
+        except Exception as e:
+            log.error("cmd.failed", "Command %r failed: %s", name, e)
@@ -0,0 +1,161 @@
+# network/drain.py
+#
+# Drain policies: the order in which flush_buffer offers buffered messages
+# to the uplink. After an outage FIFO sends the backlog first and the live
+# readings last; the other policies put fresh data first and backfill the
+# rest. Every policy tracks, per stream (message layout, keyed by its first
+# sensorId), the freshest generatedDate handed to the broker, which gives the
+# node-side Age of Information: now - freshest delivered.
+
+from utils.clock import get_clock
+from utils.payload_builder import message_info
+
+POLICIES = ("fifo", "freshest", "aoi")
+
+
+class FifoPolicy:
+    """Oldest first (the original behaviour)."""
+
+    name = "fifo"
+
+    def __init__(self):
+        self._delivered = {}       # stream -> (generatedDate, sensorType)
+        self._infos = {}           # id(message) -> (message, message_info) of the buffer tail
+
+    def _info(self, message):
+        """message_info, cached: the same tail is searched on every flush while the link is slow."""
+        hit = self._infos.get(id(message))
+        if hit is not None and hit[0] is message:
+            return hit[1]
+        if len(self._infos) >= 256:
+            self._infos.clear()
+        info = message_info(message)
+        self._infos[id(message)] = (message, info)
+        return info
+
+    def order(self, buffer, skip=()):
+        """Candidate messages in send order (skipping in-flight ones)."""
+        return (m for m in buffer if id(m) not in skip)
+
+    def live(self, buffer, skip=(), max_age=120.0):
+        """
+        The buffer's tail of messages younger than max_age, oldest first: what
+        the primary path sends while older ones are left to the backfill path.
+        """
+        now = get_clock().time()
+        tail = []
+        for i in range(len(buffer) - 1, -1, -1):
+            m = buffer[i]
+            info = self._info(m)
+            if info is not None and now - info[0] > max_age:
+                break
+            if id(m) not in skip:
+                tail.append(m)
+        tail.reverse()
+        return tail
+
+    def sent(self, infos):
+        """Record the (generatedDate, sensorId, sensorType) of published messages."""
+        for generated, stream, label in infos:
+            last = self._delivered.get(stream)
+            if last is None or generated > last[0]:
+                self._delivered[stream] = (generated, label)
+
+    def aoi(self, now=None):
+        """{sensorType: seconds since the freshest delivered message}; the freshest stream per type."""
+        now = get_clock().time() if now is None else now
+        ages = {}
+        for generated, label in self._delivered.values():
+            age = max(0.0, now - generated)
+            if label not in ages or age < ages[label]:
+                ages[label] = age
+        return ages
+
+    @staticmethod
+    def _then_backfill(first, buffer, skip):
+        """`first` in the given order, then every other candidate oldest first."""
+        yield from first
+        taken = {id(m) for m in first}
+        for m in buffer:
+            if id(m) not in skip and id(m) not in taken:
+                yield m
+
+
+class FreshestFirstPolicy(FifoPolicy):
+    """
+    Live messages (younger than live_age seconds) newest first, then the
+    backlog oldest first. New readings overtake the backfill as they arrive.
+    """
+
+    name = "freshest"
+
+    def __init__(self, live_age=120.0):
+        super().__init__()
+        self.live_age = float(live_age)
+
+    def live(self, buffer, skip=(), max_age=120.0):
+        return super().live(buffer, skip, max_age)[::-1]
+
+    def order(self, buffer, skip=()):
+        now = get_clock().time()
+        live = []
+        for i in range(len(buffer) - 1, -1, -1):
+            m = buffer[i]
+            info = self._info(m)
+            if info is None or now - info[0] > self.live_age:
+                break
+            if id(m) not in skip:
+                live.append(m)
+        if not live:
+            return super().order(buffer, skip)
+        return self._then_backfill(live, buffer, skip)
+
+
+class AoIPolicy(FifoPolicy):
+    """
+    Greedy Age-of-Information scheduling: among the newest `scan` messages,
+    take each stream's freshest one and send them in order of the largest
+    AoI reduction (generatedDate - freshest delivered; never-delivered
+    streams first). Whatever would not lower any stream's age is backfill,
+    sent oldest first.
+    """
+
+    name = "aoi"
+
+    def __init__(self, scan=64):
+        super().__init__()
+        self.scan = max(1, int(scan))
+
+    def order(self, buffer, skip=()):
+        freshest = {}
+        for i in range(len(buffer) - 1, max(-1, len(buffer) - 1 - self.scan), -1):
+            m = buffer[i]
+            if id(m) in skip:
+                continue
+            info = self._info(m)
+            if info is not None and info[1] not in freshest:
+                freshest[info[1]] = (info[0], m)
+
+        ranked = []
+        for stream, (generated, m) in freshest.items():
+            last = self._delivered.get(stream)
+            if last is None:
+                ranked.append((float("inf"), m))
+            elif generated > last[0]:
+                ranked.append((generated - last[0], m))
+        if not ranked:
+            return super().order(buffer, skip)
+        ranked.sort(key=lambda r: r[0], reverse=True)
+        return self._then_backfill([m for _, m in ranked], buffer, skip)
+
+
+def create_policy(buffer_cfg):
+    """Drain policy selected by config["buffer"]["drain_policy"]."""
+    name = buffer_cfg.get("drain_policy", "fifo")
+    if name == "freshest":
+        return FreshestFirstPolicy(buffer_cfg.get("live_age", 120))
+    if name == "aoi":
+        return AoIPolicy(buffer_cfg.get("aoi_scan", 64))
+    if name != "fifo":
+        print(f"?? Unknown drain_policy {name!r}; using fifo")
+    return FifoPolicy()
@@ -0,0 +1,139 @@
+# network/loopback.py
+#
+# In-process stand-in for paho's Client, used by soak.py: no sockets, the
+# "broker" acks every QoS>0 publish at once and echoes messages on subscribed
+# topics (so the watchdog sees its pings). Link outages follow a schedule on
+# the shared clock; an optional byte rate models a constrained uplink.
+
+from utils.clock import get_clock
+
+MQTT_ERR_SUCCESS = 0
+MQTT_ERR_NO_CONN = 4
+MQTT_ERR_QUEUE_SIZE = 15
+
+
+class _PublishInfo:
+    __slots__ = ("rc", "mid")
+
+    def __init__(self, rc, mid):
+        self.rc = rc
+        self.mid = mid
+
+
+class _Message:
+    __slots__ = ("topic", "payload", "qos", "retain")
+
+    def __init__(self, topic, payload, qos=0, retain=False):
+        self.topic = topic
+        self.payload = payload
+        self.qos = qos
+        self.retain = retain
+
+
+class LoopbackClient:
+    """
+    paho-compatible subset: publish, subscribe, is_connected, reconnect.
+
+    outages: list of (start, end) seconds on the clock's monotonic time during
+    which the link is down; on_connect / on_disconnect fire on the transitions.
+    bandwidth: bytes per second the link carries (None = unlimited); a publish
+    beyond the budget is refused like a full paho queue (MQTT_ERR_QUEUE_SIZE).
+    """
+
+    def __init__(self, config, outages=(), clock=None, bandwidth=None):
+        self._userdata = {"config": config}
+        self._clock = clock or get_clock()
+        self.outages = sorted((float(a), float(b)) for a, b in outages)
+        self._connected = None
+        self._subs = set()
+        self._mid = 0
+        self.bandwidth = float(bandwidth) if bandwidth else None
+        self._tokens = self.bandwidth or 0.0    # one second of burst
+        self._refilled = self._clock.monotonic()
+
+        self.on_connect = None
+        self.on_disconnect = None
+        self.on_message = None
+        self.on_publish = None
+
+        # counters for the soak report
+        self.published = 0
+        self.published_bytes = 0
+        self.rejected = 0
+        self.throttled = 0
+        self.reconnects = 0
+        self.disconnects = 0
+        self.per_topic = {}
+        self.sink = None          # sink(topic, payload bytes) for every accepted publish
+
+    def _link_up(self):
+        now = self._clock.monotonic()
+        for start, end in self.outages:
+            if start <= now < end:
+                return False
+        return True
+
+    def is_connected(self):
+        up = self._link_up()
+        if up != self._connected:
+            self._connected = up
+            if up:
+                self._subs.clear()     # clean session: on_connect re-subscribes
+                if self.on_connect:
+                    self.on_connect(self, self._userdata, {}, 0)
+            else:
+                self.disconnects += 1
+                if self.on_disconnect:
+                    self.on_disconnect(self, self._userdata, 1)
+        return up
+
+    def subscribe(self, topic, qos=0):
+        self._subs.add(topic)
+        self._mid += 1
+        return MQTT_ERR_SUCCESS, self._mid
+
+    def username_pw_set(self, username, password=None):
+        self.username = username
+
+    def reconnect(self):
+        self.reconnects += 1
+        if not self.is_connected():
+            raise ConnectionError("loopback link is down")
+
+    def _take(self, size):
+        """Token bucket: True if `size` bytes fit into the link budget now."""
+        if self.bandwidth is None:
+            return True
+        now = self._clock.monotonic()
+        self._tokens = min(self.bandwidth, self._tokens + (now - self._refilled) * self.bandwidth)
+        self._refilled = now
+        if self._tokens < min(size, self.bandwidth):
+            return False
+        self._tokens -= size
+        return True
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self._mid += 1
+        mid = self._mid
+        if not self.is_connected():
+            self.rejected += 1
+            return _PublishInfo(MQTT_ERR_NO_CONN, mid)
+
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        payload = payload or b""
+        if not self._take(len(payload)):
+            self.throttled += 1
+            return _PublishInfo(MQTT_ERR_QUEUE_SIZE, mid)
+        self.published += 1
+        self.published_bytes += len(payload)
+        count, size = self.per_topic.get(topic, (0, 0))
+        self.per_topic[topic] = (count + 1, size + len(payload))
+        if self.sink:
+            self.sink(topic, payload)
+
+        if topic in self._subs and self.on_message:
+            self.on_message(self, self._userdata, _Message(topic, payload, qos, retain))
+        if qos > 0 and self.on_publish:
+            self.on_publish(self, self._userdata, mid)
+        return _PublishInfo(MQTT_ERR_SUCCESS, mid)
@@ -11,9 +11,18 @@ import ipaddress
 import time
 import threading
 import subprocess
+from collections import deque
 
 import paho.mqtt.client as mqtt
 
+from utils import log, metrics
+from utils.backfill import encode_backfill
+from utils.clock import get_clock
+from utils.payload_builder import is_mergeable, merge_payloads, message_info, ENVELOPE_OVERHEAD
+
+from .commands import CommandDispatcher
+from .drain import FifoPolicy
+
 _current_config = None  # reference to config dict
 
 # -------- Watchdog state --------
@@ -29,6 +38,23 @@ DEFAULT_MAX_RECONNECT_TRIES = 3
 DEFAULT_NETWORK_BAD_REBOOT_DELAY = 300.0   # network can be bad this long before reboot
 DEFAULT_PING_TARGET = "192.168.1.1"            # override via config["watchdog"]["ping_target"]
 
+# -------- Windowed (ack-driven) drain state --------
+_inflight = {}            # mid -> list of buffered messages awaiting PUBACK
+_inflight_ids = set()     # id() of buffered messages currently in flight
+_acked_mids = deque()     # mids acked by the broker (appended on the paho thread)
+_track_acks = False       # set once a windowed/backfill flush runs; single mode needs no mids
+_linger_since = None      # when the current partial batch started waiting
+_wakeup = None            # callable poked on reconnect / PUBACK (see set_wakeup)
+_sent_at = {}             # mid -> perf_counter() at publish, for the ack-latency histogram
+_early_acks = deque(maxlen=64)  # (mid, time) of PUBACKs that beat publish() back to us
+_progress = {"publishes": 0, "messages": 0, "bytes": 0}   # since the last uplink log line
+_policy = FifoPolicy()    # send order of buffered messages (see set_drain_policy)
+
+# -------- Backfill (historical catch-up) state --------
+_backfill_mid = None      # mid of the backfill batch awaiting PUBACK
+_catchup = None           # progress of the replay in course (see flush_backfill)
+_catchups = deque(maxlen=32)  # finished replays, newest last
+
 
 # -------- Small helpers --------
 def _mask_secret(s: str) -> str:
@@ -61,6 +87,10 @@ def _rc_text(rc: int) -> str:
     return mapping.get(rc, f"Unknown rc={rc}")
 
 
+def _reboot():
+    os.system("sudo reboot")
+
+
 def _check_network(ping_target: str) -> bool:
     """Simple ping-based network check."""
     try:
@@ -74,6 +104,29 @@ def _check_network(ping_target: str) -> bool:
         print(f"[NET] ping error: {e}")
         return False
 
+def set_wakeup(callback):
+    """Register a thread-safe callable to run when the uplink can make progress."""
+    global _wakeup
+    _wakeup = callback
+
+
+def _notify():
+    if _wakeup is not None:
+        _wakeup()
+
+
+# System actions, swappable for soak/simulation runs (see set_system_hooks)
+_hooks = {"reboot": _reboot, "check_network": _check_network}
+
+
+def set_system_hooks(reboot=None, check_network=None):
+    """Replace the reboot / network-check actions (e.g. with simulated ones)."""
+    if reboot is not None:
+        _hooks["reboot"] = reboot
+    if check_network is not None:
+        _hooks["check_network"] = check_network
+
+
 # -------- MQTT callbacks --------
 def on_connect(client, userdata, flags, rc):
     print(f"? on_connect rc={rc} ({_rc_text(rc)})")
@@ -93,50 +146,55 @@ def on_connect(client, userdata, flags, rc):
             client.subscribe(node_id)
             print(f"?? Subscribed to node control topic: {node_id}")
 
+        metrics.incr("connects")
+
         # Initialize echo time so we don't trigger immediately
         global _last_echo_time
         with _watchdog_lock:
-            _last_echo_time = time.time()
+            _last_echo_time = get_clock().time()
+
+        # Wake the main loop so the backlog starts draining right away
+        _notify()
     else:
         print("? Connect failed, see rc above.")
 
 
 def on_message(client, userdata, msg):
-    """Handle config updates on config_topic and watchdog/commands on nodeId topic."""
-    global _current_config, _last_echo_time
+    """
+    Runs on paho's network thread: answer watchdog echoes inline, hand
+    everything else to the command dispatcher (see network/commands.py).
+    """
+    t0 = time.perf_counter()
+    try:
+        _route_message(userdata, msg)
+    finally:
+        metrics.observe("callback", time.perf_counter() - t0)
+
+
+def _route_message(userdata, msg):
+    global _last_echo_time, _last_ping_id
 
     cfg = userdata.get("config", {}) if isinstance(userdata, dict) else {}
     mqtt_cfg = cfg.get("mqtt", {})
     cfg_topic = mqtt_cfg.get("config_topic")
     node_id   = cfg.get("device", {}).get("nodeId")
+    payload = msg.payload or b""
 
-    try:
-        payload = msg.payload.decode("utf-8", errors="replace")
-    except Exception:
-        payload = ""
-
-    print(f"?? on_message topic={msg.topic} len={len(payload)}")
+    log.debug("mqtt.message", "on_message topic=%s len=%d", msg.topic, len(payload))
 
-    # -------- 1) CONFIG UPDATE messages ----------
+    # -------- 1) CONFIG UPDATE messages: parsed and applied on the worker ----------
     if cfg_topic and msg.topic == cfg_topic:
-        try:
-            new_cfg = json.loads(payload)
-            print("??? Received new config:", new_cfg)
-            _current_config.update(new_cfg)
-            from utils.config_manager import save_config
-            save_config(_current_config, reboot=True)
-        except json.JSONDecodeError:
-            print("?? Message was not valid JSON; ignoring.")
-        except Exception as e:
-            print(f"?? Config update failed: {e}")
+        _commands.submit("config", payload)
         return
 
     # -------- 2) NODE CONTROL / WATCHDOG messages on nodeId topic ----------
     if node_id and msg.topic == node_id:
         try:
             data = json.loads(payload)
-        except json.JSONDecodeError:
-            print("?? Node control payload not JSON; ignoring.")
+        except ValueError:
+            log.warning("mqtt.control", "Node control payload not JSON; ignoring.")
+            return
+        if not isinstance(data, dict):
             return
 
         msg_type = data.get("type")
@@ -145,20 +203,14 @@ def on_message(client, userdata, msg):
         if msg_type == "watchdog":
             ping_id = data.get("id")
             with _watchdog_lock:
-                global _last_ping_id
                 if ping_id == _last_ping_id:
-                    _last_echo_time = time.time()
-                    # print(f"[WATCHDOG] Echo received for ping_id={ping_id}")
+                    _last_echo_time = get_clock().time()
             return
 
-        # 2b) Remote command, e.g. reboot
+        # 2b) Remote command, e.g. {"type": "command", "cmd": "reboot"}; kept in
+        # their own namespace so a remote "cmd" can't reach an internal handler
         if msg_type == "command":
-            cmd = data.get("cmd")
-            if cmd == "reboot":
-                print("[CMD] Remote reboot command received, rebooting Raspberry Pi.")
-                os.system("sudo reboot")
-                time.sleep(5)
-            # extend here for other commands if needed
+            _commands.submit(REMOTE_PREFIX + str(data.get("cmd")), data)
         return
 
     # -------- other topics (if any) ----------
@@ -166,18 +218,93 @@ def on_message(client, userdata, msg):
     return
 
 
+# -------- Command handlers (worker thread) --------
+REMOTE_PREFIX = "cmd."    # dispatcher names of remote commands (see register_command)
+
+
+def _handle_reboot(data):
+    print("[CMD] Remote reboot command received, rebooting Raspberry Pi.")
+    _hooks["reboot"]()
+
+
+def _handle_log_flush(data):
+    log.flush("remote command")
+
+
+_commands = CommandDispatcher(maxsize=32)
+_commands.register(REMOTE_PREFIX + "reboot", _handle_reboot)
+_commands.register(REMOTE_PREFIX + "log_flush", _handle_log_flush)
+
+
+def request_reboot():
+    """Reboot through the installed hook (simulated in soak runs)."""
+    _hooks["reboot"]()
+
+
+def apply_credentials(client, mqtt_cfg):
+    """New username/password take effect on a fresh connection."""
+    username = mqtt_cfg.get("username", "")
+    if username:
+        client.username_pw_set(username, mqtt_cfg.get("password", "") or "")
+    else:
+        client.username_pw_set(None, None)
+    print("[CONFIG] MQTT credentials changed; reconnecting")
+    try:
+        client.reconnect()
+    except Exception as e:
+        log.warning("mqtt.reconnect", "Reconnect after credential change failed: %s", e)
+
+
+def register_command(name, handler):
+    """Add a remote command: {"type": "command", "cmd": name, ...} on the nodeId topic."""
+    _commands.register(REMOTE_PREFIX + name, handler)
+
+
+def set_config_handler(handler):
+    """
+    handler(raw payload) for messages on mqtt.config_topic, called on the
+    command worker thread. Without one, config pushes are logged and ignored.
+    """
+    _commands.register("config", handler)
+
+
+def on_publish(client, userdata, mid):
+    """PUBACK (QoS1) received: hand the mid over to the main thread."""
+    now = time.perf_counter()
+    sent = _sent_at.pop(mid, None)
+    if sent is not None:
+        metrics.observe("ack", now - sent)
+    else:
+        _early_acks.append((mid, now))
+    if _track_acks:
+        _acked_mids.append(mid)
+    _notify()
+
+
 def on_disconnect(client, userdata, rc):
     print(f"? on_disconnect rc={rc}")
+    metrics.incr("disconnects")
 
 
 # -------------------- main API --------------------
 
+def attach_callbacks(client, config):
+    """Install the node's callbacks on any paho-compatible client."""
+    global _current_config
+    _current_config = config
+    client.on_connect = on_connect
+    client.on_disconnect = on_disconnect
+    client.on_message = on_message
+    client.on_publish = on_publish
+    _commands.start()
+
+
 def setup_mqtt(
     host="broker.local",
     port=8883,
     keepalive=60,
     config=None,
-    enable_debug_log=True,
+    enable_debug_log=None,      # None -> config["logging"]["paho_debug"]
     wait_conn_timeout=10,
     tls_probe=False,            # kept but disabled by default to avoid long blocking
 ):
@@ -232,10 +359,10 @@ def setup_mqtt(
     if hasattr(mqtt, "CallbackAPIVersion"):
         kwargs["callback_api_version"] = mqtt.CallbackAPIVersion.VERSION1
     client = mqtt.Client(**kwargs)
-    client.on_connect = on_connect
-    client.on_disconnect = on_disconnect
-    client.on_message = on_message
+    attach_callbacks(client, _current_config)
 
+    if enable_debug_log is None:
+        enable_debug_log = bool(_current_config.get("logging", {}).get("paho_debug", False))
     if enable_debug_log:
         logging.basicConfig(level=logging.DEBUG, format="%(asctime)s %(levelname)s %(message)s")
         client.enable_logger()
@@ -298,122 +425,450 @@ def setup_mqtt(
     return client
 
 
-def flush_buffer(client, buffer, topic, qos=1, retain=False):
+def flush_buffer(client, buffer, topic, qos=1, retain=False, window=None,
+                 batch_bytes=None, linger=0.0, live_age=None):
     """
-    Publish oldest buffered message to the data topic.
+    Publish buffered messages to the data topic.
+
+    window=None -> publish the oldest message and drop it once publish() accepts it.
+    window=N    -> keep up to N publishes in flight; entries leave the buffer only
+                   when the broker acks them (see on_publish).
+    batch_bytes -> coalesce consecutive SensorData messages into one envelope of at
+                   most this many bytes; a partial batch waits up to `linger` seconds.
+
+    "Oldest" is the default; set_drain_policy() picks another send order.
+    live_age    -> only messages younger than this many seconds (the backfill
+                   path, flush_backfill, replays the older ones).
     """
+    if window:
+        _flush_windowed(client, buffer, topic, qos, retain, int(window), batch_bytes, linger, live_age)
+        return
+    _reap_acks(buffer)
     if not buffer:
         return
     if not client.is_connected():
-        print("?? Not connected yet; will retry later!")
+        log.warning("uplink.offline", "Not connected yet; %d messages buffered, will retry", len(buffer))
+        return
+    batch, full = _collect_batch(_candidates(buffer, live_age), batch_bytes)
+    if not batch or _lingering(full, linger):
         return
     try:
-        message = buffer[0]
-        info = client.publish(topic, message, qos=qos, retain=retain)
+        message = merge_payloads(batch)
+        info = _publish(client, topic, message, qos, retain, len(batch))
         if getattr(info, "rc", 0) == mqtt.MQTT_ERR_SUCCESS:
-            print(f"?? Sent to {topic}: {message!r} (qos={qos}, retain={retain})")
-            buffer.popleft()
+            log.debug("uplink.message", "Sent to %s: %d bytes, mid=%s (qos=%d)",
+                      topic, len(message), getattr(info, "mid", None), qos)
+            if _is_prefix(buffer, batch):
+                for _ in batch:
+                    buffer.popleft()
+            else:                              # drain order is not the buffer order
+                for m in reversed(batch):
+                    _discard(buffer, m)
+            _record_delivery(batch)
+            _batch_sent()
+            _report_progress(buffer)
         else:
-            print(f"?? Publish RC={info.rc}; will retry!")
+            log.warning("uplink.rc", "Publish RC=%s; will retry", info.rc)
     except Exception as e:
-        print(f"? MQTT publish error: {e}")
-        
+        log.error("uplink.error", "MQTT publish error: %s", e)
+
+
+def _publish(client, topic, message, qos, retain, count):
+    """client.publish with timing and counters (publish + ack histograms)."""
+    t0 = time.perf_counter()
+    info = client.publish(topic, message, qos=qos, retain=retain)
+    t1 = time.perf_counter()
+    metrics.observe("publish", t1 - t0)
+    if getattr(info, "rc", 0) == mqtt.MQTT_ERR_SUCCESS:
+        metrics.incr("published")
+        metrics.incr("published_messages", count)
+        metrics.incr("published_bytes", len(message))
+        _progress["publishes"] += 1
+        _progress["messages"] += count
+        _progress["bytes"] += len(message)
+        if qos:
+            _track_ack(info.mid, t0)
+    else:
+        metrics.incr("publish_errors")
+    return info
 
-# -------------------- WATCHDOG LOGIC --------------------
 
-def _watchdog_loop(client, config):
+def _report_progress(buffer):
+    """Counters instead of payloads: one rate-limited line per reporting period."""
+    if log.should_log("uplink.sent"):
+        log.info("uplink.sent", "Sent %d publishes (%d messages, %d bytes); %d buffered",
+                 _progress["publishes"], _progress["messages"], _progress["bytes"], len(buffer))
+        _progress["publishes"] = _progress["messages"] = _progress["bytes"] = 0
+
+
+def _track_ack(mid, sent):
+    """Start the ack clock for mid, unless its PUBACK already arrived during publish()."""
+    for early_mid, acked in _early_acks:
+        if early_mid == mid:
+            metrics.observe("ack", acked - sent)
+            return
+    if len(_sent_at) >= 4096:      # acks lost across reconnects; don't grow forever
+        _sent_at.clear()
+    _sent_at[mid] = sent
+
+
+def inflight_ids():
+    """id() of buffered messages awaiting PUBACK; they must not be rewritten or removed."""
+    return _inflight_ids
+
+
+def set_drain_policy(policy):
+    """Install the drain policy (network/drain.py) used by flush_buffer."""
+    global _policy
+    _policy = policy
+
+
+def get_drain_policy():
+    return _policy
+
+
+def _candidates(buffer, live_age):
+    """Messages the primary path may send, in drain-policy order."""
+    if live_age is None:
+        return _policy.order(buffer, _inflight_ids)
+    return _policy.live(buffer, _inflight_ids, live_age)
+
+
+def _record_delivery(batch):
+    """Age of each message at publish time, and the policy's per-stream AoI book-keeping."""
+    now = get_clock().time()
+    infos = []
+    for message in batch:
+        info = message_info(message)
+        if info is not None:
+            metrics.observe_age(info[2], max(0.0, now - info[0]))
+            infos.append(info)
+    _policy.sent(infos)
+
+
+def _collect_batch(candidates, batch_bytes):
     """
-    Background thread:
-      - publish watchdog on nodeId topic
-      - expect echo (because we subscribe to nodeId)
-      - if no echo + reconnect + network bad for long ? reboot
+    First run of candidates (in drain-policy order) that fits into one publish.
+    Returns (messages, full); full=False means more could still be added.
+    """
+    batch = []
+    size = ENVELOPE_OVERHEAD
+    for message in candidates:
+        if not batch_bytes or not is_mergeable(message):
+            if batch:
+                return batch, True
+            return [message], True
+        body = len(message) - ENVELOPE_OVERHEAD + (2 if batch else 0)  # ", " separator
+        if batch and size + body > batch_bytes:
+            return batch, True
+        batch.append(message)
+        size += body
+    return batch, False
+
+
+def _lingering(full, linger):
+    """Hold back a partial batch until it has waited `linger` seconds."""
+    global _linger_since
+    if full or not linger:
+        return False
+    now = get_clock().monotonic()
+    if _linger_since is None:
+        _linger_since = now
+    return now - _linger_since < linger
+
+
+def _batch_sent():
+    global _linger_since
+    _linger_since = None
+
+
+def _is_prefix(buffer, batch):
+    """True when batch is exactly the first len(batch) entries of the buffer."""
+    return len(batch) <= len(buffer) and all(buffer[i] is m for i, m in enumerate(batch))
+
+
+def _discard(buffer, message):
+    """Remove this exact message object from the buffer (it may already be evicted)."""
+    if buffer and buffer[-1] is message:      # freshest-first policies send the tail
+        del buffer[-1]
+        return True
+    for i, m in enumerate(buffer):
+        if m is message:
+            del buffer[i]
+            return True
+    return False
+
+
+def _reap_acks(buffer):
+    """Drop every acked message from the buffer."""
+    while _acked_mids:
+        mid = _acked_mids.popleft()
+        batch = _inflight.pop(mid, None)
+        if batch is None:
+            continue  # not ours (e.g. watchdog ping)
+        for message in batch:
+            _inflight_ids.discard(id(message))
+            _discard(buffer, message)
+
+
+def _flush_windowed(client, buffer, topic, qos, retain, window, batch_bytes, linger, live_age=None):
+    """Top up the in-flight window from the oldest not-yet-sent messages."""
+    global _track_acks
+    _track_acks = True
+    _reap_acks(buffer)
+    if not buffer:
+        return
+    if not client.is_connected():
+        # paho keeps QoS1 messages already handed over and resends them on reconnect.
+        log.warning("uplink.offline", "Not connected yet; %d messages buffered, will retry", len(buffer))
+        return
+
+    try:
+        while len(_inflight) < window:
+            batch, full = _collect_batch(_candidates(buffer, live_age), batch_bytes)
+            if not batch or _lingering(full, linger):
+                break
+            info = _publish(client, topic, merge_payloads(batch), qos, retain, len(batch))
+            if getattr(info, "rc", 0) != mqtt.MQTT_ERR_SUCCESS:
+                log.warning("uplink.rc", "Publish RC=%s; will retry", info.rc)
+                break
+            _inflight[info.mid] = batch
+            _inflight_ids.update(id(m) for m in batch)
+            _record_delivery(batch)
+            _batch_sent()
+    except Exception as e:
+        log.error("uplink.error", "MQTT publish error: %s", e)
+    _report_progress(buffer)
+
+
+def flush_backfill(client, buffer, topic, qos=1, min_age=120.0, batch_bytes=65536, level=6):
     """
-    global _last_ping_id, _last_echo_time, _network_bad_since
+    Replay historical messages (older than min_age) oldest first, as one
+    compressed batch per call on the backfill topic (see utils/backfill.py).
+    At most one batch is in flight: with QoS>0 its messages leave the buffer
+    on PUBACK, so the broker's acks pace the replay next to the live path.
+    Logs and records the catch-up time once no historical message is left.
+    """
+    global _backfill_mid, _catchup, _track_acks
+    _track_acks = True
+    _reap_acks(buffer)
+    if _backfill_mid in _inflight or not client.is_connected():
+        return
+
+    now = get_clock().time()
+    batch, size = [], 0
+    for m in buffer:
+        if id(m) in _inflight_ids:
+            continue
+        info = message_info(m)
+        if info is not None and now - info[0] <= min_age:
+            break                       # live from here on (the buffer is in time order)
+        n = len(m)
+        if batch and size + n > batch_bytes:
+            break
+        batch.append(m)
+        size += n
+
+    if not batch:
+        if _catchup is not None:        # last batch acked, nothing historical left
+            _catchup_done()
+        return
+
+    try:
+        blob = encode_backfill(batch, level)
+        info = _publish(client, topic, blob, qos, False, len(batch))
+    except Exception as e:
+        log.error("backfill.error", "Backfill publish error: %s", e)
+        return
+    if getattr(info, "rc", 0) != mqtt.MQTT_ERR_SUCCESS:
+        log.warning("backfill.rc", "Backfill publish RC=%s; will retry", info.rc)
+        return
+
+    if _catchup is None:
+        _catchup = {"since": get_clock().monotonic(), "messages": 0, "bytes": 0, "sent_bytes": 0,
+                    "batches": 0}
+        log.info("backfill.start", "Backlog detected: replaying messages older than %.0fs on %s",
+                 min_age, topic)
+    _catchup["messages"] += len(batch)
+    _catchup["bytes"] += size
+    _catchup["sent_bytes"] += len(blob)
+    _catchup["batches"] += 1
+    metrics.incr("backfill_batches")
+    metrics.incr("backfill_messages", len(batch))
+    metrics.incr("backfill_bytes", len(blob))
+
+    if qos:
+        _inflight[info.mid] = batch
+        _inflight_ids.update(id(m) for m in batch)
+        _backfill_mid = info.mid
+    else:
+        for m in batch:
+            _discard(buffer, m)
+    _record_delivery(batch)
+
+
+def _catchup_done():
+    """The backlog is replayed: report how long it took."""
+    global _catchup
+    c, _catchup = _catchup, None
+    elapsed = get_clock().monotonic() - c["since"]
+    report = {"seconds": round(elapsed, 1), "messages": c["messages"], "bytes": c["bytes"],
+              "sent_bytes": c["sent_bytes"], "batches": c["batches"]}
+    _catchups.append(report)
+    metrics.gauge("backfill_catchup_s", report["seconds"])
+    metrics.incr("backfill_catchups")
+    log.info("backfill.done", "Backfill caught up in %.0fs: %d messages, %d B as %d B in %d batches",
+             elapsed, c["messages"], c["bytes"], c["sent_bytes"], c["batches"])
+
+
+def backfill_report():
+    """Finished catch-ups (newest last) and the one in progress, if any."""
+    current = None
+    if _catchup is not None:
+        current = {k: _catchup[k] for k in ("messages", "bytes", "sent_bytes", "batches")}
+        current["seconds"] = round(get_clock().monotonic() - _catchup["since"], 1)
+    return {"done": list(_catchups), "current": current}
 
+
+# -------------------- WATCHDOG LOGIC --------------------
+
+def _watchdog_setup(config):
+    """Read watchdog settings; None when there is no nodeId to ping on."""
     node_id = config.get("device", {}).get("nodeId")
     if not node_id:
         print("[WATCHDOG] No device.nodeId in config; watchdog disabled.")
-        return
+        return None
 
     wd_conf = config.get("watchdog", {})
-    WATCHDOG_INTERVAL = float(wd_conf.get("interval", DEFAULT_WATCHDOG_INTERVAL))
-    WATCHDOG_TIMEOUT = float(wd_conf.get("timeout", DEFAULT_WATCHDOG_TIMEOUT))
-    MAX_RECONNECT_TRIES = int(wd_conf.get("max_reconnect_tries", DEFAULT_MAX_RECONNECT_TRIES))
-    NETWORK_BAD_REBOOT_DELAY = float(wd_conf.get("network_bad_reboot_delay", DEFAULT_NETWORK_BAD_REBOOT_DELAY))
-    PING_TARGET = wd_conf.get("ping_target", DEFAULT_PING_TARGET)
+    wd = {
+        "node_id": node_id,
+        "interval": float(wd_conf.get("interval", DEFAULT_WATCHDOG_INTERVAL)),
+        "timeout": float(wd_conf.get("timeout", DEFAULT_WATCHDOG_TIMEOUT)),
+        "max_reconnect_tries": int(wd_conf.get("max_reconnect_tries", DEFAULT_MAX_RECONNECT_TRIES)),
+        "network_bad_reboot_delay": float(wd_conf.get("network_bad_reboot_delay", DEFAULT_NETWORK_BAD_REBOOT_DELAY)),
+        "ping_target": wd_conf.get("ping_target", DEFAULT_PING_TARGET),
+        "reconnect_attempts": 0,
+    }
+    print(f"[WATCHDOG] Started. interval={wd['interval']}s, timeout={wd['timeout']}s, "
+          f"ping_target={wd['ping_target']}")
+    return wd
+
+
+def _watchdog_ping(client, wd):
+    """Publish a ping on the nodeId topic; the echo comes back through on_message."""
+    global _last_ping_id, _last_echo_time
+    clock = get_clock()
+    ping_id = int(clock.time() * 1000)  # ms timestamp as id
+    payload = json.dumps({
+        "type": "watchdog",
+        "id": ping_id,
+        "ts": clock.time(),
+        "node_id": wd["node_id"],
+    })
+
+    with _watchdog_lock:
+        _last_ping_id = ping_id
+        if _last_echo_time is None:
+            _last_echo_time = clock.time()
 
-    reconnect_attempts = 0
+    try:
+        client.publish(wd["node_id"], payload, qos=1)
+        # print(f"[WATCHDOG] Sent ping_id={ping_id} on topic={wd['node_id']}")
+    except Exception as e:
+        print(f"[WATCHDOG] Publish error: {e}")
 
-    print(f"[WATCHDOG] Started. interval={WATCHDOG_INTERVAL}s, timeout={WATCHDOG_TIMEOUT}s, "
-          f"ping_target={PING_TARGET}")
 
-    while True:
-        # 1) Send watchdog ping
-        ping_id = int(time.time() * 1000)  # ms timestamp as id
-        payload = json.dumps({
-            "type": "watchdog",
-            "id": ping_id,
-            "ts": time.time(),
-            "node_id": node_id,
-        })
+def _watchdog_check(client, wd):
+    """
+    Check echo age; reconnect, then reboot after a long network+MQTT failure.
+    Returns False once a reboot was requested.
+    """
+    global _network_bad_since, _last_echo_time
+    now = get_clock().time()
+    with _watchdog_lock:
+        elapsed = now - (_last_echo_time or now)
 
-        with _watchdog_lock:
-            _last_ping_id = ping_id
-            if _last_echo_time is None:
-                _last_echo_time = time.time()
+    if elapsed > wd["timeout"]:
+        log.warning("watchdog.echo", "No echo for %.1fs, checking MQTT + network", elapsed)
 
+        # a) Try MQTT reconnect
         try:
-            client.publish(node_id, payload, qos=1)
-            # print(f"[WATCHDOG] Sent ping_id={ping_id} on topic={node_id}")
+            client.reconnect()
+            wd["reconnect_attempts"] += 1
+            log.info("watchdog.reconnect", "Reconnect attempt %d", wd["reconnect_attempts"])
         except Exception as e:
-            print(f"[WATCHDOG] Publish error: {e}")
+            log.warning("watchdog.reconnect", "Reconnect failed: %s", e)
+            wd["reconnect_attempts"] += 1
 
-        time.sleep(WATCHDOG_INTERVAL)
+        # b) Check network
+        net_ok = _hooks["check_network"](wd["ping_target"])
+        if net_ok:
+            log.warning("watchdog.net", "Network OK, so likely broker/topic issue. Not rebooting yet.")
+            _network_bad_since = None
+        else:
+            if _network_bad_since is None:
+                _network_bad_since = now
+                print("[NET] Network appears DOWN, starting bad timer...")
+            else:
+                bad_duration = now - _network_bad_since
+                log.warning("watchdog.net", "Network down for %.1fs", bad_duration)
+
+                if (bad_duration > wd["network_bad_reboot_delay"] and
+                        wd["reconnect_attempts"] >= wd["max_reconnect_tries"]):
+                    log.error("watchdog.reboot", "Long network+MQTT failure. REBOOTING RASPBERRY PI.")
+                    _hooks["reboot"]()
+                    # Only reached when the reboot is simulated: start over like a fresh boot
+                    with _watchdog_lock:
+                        _last_echo_time = None
+                    _network_bad_since = None
+                    wd["reconnect_attempts"] = 0
+                    return False
+    else:
+        # healthy again
+        wd["reconnect_attempts"] = 0
+        _network_bad_since = None
+    return True
 
-        # 2) Check echo age
-        now = time.time()
-        with _watchdog_lock:
-            elapsed = now - (_last_echo_time or now)
 
-        if elapsed > WATCHDOG_TIMEOUT:
-            print(f"[WATCHDOG] No echo for {elapsed:.1f}s ? checking MQTT + network")
+def _watchdog_loop(client, config):
+    """
+    Background thread:
+      - publish watchdog on nodeId topic
+      - expect echo (because we subscribe to nodeId)
+      - if no echo + reconnect + network bad for long ? reboot
+    """
+    wd = _watchdog_setup(config)
+    if wd is None:
+        return
+
+    while True:
+        _watchdog_ping(client, wd)
+        get_clock().sleep(wd["interval"])
+        if not _watchdog_check(client, wd):
+            get_clock().sleep(10)
+            break
 
-            # 2a) Try MQTT reconnect
-            try:
-                client.reconnect()
-                reconnect_attempts += 1
-                print(f"[WATCHDOG] Reconnect attempt {reconnect_attempts}")
-            except Exception as e:
-                print(f"[WATCHDOG] Reconnect failed: {e}")
-                reconnect_attempts += 1
-
-            # 2b) Check network
-            net_ok = _check_network(PING_TARGET)
-            if net_ok:
-                print("[NET] Network OK, so likely broker/topic issue. Not rebooting yet.")
-                _network_bad_since = None
-            else:
-                if _network_bad_since is None:
-                    _network_bad_since = time.time()
-                    print("[NET] Network appears DOWN, starting bad timer...")
-                else:
-                    bad_duration = now - _network_bad_since
-                    print(f"[NET] Network down for {bad_duration:.1f}s")
-
-                    if (bad_duration > NETWORK_BAD_REBOOT_DELAY and
-                            reconnect_attempts >= MAX_RECONNECT_TRIES):
-                        print("[WATCHDOG] Long network+MQTT failure. REBOOTING RASPBERRY PI.")
-                        os.system("sudo reboot")
-                        time.sleep(10)
-                        break
-        else:
-            # healthy again
-            reconnect_attempts = 0
-            _network_bad_since = None
 
-def start_watchdog(client, config):
+def start_watchdog(client, config, scheduler=None):
     """
     Public API: call from main.py after setup_mqtt().
+    With a scheduler the watchdog runs as a task on it (used by virtual-time soak runs)
+    instead of in its own thread.
     """
-    t = threading.Thread(target=_watchdog_loop, args=(client, config), daemon=True)
-    t.start()
+    if scheduler is None:
+        t = threading.Thread(target=_watchdog_loop, args=(client, config), daemon=True)
+        t.start()
+        return
+
+    wd = _watchdog_setup(config)
+    if wd is None:
+        return
+    pinged = [False]
+
+    def tick():
+        if pinged[0]:
+            _watchdog_check(client, wd)
+        _watchdog_ping(client, wd)
+        pinged[0] = True
+
+    scheduler.add("watchdog", wd["interval"], tick)
@@ -1,5 +1,35 @@
-from .bme680_sensor import BME680Sensor
-from .veml7700_sensor import VEML7700Sensor
-from .sound_sensor import SoundSensor
+import importlib
 
-__all__ = ["BME680Sensor", "VEML7700Sensor", "SoundSensor"]
+from .acquisition import BusArbiter, RingBuffer, JitterStats, AcquisitionWorker
+from .simulated import SimulatedBME680Sensor, SimulatedVEML7700Sensor, SimulatedSoundSensor
+from .factory import create_sensors, simulation_enabled
+
+# Hardware drivers import board/busio/adafruit_* at module level, so they are
+# loaded on first access; simulated runs never touch them.
+_DRIVERS = {
+    "BME680Sensor": ".bme680_sensor",
+    "VEML7700Sensor": ".veml7700_sensor",
+    "SoundSensor": ".sound_sensor",
+}
+
+
+def __getattr__(name):
+    if name in _DRIVERS:
+        return getattr(importlib.import_module(_DRIVERS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = [
+    "BME680Sensor",
+    "VEML7700Sensor",
+    "SoundSensor",
+    "BusArbiter",
+    "RingBuffer",
+    "JitterStats",
+    "AcquisitionWorker",
+    "SimulatedBME680Sensor",
+    "SimulatedVEML7700Sensor",
+    "SimulatedSoundSensor",
+    "create_sensors",
+    "simulation_enabled",
+]
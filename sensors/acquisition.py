@@ -0,0 +1,171 @@
+# sensors/acquisition.py
+
+import threading
+import time
+from collections import deque
+
+from utils import log, metrics
+
+
+class BusArbiter:
+    """
+    Thread-safe stand-in for busio.I2C.
+
+    Adafruit drivers wrap every register access in I2CDevice, which calls
+    try_lock()/unlock() around a single transaction. Serializing exactly
+    there lets several sensor threads share one bus while holding it only
+    for one transaction at a time. Everything else is delegated.
+    """
+
+    def __init__(self, i2c, acquire_timeout=0.05):
+        self._i2c = i2c
+        self._lock = threading.Lock()
+        self._acquire_timeout = acquire_timeout
+        self._held_since = 0.0
+        self.transactions = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.hold_total = 0.0
+
+    def try_lock(self):
+        t0 = time.perf_counter()
+        # Block briefly instead of letting I2CDevice spin on a busy bus
+        if not self._lock.acquire(timeout=self._acquire_timeout):
+            return False
+        if not self._i2c.try_lock():
+            self._lock.release()
+            return False
+        now = time.perf_counter()
+        waited = now - t0
+        self.wait_total += waited
+        if waited > self.wait_max:
+            self.wait_max = waited
+        self._held_since = now
+        return True
+
+    def unlock(self):
+        self.hold_total += time.perf_counter() - self._held_since
+        self.transactions += 1
+        self._i2c.unlock()
+        self._lock.release()
+
+    def summary(self):
+        n = self.transactions or 1
+        return (f"bus: {self.transactions} transactions, "
+                f"wait avg={self.wait_total / n * 1e3:.2f}ms max={self.wait_max * 1e3:.2f}ms, "
+                f"hold avg={self.hold_total / n * 1e3:.2f}ms")
+
+    def __getattr__(self, name):
+        return getattr(self._i2c, name)
+
+
+class RingBuffer:
+    """Bounded sample buffer; one producer thread, one consumer thread."""
+
+    def __init__(self, size):
+        self._items = deque(maxlen=int(size))
+        self._lock = threading.Lock()   # resize() swaps the deque under the producer
+        self.overruns = 0
+
+    @property
+    def size(self):
+        return self._items.maxlen
+
+    def resize(self, size):
+        """Change the capacity, keeping the newest samples."""
+        with self._lock:
+            self._items = deque(self._items, maxlen=int(size))
+
+    def append(self, item):
+        with self._lock:
+            if len(self._items) == self._items.maxlen:
+                self.overruns += 1      # oldest sample is overwritten
+            self._items.append(item)
+
+    def drain(self):
+        """Pop and return everything currently buffered, oldest first."""
+        out = []
+        with self._lock:
+            pop = self._items.popleft
+            try:
+                while True:
+                    out.append(pop())
+            except IndexError:
+                return out
+
+    def __len__(self):
+        return len(self._items)
+
+
+class JitterStats:
+    """Deviation of actual sample spacing from the nominal sampling period."""
+
+    def __init__(self, period):
+        self.period = float(period)
+        self.reset()
+
+    def reset(self):
+        self._last = None
+        self.count = 0
+        self.jitter_total = 0.0
+        self.jitter_max = 0.0
+        self.read_total = 0.0
+        self.read_max = 0.0
+
+    def mark(self, start, read_time):
+        """start: monotonic time the read began; read_time: seconds it took."""
+        if self._last is not None:
+            jitter = abs((start - self._last) - self.period)
+            self.jitter_total += jitter
+            if jitter > self.jitter_max:
+                self.jitter_max = jitter
+        self._last = start
+        self.count += 1
+        self.read_total += read_time
+        if read_time > self.read_max:
+            self.read_max = read_time
+
+    def summary(self):
+        n = max(self.count - 1, 1)
+        return (f"{self.count} samples @ {self.period}s, "
+                f"jitter avg={self.jitter_total / n * 1e3:.2f}ms max={self.jitter_max * 1e3:.2f}ms, "
+                f"read avg={self.read_total / max(self.count, 1) * 1e3:.2f}ms "
+                f"max={self.read_max * 1e3:.2f}ms")
+
+
+class AcquisitionWorker(threading.Thread):
+    """Reads one sensor at a fixed period and pushes (timestamp, values) into a ring."""
+
+    def __init__(self, name, read, period, ring_size):
+        super().__init__(name=f"acq-{name}", daemon=True)
+        self.sensor_name = name
+        self.read = read
+        self.period = float(period)
+        self.ring = RingBuffer(ring_size)
+        self.jitter = JitterStats(period)
+        self.errors = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        next_due = time.monotonic()
+        while not self._stop_event.is_set():
+            start = time.monotonic()
+            try:
+                values = self.read()
+                self.ring.append((start, values))
+            except Exception as e:
+                self.errors += 1
+                metrics.incr("read_errors")
+                log.warning(f"acq.{self.sensor_name}", "%s read error: %s", self.sensor_name, e)
+            read_time = time.monotonic() - start
+            self.jitter.mark(start, read_time)
+            metrics.observe("read", read_time)
+
+            next_due += self.period
+            now = time.monotonic()
+            if next_due < now:          # overran a period: resync instead of bursting
+                next_due = now
+            self._stop_event.wait(next_due - now)
+
+    def stop(self):
+        self._stop_event.set()
@@ -1,9 +1,14 @@
+import time
 import board
 import busio
 import adafruit_bme680
 
+# Driver properties set from config["bme680"] when present
+_OVERSAMPLE_KEYS = ("temperature_oversample", "humidity_oversample", "pressure_oversample", "filter_size")
+
+
 class BME680Sensor:
-    def __init__(self, i2c):
+    def __init__(self, i2c, settings=None):
         for addr in (0x76, 0x77):
             try:
                 self.sensor = adafruit_bme680.Adafruit_BME680_I2C(i2c, address=addr)
@@ -13,14 +18,61 @@ class BME680Sensor:
                 self.sensor = None
         if self.sensor is None:
             raise RuntimeError("No BME680 detected on I2C bus")
-        
+
         self.sensor.sea_level_pressure = 1013.25
 
+        settings = settings or {}
+        self.include_altitude = bool(settings.get("include_altitude", False))
+        self.last_latency = 0.0
+        self.latency_max = 0.0       # since the last metrics report (see main.send_metrics)
+        self._apply_settings(settings)
+
+    def _apply_settings(self, settings):
+        """Oversampling, IIR filter and gas heater profile (skipped if the driver lacks them)."""
+        for key in _OVERSAMPLE_KEYS:
+            if key in settings and hasattr(self.sensor, key):
+                try:
+                    setattr(self.sensor, key, settings[key])
+                except Exception as e:
+                    print(f"BME680: could not set {key}={settings[key]}: {e}")
+        if "heater_temperature" in settings and hasattr(self.sensor, "set_gas_heater"):
+            try:
+                self.sensor.set_gas_heater(int(settings["heater_temperature"]),
+                                           int(settings.get("heater_duration", 150)))
+            except Exception as e:
+                print(f"BME680: could not set gas heater profile: {e}")
+
+    def snapshot(self):
+        """
+        One forced-mode measurement cycle, all fields taken from it.
+
+        The first property access runs the measurement; the driver's refresh
+        guard is then held open so the remaining properties reuse that result
+        instead of possibly triggering another conversion.
+        """
+        s = self.sensor
+        t0 = time.perf_counter()
+        # _min_refresh_time is the private refresh_rate guard of adafruit_bme680's
+        # _perform_reading(), unchanged from 3.0.3 through 3.7.16. Without it each
+        # property below runs its own measurement (five conversions, not one).
+        refresh = getattr(s, "_min_refresh_time", None)
+        try:
+            values = {"temperature": s.temperature}
+            if refresh is not None:
+                s._min_refresh_time = float("inf")
+            values["humidity"] = s.humidity
+            values["pressure"] = s.pressure
+            values["gas"] = s.gas
+            if self.include_altitude:
+                values["altitude"] = s.altitude
+        finally:
+            if refresh is not None:
+                s._min_refresh_time = refresh
+        self.last_latency = time.perf_counter() - t0
+        if self.last_latency > self.latency_max:
+            self.latency_max = self.last_latency
+        values["latency_ms"] = round(self.last_latency * 1e3, 2)
+        return values
+
     def read(self):
-        return {
-            "temperature": self.sensor.temperature,
-            "humidity": self.sensor.humidity,
-            "pressure": self.sensor.pressure,
-            "gas": self.sensor.gas,
-            "altitude": self.sensor.altitude,
-        }
+        return self.snapshot()
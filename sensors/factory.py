@@ -0,0 +1,45 @@
+# sensors/factory.py
+
+import os
+import random
+
+from .acquisition import BusArbiter
+from .simulated import SimulatedBME680Sensor, SimulatedVEML7700Sensor, SimulatedSoundSensor
+
+SIMULATE_ENV = "SENSORBOX_SIMULATE"   # "1" forces simulated sensors, "0" forces hardware
+
+
+def simulation_enabled(config):
+    env = os.environ.get(SIMULATE_ENV, "").strip().lower()
+    if env:
+        return env not in ("0", "false", "no", "off")
+    return bool(config.get("simulation", {}).get("enabled", False))
+
+
+def create_sensors(config, threaded=False):
+    """
+    Build (i2c, bme, veml, sound) from config.
+    i2c is None for simulated sensors, a BusArbiter when threaded.
+    """
+    if simulation_enabled(config):
+        sim = config.get("simulation", {})
+        rng = random.Random(sim.get("seed"))
+        print("[SIM] Using simulated sensors (no I2C bus)")
+        return (
+            None,
+            SimulatedBME680Sensor(sim, rng, config.get("bme680")),
+            SimulatedVEML7700Sensor(sim, rng),
+            SimulatedSoundSensor(sim, rng),
+        )
+
+    # Hardware drivers pull in board/busio/adafruit_*; import only when needed
+    import board
+    import busio
+    from .bme680_sensor import BME680Sensor
+    from .veml7700_sensor import VEML7700Sensor
+    from .sound_sensor import SoundSensor
+
+    i2c = busio.I2C(board.SCL, board.SDA)
+    if threaded:
+        i2c = BusArbiter(i2c)
+    return i2c, BME680Sensor(i2c, config.get("bme680")), VEML7700Sensor(i2c), SoundSensor(i2c)
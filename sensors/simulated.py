@@ -0,0 +1,165 @@
+# sensors/simulated.py
+#
+# Drop-in stand-ins for BME680Sensor, VEML7700Sensor and SoundSensor that
+# need no I2C bus: synthetic signals or replayed traces, with optional
+# injected read latency and faults.
+
+import csv
+import json
+import math
+
+from utils.clock import get_clock
+
+# Synthetic signal defaults per key: base, daily swing amplitude, noise stddev
+BME_SIGNALS = {
+    "temperature": (22.0, 1.5, 0.05),
+    "humidity":    (40.0, 5.0, 0.2),
+    "pressure":    (1013.0, 2.0, 0.05),
+    "gas":         (50000.0, 8000.0, 400.0),
+}
+VEML_SIGNALS = {"lux": (300.0, 250.0, 5.0)}
+SOUND_SIGNALS = {"dB": (45.0, 5.0, 3.0)}
+
+DAY = 86400.0
+
+
+class SignalGenerator:
+    """base + amplitude * daily sine + gaussian noise + slow random-walk drift."""
+
+    def __init__(self, base, amplitude, noise, rng, period=DAY, drift=0.0, floor=None):
+        self.base = base
+        self.amplitude = amplitude
+        self.noise = noise
+        self.period = period
+        self.drift = drift
+        self.floor = floor
+        self.rng = rng
+        self._walk = 0.0
+
+    def sample(self, t):
+        if self.drift:
+            self._walk += self.rng.gauss(0.0, self.drift)
+        v = (self.base + self._walk +
+             self.amplitude * math.sin(2 * math.pi * t / self.period) +
+             self.rng.gauss(0.0, self.noise))
+        if self.floor is not None and v < self.floor:
+            v = self.floor
+        return v
+
+
+class TraceReplay:
+    """Cycles through recorded samples from a CSV (header row) or JSON-lines file."""
+
+    def __init__(self, path):
+        self.rows = []
+        with open(path, "r") as f:
+            if path.endswith((".jsonl", ".json")):
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        self.rows.append({k: float(v) for k, v in json.loads(line).items()})
+            else:
+                for row in csv.DictReader(f):
+                    self.rows.append({k: float(v) for k, v in row.items() if v not in ("", None)})
+        if not self.rows:
+            raise ValueError(f"Trace {path} has no samples")
+        self._i = 0
+
+    def next(self):
+        row = self.rows[self._i]
+        self._i = (self._i + 1) % len(self.rows)
+        return dict(row)
+
+
+class _SimulatedSensor:
+    """Shared plumbing: signal source, latency and fault injection."""
+
+    def __init__(self, name, signals, sim_cfg, rng, floors=None):
+        self.name = name
+        self.rng = rng
+        self.latency = float(sim_cfg.get("latency", {}).get(name, 0.0))
+        self.fault_rate = float(sim_cfg.get("fault_rate", {}).get(name, 0.0))
+        trace = sim_cfg.get("traces", {}).get(name)
+        self.trace = TraceReplay(trace) if trace else None
+        floors = floors or {}
+        self.signals = {
+            k: SignalGenerator(base, amp, noise, rng, floor=floors.get(k))
+            for k, (base, amp, noise) in signals.items()
+        }
+
+    def _values(self):
+        if self.latency:
+            # +-20 % jitter around the configured read latency
+            get_clock().sleep(self.latency * self.rng.uniform(0.8, 1.2))
+        if self.fault_rate and self.rng.random() < self.fault_rate:
+            raise OSError(f"[SIM] injected I2C fault on {self.name}")
+        if self.trace is not None:
+            return self.trace.next()
+        t = get_clock().time()
+        return {k: g.sample(t) for k, g in self.signals.items()}
+
+
+class SimulatedBME680Sensor(_SimulatedSensor):
+    def __init__(self, sim_cfg, rng, settings=None):
+        super().__init__("BME680", BME_SIGNALS, sim_cfg, rng, floors={"gas": 1000.0, "humidity": 0.0})
+        self.include_altitude = bool((settings or {}).get("include_altitude", False))
+        self.last_latency = 0.0
+        self.latency_max = 0.0
+
+    def snapshot(self):
+        clock = get_clock()
+        t0 = clock.monotonic()
+        values = self._values()
+        if self.include_altitude:
+            values["altitude"] = 44330.0 * (1.0 - (values["pressure"] / 1013.25) ** 0.1903)
+        self.last_latency = clock.monotonic() - t0
+        self.latency_max = max(self.latency_max, self.last_latency)
+        values["latency_ms"] = round(self.last_latency * 1e3, 2)
+        return values
+
+    def read(self):
+        return self.snapshot()
+
+
+class SimulatedVEML7700Sensor(_SimulatedSensor):
+    def __init__(self, sim_cfg, rng):
+        super().__init__("VEML7700", VEML_SIGNALS, sim_cfg, rng, floors={"lux": 0.0})
+
+    def read(self):
+        return self._values()
+
+
+class SimulatedSoundSensor(_SimulatedSensor):
+    """Same calibration as SoundSensor; produces dB first and derives the raw code."""
+
+    def __init__(self, sim_cfg, rng):
+        super().__init__("SOUND", SOUND_SIGNALS, sim_cfg, rng, floors={"dB": 30.0})
+        self.V_MIN, self.V_MAX = 0.6, 2.6
+        self.DB_MIN, self.DB_MAX = 30, 130
+        self._burst = 0
+        self._sps = None
+
+    def voltage_to_db(self, voltage):
+        voltage = min(max(voltage, self.V_MIN), self.V_MAX)
+        return self.DB_MIN + (voltage - self.V_MIN) * (self.DB_MAX - self.DB_MIN) / (self.V_MAX - self.V_MIN)
+
+    def _db_to_voltage(self, db):
+        return self.V_MIN + (db - self.DB_MIN) * (self.V_MAX - self.V_MIN) / (self.DB_MAX - self.DB_MIN)
+
+    def read(self):
+        values = self._values()
+        db = min(max(values.get("dB", self.DB_MIN), self.DB_MIN), self.DB_MAX)
+        voltage = self._db_to_voltage(db)
+        return {"raw": int(voltage * 32767 / 4.096), "voltage": voltage, "dB": db}
+
+    def start_burst(self, sps=250, samples=125):
+        self._sps = int(sps)
+        self._burst = int(samples)
+
+    def read_burst(self):
+        """One burst of dB levels; sleeps for the burst duration like the real ADC."""
+        base = self._values().get("dB", 45.0)
+        get_clock().sleep(self._burst / self._sps)
+        noise = self.signals["dB"].noise
+        return [min(max(self.rng.gauss(base, noise), self.DB_MIN), self.DB_MAX)
+                for _ in range(self._burst)]
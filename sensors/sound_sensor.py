@@ -1,6 +1,19 @@
+import time
+from array import array
+
 import adafruit_ads1x15.ads1115 as ADS
+from adafruit_ads1x15.ads1x15 import Mode
 from adafruit_ads1x15.analog_in import AnalogIn
 
+try:                      # optional: vectorized raw -> dB conversion
+    import numpy as np
+except ImportError:
+    np = None
+
+# Full-scale voltage per PGA gain (ADS1115 datasheet)
+PGA_RANGE = {2 / 3: 6.144, 1: 4.096, 2: 2.048, 4: 1.024, 8: 0.512, 16: 0.256}
+
+
 class SoundSensor:
     def __init__(self, i2c, channel=ADS.P0):
         self.ads = ADS.ADS1115(i2c)
@@ -8,6 +21,8 @@ class SoundSensor:
         # Calibration constants (SEN0232 datasheet)
         self.V_MIN, self.V_MAX = 0.6, 2.6
         self.DB_MIN, self.DB_MAX = 30, 130
+        self._raw = None          # preallocated burst buffer (see start_burst)
+        self._sps = None
 
     def voltage_to_db(self, voltage):
         if voltage < self.V_MIN:
@@ -16,10 +31,50 @@ class SoundSensor:
             voltage = self.V_MAX
         return self.DB_MIN + (voltage - self.V_MIN) * (self.DB_MAX - self.DB_MIN) / (self.V_MAX - self.V_MIN)
 
+    def raw_to_voltage(self, raw):
+        return raw * PGA_RANGE[self.ads.gain] / 32767
+
     def read(self):
-        voltage = self.chan.voltage
+        # One conversion; voltage is derived from the raw code instead of converting twice
+        raw = self.chan.value
+        voltage = self.raw_to_voltage(raw)
         return {
-            "raw": self.chan.value,
+            "raw": raw,
             "voltage": voltage,
             "dB": self.voltage_to_db(voltage)
         }
+
+    # -------- burst acquisition --------
+    def start_burst(self, sps=250, samples=125):
+        """Switch the ADC to continuous conversion at `sps` and preallocate the burst buffer."""
+        self.ads.mode = Mode.CONTINUOUS
+        self.ads.data_rate = int(sps)
+        self._sps = int(sps)
+        self._raw = array("i", [0]) * int(samples)
+        self.chan.value   # first read starts the continuous conversions
+
+    def read_burst(self):
+        """
+        Collect one burst of raw codes at the configured rate and return the
+        dB levels (numpy array when available, else a list).
+        """
+        raw = self._raw
+        period = 1.0 / self._sps
+        chan = self.chan
+        next_due = time.perf_counter()
+        for i in range(len(raw)):
+            raw[i] = chan.value       # continuous mode: just reads the last conversion
+            next_due += period
+            delay = next_due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return self.levels(raw)
+
+    def levels(self, raw):
+        """Vectorized raw code -> dB using the SEN0232 linear calibration."""
+        scale = PGA_RANGE[self.ads.gain] / 32767
+        slope = (self.DB_MAX - self.DB_MIN) / (self.V_MAX - self.V_MIN)
+        if np is not None:
+            v = np.clip(np.frombuffer(raw, dtype=np.intc) * scale, self.V_MIN, self.V_MAX)
+            return self.DB_MIN + (v - self.V_MIN) * slope
+        return [self.voltage_to_db(r * scale) for r in raw]
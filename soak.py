@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# soak.py
+#
+# Accelerated soak run: the real main loop on a virtual clock, simulated
+# sensors and an in-process loopback broker, so days of node behaviour
+# (heartbeats, IP refreshes, outages and recovery) run in seconds.
+#
+#   python soak.py --days 3 --outage 3600:7200 --outage 86400:90000
+#   python soak.py --outage 3600:14400 --bandwidth 2000 --policy aoi
+#
+# Prints a JSON report: publishes, bytes, buffer depth, reboots, memory and
+# the mean node-side Age of Information per stream.
+
+import argparse
+import contextlib
+import copy
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from config import DEFAULTS
+from network import LoopbackClient, set_system_hooks, get_drain_policy, backfill_report, POLICIES
+from sensors.factory import SIMULATE_ENV
+from utils.clock import VirtualClock, set_clock
+from utils.config_manager import load_config
+from utils.backfill import decode_backfill, is_backfill
+from utils.compact_codec import build_dictionary, decode_compact, is_compact
+from utils.sequence import SequenceTracker
+
+DAY = 86400.0
+
+
+def _parse_outage(text):
+    start, _, end = text.partition(":")
+    start, end = float(start), float(end)
+    if end <= start:
+        raise argparse.ArgumentTypeError(f"outage {text!r}: end must be after start")
+    return start, end
+
+
+def soak_config(base, seed, sampling_floor, policy=None, backfill=None):
+    """Copy of the node config made safe for a soak run."""
+    config = copy.deepcopy(base)
+    config.setdefault("simulation", {})["enabled"] = True
+    if seed is not None:
+        config["simulation"]["seed"] = seed
+    config.setdefault("acquisition", {})["threaded"] = False   # one thread drives the clock
+    config.setdefault("buffer", {})["backend"] = "memory"
+    # Keep the soak's boot epochs out of the node's own epoch file
+    config.setdefault("sequence", dict(DEFAULTS["sequence"]))["path"] = os.path.join(
+        tempfile.gettempdir(), "sensorbox_soak_epoch")
+    if policy:
+        config["buffer"]["drain_policy"] = policy
+    if backfill is not None:
+        config.setdefault("backfill", dict(DEFAULTS["backfill"]))["enabled"] = backfill
+    # Sub-second sampling only changes how many reads feed the stats, not the
+    # uplink; a floor keeps multi-day runs fast
+    sampling = config.setdefault("sampling", dict(DEFAULTS["sampling"]))
+    for name, period in sampling.items():
+        sampling[name] = max(float(period), sampling_floor)
+    for channel in config.get("adaptive", {}).values():
+        if isinstance(channel, dict) and channel.get("sampling"):
+            lo, hi = channel["sampling"]
+            channel["sampling"] = [max(lo, sampling_floor), max(hi, sampling_floor)]
+    return config
+
+
+def run_soak(days=1.0, outages=(), seed=0, sampling_floor=1.0, config=None, verbose=False,
+             bandwidth=None, policy=None, backfill=None):
+    """Run the node for `days` of virtual time and return the report dict."""
+    import main as node
+
+    os.environ[SIMULATE_ENV] = "1"
+    config = soak_config(config if config is not None else load_config(), seed, sampling_floor, policy, backfill)
+    clock = VirtualClock()
+    set_clock(clock)
+
+    client = LoopbackClient(config, outages, clock, bandwidth)
+    reboots = []
+    set_system_hooks(reboot=lambda: reboots.append(clock.monotonic()),
+                     check_network=lambda target: client._link_up())
+
+    # Ingestion-side view: every delivered SensorData message through the gap/duplicate tracker
+    tracker = SequenceTracker()
+    dictionary = build_dictionary(config.get("sensorIds", {}))
+
+    def ingest(message):
+        if is_backfill(message):
+            for inner in decode_backfill(message):
+                ingest(inner)
+            return
+        payload = decode_compact(message, dictionary) if is_compact(message) else json.loads(message)
+        if payload.get("dataType") == "SensorData":
+            tracker.observe_payload(payload)
+
+    client.sink = lambda topic, payload: ingest(payload)
+
+    depth = {"max": 0, "saturated": 0}
+    aoi = {}                   # stream -> [sum of samples, samples]
+    maxlen = int(config["buffer"].get("maxlen", 1000))
+
+    def probe(scheduler, buffer):
+        def sample_depth():
+            n = len(buffer)
+            depth["max"] = max(depth["max"], n)
+            if n >= maxlen:
+                depth["saturated"] += 1
+            for stream, age in get_drain_policy().aoi().items():
+                total = aoi.setdefault(stream, [0.0, 0])
+                total[0] += age
+                total[1] += 1
+        scheduler.add("soak_depth", 10.0, sample_depth)
+
+    run_for = float(days) * DAY
+    tracemalloc.start()
+    wall0 = time.perf_counter()
+    out = sys.stdout if verbose else open(os.devnull, "w")
+    try:
+        with contextlib.redirect_stdout(out):
+            buffer = node.main(config=config, client=client, run_for=run_for, probe=probe)
+    finally:
+        if not verbose:
+            out.close()
+    wall = time.perf_counter() - wall0
+    mem_now, mem_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "virtual_seconds": clock.monotonic(),
+        "wall_seconds": round(wall, 3),
+        "speedup": round(clock.monotonic() / wall, 1) if wall else None,
+        "outages": [list(o) for o in client.outages],
+        "published": client.published,
+        "published_bytes": client.published_bytes,
+        "rejected": client.rejected,
+        "throttled": client.throttled,
+        "drain_policy": config["buffer"].get("drain_policy", "fifo"),
+        "aoi_mean_s": {s: round(t / n, 1) for s, (t, n) in sorted(aoi.items())},
+        "backfill": backfill_report(),
+        "sequence": _sequence_report(tracker),
+        "per_topic": {t: {"messages": c, "bytes": b} for t, (c, b) in client.per_topic.items()},
+        "disconnects": client.disconnects,
+        "reconnect_calls": client.reconnects,
+        "reboots": len(reboots),
+        "first_reboot_at": reboots[0] if reboots else None,
+        "buffer_depth_max": depth["max"],
+        "buffer_depth_final": len(buffer),
+        "buffer_saturated_samples": depth["saturated"],
+        "tracemalloc_current_kb": round(mem_now / 1024, 1),
+        "tracemalloc_peak_kb": round(mem_peak / 1024, 1),
+    }
+
+
+def _sequence_report(tracker):
+    """Tracker totals summed over epochs: missing = gaps still open, lost = gaps given up on."""
+    report = tracker.report()
+    epochs = [e for node in report["nodes"].values() for e in node.values()]
+    return {
+        "received": report["received"],
+        "duplicates": report["duplicates"],
+        "epochs": len(epochs),
+        "missing": sum(e["missing"] for e in epochs),
+        "lost": sum(e["lost"] for e in epochs),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Virtual-time soak run of the SensorBox node")
+    parser.add_argument("--days", type=float, default=1.0, help="virtual days to run")
+    parser.add_argument("--outage", type=_parse_outage, action="append", default=[],
+                        metavar="START:END", help="link down between these virtual seconds (repeatable)")
+    parser.add_argument("--seed", type=int, default=0, help="simulated sensor seed")
+    parser.add_argument("--sampling-floor", type=float, default=1.0,
+                        help="raise sampling periods below this many seconds (0 = as configured)")
+    parser.add_argument("--bandwidth", type=float, default=None,
+                        help="uplink bytes per second (default: unlimited)")
+    parser.add_argument("--policy", choices=POLICIES, default=None,
+                        help="drain policy (default: as configured)")
+    parser.add_argument("--backfill", action="store_true", default=None,
+                        help="replay the backlog on the backfill topic")
+    parser.add_argument("--verbose", action="store_true", help="show the node's own output")
+    args = parser.parse_args()
+
+    report = run_soak(args.days, args.outage, args.seed, args.sampling_floor, verbose=args.verbose,
+                      bandwidth=args.bandwidth, policy=args.policy, backfill=args.backfill)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
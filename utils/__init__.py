@@ -1,8 +1,12 @@
 from .device_info import get_ip_address, get_mac_address
 from .air_quality import gas_to_air_quality_fixed, air_quality_label
 from .payload_builder import build_bme_payload, build_veml_payload, build_sound_payload, build_IPMAC_payload, build_IamAlive_payload
+from .payload_compiler import PayloadCompiler
 from .config_manager import load_config, save_config
-from .stats_manager import init_stats, update_stats, finalize_stats
+from .stats_manager import init_stats, update_stats, finalize_stats, StatsAccumulator
+from .disk_queue import DiskQueue, create_buffer
+from .backlog import BacklogCompactor
+from .sequence import SequenceTracker
 
 __all__ = [
     # Device info
@@ -19,7 +23,8 @@ __all__ = [
     "build_sound_payload",
     "build_IPMAC_payload",
     "build_IamAlive_payload",
-    
+    "PayloadCompiler",
+
 
     # Config manager
     "load_config",
@@ -29,4 +34,13 @@ __all__ = [
     "init_stats",
     "update_stats",
     "finalize_stats",
+    "StatsAccumulator",
+
+    # Uplink buffer
+    "DiskQueue",
+    "create_buffer",
+    "BacklogCompactor",
+
+    # Message numbering
+    "SequenceTracker",
 ]
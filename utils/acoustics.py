@@ -0,0 +1,100 @@
+# utils/acoustics.py
+
+import math
+
+try:                      # optional: vectorized path on nodes that have numpy
+    import numpy as np
+except ImportError:
+    np = None
+
+DB_FLOOR = 30.0           # SEN0232 range, matches SoundSensor calibration
+DB_CEIL = 130.0
+BIN_WIDTH = 0.1           # exceedance levels are resolved to 0.1 dB
+_NBINS = int(round((DB_CEIL - DB_FLOOR) / BIN_WIDTH)) + 1
+
+
+class NoiseWindow:
+    """
+    Noise metrics over one publish window in constant memory.
+
+    Leq is accumulated as summed energy (10^(L/10)), never as an arithmetic
+    mean of dB. Lmin/Lmax are sample extremes; exceedance levels come from
+    a fixed 0.1 dB histogram, so any percentile can be read at the end.
+    Percentiles use the statistical convention: p90 == L10 (level exceeded
+    10 % of the time), p10 == L90.
+    """
+
+    __slots__ = ("energy", "count", "lmin", "lmax", "hist")
+
+    def __init__(self):
+        self.hist = np.zeros(_NBINS, dtype=np.int64) if np is not None else [0] * _NBINS
+        self.reset()
+
+    def reset(self):
+        self.energy = 0.0
+        self.count = 0
+        self.lmin = math.inf
+        self.lmax = -math.inf
+        if np is not None:
+            self.hist.fill(0)
+        else:
+            for i in range(_NBINS):
+                self.hist[i] = 0
+
+    def add(self, levels, offset=0.0):
+        """Add a burst of dB samples (sequence or numpy array); offset is added first."""
+        n = len(levels)
+        if n == 0:
+            return
+        if np is not None:
+            lv = np.asarray(levels, dtype=np.float64)
+            if offset:
+                lv = lv + offset
+            self.energy += float(np.power(10.0, lv / 10.0).sum())
+            self.lmin = min(self.lmin, float(lv.min()))
+            self.lmax = max(self.lmax, float(lv.max()))
+            idx = np.clip(np.rint((lv - DB_FLOOR) / BIN_WIDTH), 0, _NBINS - 1).astype(np.int64)
+            self.hist += np.bincount(idx, minlength=_NBINS)
+        else:
+            hist, energy = self.hist, 0.0
+            lo, hi = self.lmin, self.lmax
+            for l in levels:
+                l += offset
+                energy += 10.0 ** (l / 10.0)
+                if l < lo:
+                    lo = l
+                if l > hi:
+                    hi = l
+                i = int(round((l - DB_FLOOR) / BIN_WIDTH))
+                hist[min(max(i, 0), _NBINS - 1)] += 1
+            self.energy += energy
+            self.lmin, self.lmax = lo, hi
+        self.count += n
+
+    def percentile(self, pct):
+        """Level below which pct % of samples fall (histogram resolution)."""
+        if self.count == 0:
+            return None
+        target = pct / 100.0 * self.count
+        running = 0
+        for i, c in enumerate(self.hist):
+            running += int(c)
+            if running >= target and running > 0:
+                return DB_FLOOR + i * BIN_WIDTH
+        return DB_CEIL
+
+    def finalize(self, percentiles=()):
+        """{"avg": Leq, "min": Lmin, "max": Lmax, "count": n, "pNN": ...} like StatsAccumulator."""
+        if self.count == 0:
+            out = {"avg": None, "min": None, "max": None, "count": 0}
+        else:
+            out = {
+                "avg": round(10.0 * math.log10(self.energy / self.count), 2),
+                "min": round(self.lmin, 2),
+                "max": round(self.lmax, 2),
+                "count": self.count,
+            }
+        for pct in percentiles:
+            v = self.percentile(pct)
+            out[f"p{pct}"] = round(v, 2) if v is not None else None
+        return out
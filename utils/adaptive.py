@@ -0,0 +1,65 @@
+# utils/adaptive.py
+#
+# Adaptive sampling/publish periods: after every publish window the channel's
+# variability (per-key std from StatsAccumulator, or the window range for
+# sound bursts, and the change of the average since the last window) is
+# compared to a per-key reference. Quiet windows stretch the periods, busy
+# ones shrink them, always within the configured [min, max] bounds.
+
+
+class AdaptiveInterval:
+    """
+    One channel. `scale` multiplies the configured base periods; each target
+    period is clamped to its own bounds:
+
+        activity = max over keys of max(std, |avg - prev_avg|) / ref
+        activity > high -> scale *= shrink      (busy: sample/publish faster)
+        activity < low  -> scale *= grow        (idle: back off)
+    """
+
+    def __init__(self, refs, bounds, low=0.25, high=1.0, grow=1.5, shrink=0.5):
+        self.configure(refs, bounds, low, high, grow, shrink)
+        self.scale = 1.0
+        self.activity = None
+        self._prev_avg = {}
+
+    def configure(self, refs, bounds, low=0.25, high=1.0, grow=1.5, shrink=0.5):
+        """bounds: {target: (min, max)}, e.g. {"publish": (45, 300), "sampling": (3, 15)}."""
+        self.refs = {k: float(v) for k, v in refs.items() if float(v) > 0}
+        self.bounds = {t: (float(lo), float(hi)) for t, (lo, hi) in bounds.items()}
+        self.low, self.high = float(low), float(high)
+        self.grow, self.shrink = float(grow), float(shrink)
+
+    def _activity(self, final):
+        level = 0.0
+        for key, ref in self.refs.items():
+            s = final.get(key)
+            if not s or s.get("avg") is None:
+                continue
+            spread = s.get("std")
+            if spread is None and s.get("min") is not None:
+                spread = (s["max"] - s["min"]) / 4.0      # range ~ 4 std for a normal window
+            prev = self._prev_avg.get(key)
+            delta = abs(s["avg"] - prev) if prev is not None else 0.0
+            self._prev_avg[key] = s["avg"]
+            level = max(level, max(spread or 0.0, delta) / ref)
+        return level
+
+    def update(self, final, bases):
+        """
+        Feed one finalized window; bases: {target: configured period}.
+        Returns {target: new period}.
+        """
+        self.activity = self._activity(final)
+        if self.activity > self.high:
+            self.scale *= self.shrink
+        elif self.activity < self.low:
+            self.scale *= self.grow
+
+        # Keep scale where it still moves at least one target (no runaway)
+        lo = min(b[0] / bases[t] for t, b in self.bounds.items() if bases.get(t))
+        hi = max(b[1] / bases[t] for t, b in self.bounds.items() if bases.get(t))
+        self.scale = min(max(self.scale, lo), hi)
+
+        return {t: min(max(bases[t] * self.scale, b[0]), b[1])
+                for t, b in self.bounds.items() if bases.get(t)}
@@ -0,0 +1,56 @@
+# utils/backfill.py
+#
+# Container for the backfill topic: many queued messages (JSON text or
+# compact bytes, exactly as they would have gone out on the live topic) in
+# one zlib-compressed blob.
+#
+#     b"BF" | version (1 byte) | zlib( count (u32) | count x [kind (1 byte) | length (u32) | payload] )
+#
+# kind 0 = UTF-8 text (JSON), 1 = bytes (compact codec). Big-endian lengths.
+
+import struct
+import zlib
+
+MAGIC = b"BF"
+VERSION = 1
+
+_KIND_TEXT = 0
+_KIND_BYTES = 1
+_HEAD = struct.Struct(">BI")
+
+
+def is_backfill(blob):
+    return isinstance(blob, (bytes, bytearray)) and blob[:2] == MAGIC
+
+
+def encode_backfill(messages, level=6):
+    """Pack queued messages (str or bytes) into one compressed backfill batch."""
+    body = bytearray(struct.pack(">I", len(messages)))
+    for m in messages:
+        if isinstance(m, (bytes, bytearray)):
+            body += _HEAD.pack(_KIND_BYTES, len(m))
+            body += m
+        else:
+            raw = m.encode("utf-8")
+            body += _HEAD.pack(_KIND_TEXT, len(raw))
+            body += raw
+    return MAGIC + bytes((VERSION,)) + zlib.compress(bytes(body), level)
+
+
+def decode_backfill(blob):
+    """Inverse of encode_backfill: the original messages, oldest first."""
+    if not is_backfill(blob):
+        raise ValueError("not a backfill batch")
+    if blob[2] != VERSION:
+        raise ValueError(f"unsupported backfill version {blob[2]}")
+    body = zlib.decompress(blob[3:])
+    (count,) = struct.unpack_from(">I", body, 0)
+    pos = 4
+    messages = []
+    for _ in range(count):
+        kind, n = _HEAD.unpack_from(body, pos)
+        pos += _HEAD.size
+        raw = body[pos:pos + n]
+        pos += n
+        messages.append(raw.decode("utf-8") if kind == _KIND_TEXT else bytes(raw))
+    return messages
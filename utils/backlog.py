@@ -0,0 +1,214 @@
+# utils/backlog.py
+#
+# Backlog compaction: when the uplink buffer nears its cap (long outage),
+# adjacent queued windows of the same sensor are merged into one wider window
+# instead of letting the oldest ones fall off the end. min/max combine
+# exactly, averages and percentiles are weighted by window length, and air
+# quality is recomputed from the merged gas values. A merged message carries
+# its time bounds next to the data:
+#
+#     {"dataType": "SensorData", "data": [...], "window": {"start": t0, "end": t1, "windows": n},
+#      "seqs": [[epoch, first, last], ...]}
+#
+# and every entry's generatedDate is the window end, as for a normal window.
+# "seqs" lists the sequence numbers folded in, so ingestion does not count
+# them as lost (utils/sequence.py).
+
+import json
+import math
+import re
+
+from .air_quality import gas_to_air_quality_fixed, air_quality_label
+from .compact_codec import build_dictionary, decode_compact, is_compact
+from .payload_builder import ENVELOPE_HEAD, serialize_payload
+from .sequence import add_range, payload_seqs
+
+# sensorIds prefix -> channel (for the nominal window length of unmerged messages)
+CHANNEL_OF_PREFIX = {
+    "temp": "BME680", "hum": "BME680", "press": "BME680", "gas": "BME680",
+    "aq": "BME680", "aq_label": "BME680",
+    "lux": "VEML7700",
+    "sound": "SOUND",
+}
+_FIELD = re.compile(r"^(avg|min|max|p\d+)$")
+_DERIVED = ("aq", "aq_label")      # recomputed from the merged gas values
+MAX_PASSES = 4                     # 10 x 45 s -> 450 s -> 4500 s -> ...
+
+
+def _size(message):
+    if isinstance(message, (bytes, bytearray)):
+        return len(message)
+    return len(message.encode("utf-8"))
+
+
+class BacklogCompactor:
+    """
+    factor: windows merged into one per group (10 x 45 s -> 450 s).
+    high/low: buffer fill (of deque maxlen or DiskQueue max_bytes) at which a
+    compaction starts, and down to which it merges, oldest windows first.
+    periods: {channel: seconds}, the assumed length of the oldest unmerged
+    window of a channel (later ones span the gap to their predecessor).
+    energy: Leq channels (sound burst mode), whose averages are energy means.
+    """
+
+    def __init__(self, sensorIds, factor=10, high=0.9, low=0.6, periods=None, energy=False):
+        self.factor = max(0, int(factor))
+        self.high, self.low = float(high), float(low)
+        self.periods = periods if periods is not None else {}
+        self.energy = {"sound"} if energy else set()
+        self.merged = 0            # windows folded into a wider one, in total
+        self.set_sensor_ids(sensorIds)
+
+    def set_sensor_ids(self, sensorIds):
+        self._dictionary = build_dictionary(sensorIds)
+        self._slots = {}
+        for key, sid in sensorIds.items():
+            prefix, _, field = key.rpartition("_")
+            if sid and prefix in CHANNEL_OF_PREFIX and _FIELD.match(field):
+                self._slots[sid] = (prefix, field)
+
+    # -------- pressure --------
+    @staticmethod
+    def usage(buffer, removed=0, saved=0):
+        """Fill level of the buffer as a fraction of its cap (minus planned removals)."""
+        maxlen = getattr(buffer, "maxlen", None)
+        if maxlen:
+            return (len(buffer) - removed) / maxlen
+        max_bytes = getattr(buffer, "max_bytes", None)
+        if max_bytes:
+            return (buffer.nbytes - saved) / max_bytes
+        return 0.0
+
+    def under_pressure(self, buffer):
+        return self.factor > 1 and self.usage(buffer) >= self.high
+
+    # -------- parsing --------
+    def _parse(self, message):
+        """SensorData message -> (payload, kind, channel), or None if it cannot be merged."""
+        if is_compact(message):
+            payload = decode_compact(message, self._dictionary)
+        elif isinstance(message, str) and message.startswith(ENVELOPE_HEAD):   # plain or already merged
+            payload = json.loads(message)
+        else:
+            return None
+        data = payload.get("data")
+        if not data or payload.get("dataType") != "SensorData":
+            return None
+        slots = [self._slots.get(e.get("sensorId")) for e in data]
+        if None in slots:
+            return None                 # IP/MAC, alive, or sensorIds we cannot interpret
+        kind = tuple(e["sensorId"] for e in data)
+        return payload, kind, CHANNEL_OF_PREFIX[slots[0][0]]
+
+    def _bounds(self, payload, channel, prev_end):
+        window = payload.get("window")
+        if window:
+            return window["start"], window["end"], window["windows"]
+        end = payload["data"][0].get("generatedDate", 0)
+        start = prev_end if prev_end is not None and prev_end < end else end - float(self.periods.get(channel, 0))
+        return start, end, 1
+
+    # -------- merging --------
+    def _merge(self, group):
+        """group: [(payload, start, end, windows)] of one kind -> merged payload."""
+        weights = [max(end - start, 0) for _, start, end, _ in group]
+        if not sum(weights):
+            weights = [1] * len(group)
+        first = group[0][0]["data"]
+        end = max(g[2] for g in group)
+        merged = {}
+        data = []
+        for i, entry in enumerate(first):
+            prefix, field = self._slots[entry["sensorId"]]
+            values = [(g[0]["data"][i]["value"], w) for g, w in zip(group, weights)]
+            values = [(v, w) for v, w in values if isinstance(v, (int, float)) and not isinstance(v, bool)]
+            if prefix in _DERIVED or not values:
+                value = None
+            elif field == "min":
+                value = min(v for v, _ in values)
+            elif field == "max":
+                value = max(v for v, _ in values)
+            else:
+                total = sum(w for _, w in values) or 1
+                if prefix in self.energy and field == "avg":
+                    value = 10.0 * math.log10(sum(w * 10 ** (v / 10.0) for v, w in values) / total)
+                else:
+                    value = sum(v * w for v, w in values) / total
+            merged[(prefix, field)] = value
+            data.append(dict(entry, value=value, generatedDate=end))
+
+        for entry in data:
+            prefix, field = self._slots[entry["sensorId"]]
+            if prefix in _DERIVED:
+                gas = merged.get(("gas", field))
+                score = gas_to_air_quality_fixed(gas) if gas is not None else None
+                if prefix == "aq":
+                    entry["value"] = score
+                else:
+                    entry["value"] = air_quality_label(score) if score is not None else "Unknown"
+
+        out = {"dataType": "SensorData", "data": data,
+               "window": {"start": int(min(g[1] for g in group)), "end": int(end),
+                          "windows": sum(g[3] for g in group)}}
+        seqs = []
+        for payload, _, _, _ in group:
+            for epoch, lo, hi in payload_seqs(payload):
+                add_range(seqs, epoch, lo, hi)
+        if seqs:
+            out["seqs"] = seqs
+        return out
+
+    def _groups(self, buffer, skip):
+        """
+        Yield runs of `factor` same-kind windows as they complete, walking from
+        the oldest message: [(index, message, (payload, start, end, windows))]. Lazy, so a
+        compaction only parses as far into the buffer as it has to.
+        """
+        runs = {}
+        prev_end = {}
+        for index, message in enumerate(buffer):
+            if id(message) in skip:
+                continue
+            try:
+                parsed = self._parse(message)
+            except (ValueError, KeyError, TypeError):
+                parsed = None
+            if parsed is None:
+                continue
+            payload, kind, channel = parsed
+            start, end, windows = self._bounds(payload, channel, prev_end.get(kind))
+            prev_end[kind] = end
+            run = runs.setdefault(kind, [])
+            run.append((index, message, (payload, start, end, windows)))
+            if len(run) == self.factor:
+                yield run
+                runs[kind] = []
+
+    def compact(self, buffer, skip=()):
+        """Merge oldest windows until the buffer is below `low`; returns the messages removed."""
+        removed_total = 0
+        for _ in range(MAX_PASSES):
+            removed = saved = 0
+            replace, delete = {}, []
+            for run in self._groups(buffer, skip):
+                if self.usage(buffer, removed, saved) <= self.low:
+                    break
+                indices = [index for index, _, _ in run]
+                message = serialize_payload(self._merge([g for _, _, g in run]), stamp=False)
+                replace[indices[-1]] = message
+                delete.extend(indices[:-1])
+                removed += len(indices) - 1
+                saved += sum(_size(m) for _, m, _ in run) - _size(message)
+            if not removed:
+                break
+            for index, message in replace.items():
+                buffer[index] = message
+            for index in sorted(delete, reverse=True):
+                del buffer[index]
+            removed_total += removed
+            self.merged += removed + len(replace)
+            if hasattr(buffer, "sync"):
+                buffer.sync()           # disk queue: land the compacted state in one go
+            if self.usage(buffer) <= self.low:
+                break
+        return removed_total
@@ -0,0 +1,69 @@
+# utils/clock.py
+
+import threading
+import time
+
+
+class SystemClock:
+    """Real time; the default everywhere."""
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def time(self):
+        return time.time()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def wait(self, event, timeout=None):
+        """threading.Event.wait, measured on this clock."""
+        return event.wait(timeout)
+
+
+class VirtualClock:
+    """
+    Simulated time for soak runs: nothing really sleeps, time jumps to the
+    end of every sleep/wait. Meant for a single driving thread (see soak.py),
+    so days of node behaviour run in seconds.
+    """
+
+    def __init__(self, start_epoch=1_700_000_000.0):
+        self._now = 0.0
+        self._epoch = float(start_epoch)
+        self._lock = threading.Lock()
+
+    def monotonic(self):
+        return self._now
+
+    def time(self):
+        return self._epoch + self._now
+
+    def advance(self, seconds):
+        if seconds and seconds > 0:
+            with self._lock:
+                self._now += seconds
+
+    def sleep(self, seconds):
+        self.advance(seconds)
+
+    def wait(self, event, timeout=None):
+        if event.is_set():
+            return True
+        if timeout is None:
+            raise RuntimeError("VirtualClock.wait() without timeout would never return")
+        self.advance(timeout)
+        return event.is_set()
+
+
+_clock = SystemClock()
+
+
+def get_clock():
+    return _clock
+
+
+def set_clock(clock):
+    """Install the process-wide clock (call before starting the node)."""
+    global _clock
+    _clock = clock
@@ -0,0 +1,286 @@
+# utils/compact_codec.py
+"""
+Compact binary encoding for SensorData payloads (metered links).
+
+Wire format, version 1:
+
+    b"SB" | version (1 byte) | flags (1 byte) | body        flags bit0 = body is zlib-compressed
+                                                                 flags bit1 = window block follows the entries
+                                                                 flags bit2 = seq block follows (after the window block)
+
+    body:   str nodeId | varint decimals | varint shared generatedDate | varint entry count | entries
+    entry:  varint sensor ref      (k > 0 -> dictionary index k-1, 0 -> literal str follows)
+            byte sensorType code   (index into SENSOR_TYPES, 0xFF -> literal str follows)
+            byte value tag         (low bits: TAG_*, 0x80 = entry has no generatedDate,
+                                    0x40 = own generatedDate varint follows the value)
+            value
+
+    window: varint start | varint end | varint windows      (merged backlog windows, utils/backlog.py)
+    seq:    varint range count | ranges                     (utils/sequence.py)
+    range:  varint epoch | varint first | varint last - first
+
+    str = varint length + utf-8 bytes; ints are zigzag varints. Decoders that
+    predate the window or seq block stop after the entries and simply ignore them.
+
+JSON messages start with "{", so the first byte tells the two formats apart.
+sensorIds are coded by the position of their key in the config["sensorIds"]
+key order (see build_dictionary); the decoder needs the node's sensorIds.
+"""
+
+import math
+import struct
+import zlib
+
+from .sequence import payload_seqs
+
+MAGIC = b"SB"
+VERSION = 1
+FLAG_ZLIB = 0x01
+FLAG_WINDOW = 0x02
+FLAG_SEQ = 0x04
+
+SENSOR_TYPES = ["Temperature", "Humidity", "Pressure", "Gas", "AirQuality", "Message", "Light", "Sound"]
+_TYPE_CODES = {name: i for i, name in enumerate(SENSOR_TYPES)}
+_LITERAL_TYPE = 0xFF
+
+TAG_NULL = 0
+TAG_FIXED = 1      # value * 10**decimals, zigzag varint
+TAG_STR = 2
+TAG_FLOAT = 3      # IEEE754 double, for non-finite values (NaN, inf)
+TAG_BOOL_FALSE = 4
+TAG_BOOL_TRUE = 5
+_NO_DATE = 0x80
+_OWN_DATE = 0x40
+
+
+def build_dictionary(sensorIds):
+    """sensorIds config -> ordered list of sensorId values (index = dictionary code)."""
+    from config import DEFAULTS
+    keys = [k for k in DEFAULTS["sensorIds"] if k in sensorIds]
+    keys += sorted(k for k in sensorIds if k not in DEFAULTS["sensorIds"])
+    return [sensorIds[k] for k in keys]
+
+
+def is_compact(message):
+    return isinstance(message, (bytes, bytearray)) and message[:2] == MAGIC
+
+
+# -------- primitives --------
+def _put_varint(out, n):
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _put_zigzag(out, n):
+    _put_varint(out, (n << 1) if n >= 0 else ((-n << 1) - 1))
+
+
+def _put_str(out, s):
+    b = s.encode("utf-8")
+    _put_varint(out, len(b))
+    out += b
+
+
+def _get_varint(buf, pos):
+    n = shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if not b & 0x80:
+            return n, pos
+        shift += 7
+
+
+def _get_zigzag(buf, pos):
+    n, pos = _get_varint(buf, pos)
+    return ((n >> 1) ^ -(n & 1)), pos
+
+
+def _get_str(buf, pos):
+    n, pos = _get_varint(buf, pos)
+    return bytes(buf[pos:pos + n]).decode("utf-8"), pos + n
+
+
+# -------- encode / decode --------
+def encode_compact(payload, dictionary_index, decimals=2, compress=False, level=6):
+    """
+    payload          : SensorData dict as built in payload_builder
+    dictionary_index : {sensorId value: index}, from build_dictionary()
+    """
+    entries = payload["data"]
+    scale = 10 ** decimals
+    node_id = entries[0]["nodeId"] if entries else ""
+    shared = next((e["generatedDate"] for e in entries if "generatedDate" in e), 0)
+
+    body = bytearray()
+    _put_str(body, node_id)
+    _put_varint(body, decimals)
+    _put_varint(body, shared)
+    _put_varint(body, len(entries))
+
+    for e in entries:
+        ref = dictionary_index.get(e["sensorId"])
+        if ref is None:
+            body.append(0)
+            _put_str(body, e["sensorId"])
+        else:
+            _put_varint(body, ref + 1)
+
+        code = _TYPE_CODES.get(e["sensorType"])
+        if code is None:
+            body.append(_LITERAL_TYPE)
+            _put_str(body, e["sensorType"])
+        else:
+            body.append(code)
+
+        date_bits = 0
+        if "generatedDate" not in e:
+            date_bits = _NO_DATE
+        elif e["generatedDate"] != shared:
+            date_bits = _OWN_DATE
+
+        v = e["value"]
+        if v is None:
+            body.append(TAG_NULL | date_bits)
+        elif isinstance(v, bool):
+            body.append((TAG_BOOL_TRUE if v else TAG_BOOL_FALSE) | date_bits)
+        elif isinstance(v, str):
+            body.append(TAG_STR | date_bits)
+            _put_str(body, v)
+        elif not math.isfinite(v * scale):
+            body.append(TAG_FLOAT | date_bits)      # NaN / inf: no fixed-point form
+            body += struct.pack("<d", v)
+        else:                                       # quantized to `decimals` (lossy by design)
+            body.append(TAG_FIXED | date_bits)
+            _put_zigzag(body, int(round(v * scale)))
+
+        if date_bits == _OWN_DATE:
+            _put_varint(body, e["generatedDate"])
+
+    flags = 0
+    window = payload.get("window")
+    if window:
+        flags |= FLAG_WINDOW
+        for key in ("start", "end", "windows"):
+            _put_varint(body, int(window[key]))
+    seqs = payload_seqs(payload)
+    if seqs:
+        flags |= FLAG_SEQ
+        _put_varint(body, len(seqs))
+        for epoch, first, last in seqs:
+            _put_varint(body, epoch)
+            _put_varint(body, first)
+            _put_varint(body, last - first)
+
+    if compress:
+        packed = zlib.compress(bytes(body), level)
+        if len(packed) < len(body):
+            body, flags = packed, flags | FLAG_ZLIB
+    return MAGIC + bytes((VERSION, flags)) + bytes(body)
+
+
+def peek_compact(message, dictionary):
+    """(shared generatedDate, first sensorId, first sensorType) without decoding the entries."""
+    if not is_compact(message):
+        raise ValueError("not a compact SensorData message")
+    buf = message[4:]
+    if message[3] & FLAG_ZLIB:
+        buf = zlib.decompress(buf)
+    _, pos = _get_str(buf, 0)
+    _, pos = _get_varint(buf, pos)
+    shared, pos = _get_varint(buf, pos)
+    count, pos = _get_varint(buf, pos)
+    if not count:
+        return shared, None, None
+    ref, pos = _get_varint(buf, pos)
+    if ref == 0:
+        sensor_id, pos = _get_str(buf, pos)
+    else:
+        sensor_id = dictionary[ref - 1]
+    code = buf[pos]
+    if code == _LITERAL_TYPE:
+        sensor_type, _ = _get_str(buf, pos + 1)
+    else:
+        sensor_type = SENSOR_TYPES[code]
+    return shared, sensor_id, sensor_type
+
+
+def decode_compact(message, dictionary):
+    """Inverse of encode_compact; dictionary is the list from build_dictionary()."""
+    if not is_compact(message):
+        raise ValueError("not a compact SensorData message")
+    version, flags = message[2], message[3]
+    if version != VERSION:
+        raise ValueError(f"unsupported compact version {version}")
+    buf = message[4:]
+    if flags & FLAG_ZLIB:
+        buf = zlib.decompress(buf)
+
+    node_id, pos = _get_str(buf, 0)
+    decimals, pos = _get_varint(buf, pos)
+    shared, pos = _get_varint(buf, pos)
+    count, pos = _get_varint(buf, pos)
+    scale = 10 ** decimals
+
+    data = []
+    for _ in range(count):
+        ref, pos = _get_varint(buf, pos)
+        if ref == 0:
+            sensor_id, pos = _get_str(buf, pos)
+        else:
+            sensor_id = dictionary[ref - 1]
+
+        code = buf[pos]
+        pos += 1
+        if code == _LITERAL_TYPE:
+            sensor_type, pos = _get_str(buf, pos)
+        else:
+            sensor_type = SENSOR_TYPES[code]
+
+        tag = buf[pos]
+        pos += 1
+        kind = tag & 0x3F
+        if kind == TAG_NULL:
+            value = None
+        elif kind == TAG_FIXED:
+            q, pos = _get_zigzag(buf, pos)
+            value = q / scale
+        elif kind == TAG_STR:
+            value, pos = _get_str(buf, pos)
+        elif kind == TAG_FLOAT:
+            value = struct.unpack_from("<d", buf, pos)[0]
+            pos += 8
+        elif kind in (TAG_BOOL_FALSE, TAG_BOOL_TRUE):
+            value = kind == TAG_BOOL_TRUE
+        else:
+            raise ValueError(f"unknown value tag {tag}")
+
+        entry = {"nodeId": node_id, "sensorType": sensor_type, "sensorId": sensor_id, "value": value}
+        if tag & _OWN_DATE:
+            entry["generatedDate"], pos = _get_varint(buf, pos)
+        elif not tag & _NO_DATE:
+            entry["generatedDate"] = shared
+        data.append(entry)
+
+    payload = {"dataType": "SensorData", "data": data}
+    if flags & FLAG_WINDOW:
+        window = {}
+        for key in ("start", "end", "windows"):
+            window[key], pos = _get_varint(buf, pos)
+        payload["window"] = window
+    if flags & FLAG_SEQ:
+        seqs = []
+        n, pos = _get_varint(buf, pos)
+        for _ in range(n):
+            epoch, pos = _get_varint(buf, pos)
+            first, pos = _get_varint(buf, pos)
+            span, pos = _get_varint(buf, pos)
+            seqs.append([epoch, first, first + span])
+        if len(seqs) == 1 and seqs[0][1] == seqs[0][2] and "window" not in payload:
+            payload["epoch"], payload["seq"] = seqs[0][0], seqs[0][1]
+        else:
+            payload["seqs"] = seqs
+    return payload
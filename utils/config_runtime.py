@@ -0,0 +1,262 @@
+# utils/config_runtime.py
+#
+# Hot-apply of configuration changes: validate a (partial) config against
+# the shape of DEFAULTS, diff it with the live config, merge it in place and
+# call only the appliers of the affected components. A reboot is requested
+# only for keys that are read once at startup (see REBOOT_PATHS).
+
+import os
+from copy import deepcopy
+from fnmatch import fnmatchcase
+
+from config import DEFAULTS
+from . import config_manager
+
+# Sections whose keys are free-form (not all listed in DEFAULTS)
+FREEFORM = {"watchdog", "logging.rate_limits", "simulation.latency", "simulation.fault_rate",
+            "simulation.traces"}
+
+# Dotted path prefixes -> component name (longest prefix wins)
+COMPONENTS = {
+    "intervals": "intervals",
+    "sampling": "sampling",
+    "offsets": "offsets",
+    "sensorIds": "sensorIds",
+    "mqtt.username": "mqtt_auth",
+    "mqtt.password": "mqtt_auth",
+    "mqtt.topic": "mqtt_topic",
+    "metrics": "metrics",
+    "logging": "logging",
+    "deadband": "deadband",
+    "adaptive": "adaptive",
+    "backfill": "backfill",
+}
+
+# Read once at startup: sensors, buses, broker connection, queue backend, identity
+REBOOT_PATHS = ("device", "mqtt.host", "mqtt.port", "mqtt.use_tls", "mqtt.ca_cert",
+                "mqtt.client_cert", "mqtt.client_key", "mqtt.insecure_tls", "mqtt.config_topic",
+                "buffer", "acquisition", "bme680", "sound", "simulation", "quantiles",
+                "payload", "sequence", "watchdog", "logging.paho_debug")
+
+# Must be > 0 (a zero period would spin the scheduler)
+_POSITIVE = ("intervals", "sampling")
+
+# Free-form mappings whose values must be numbers (empty dicts in DEFAULTS)
+NUMERIC_MAPS = ("deadband.*.thresholds",)
+
+# [min, max] period bounds: two positive numbers, min <= max
+BOUNDS = ("adaptive.*.publish", "adaptive.*.sampling")
+
+
+def _any_match(path, patterns):
+    return any(fnmatchcase(path, p) for p in patterns)
+
+
+def _is_number(v):
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+def validate_config(partial, defaults=DEFAULTS, prefix="", strict=True):
+    """
+    Errors (list of str) for keys/types that do not match DEFAULTS; [] if valid.
+    strict=False lets unknown keys through (they are ignored by the node anyway).
+    """
+    errors = []
+    if not isinstance(partial, dict):
+        return [f"{prefix or 'config'}: expected an object"]
+    for key, value in partial.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if path in FREEFORM or prefix in FREEFORM:
+            continue
+        if key not in defaults:
+            if strict:
+                errors.append(f"{path}: unknown key")
+            continue
+        default = defaults[key]
+        if isinstance(default, dict):
+            if not default:             # empty in DEFAULTS: free-form mapping
+                if not isinstance(value, dict):
+                    errors.append(f"{path}: expected an object")
+                elif _any_match(path, NUMERIC_MAPS):
+                    errors.extend(f"{path}.{k}: expected a non-negative number"
+                                  for k, v in value.items() if not _is_number(v) or v < 0)
+                continue
+            errors.extend(validate_config(value, default, path, strict))
+        elif isinstance(default, list):
+            errors.extend(_validate_list(path, value))
+        elif _is_number(default):
+            if not _is_number(value):
+                errors.append(f"{path}: expected a number")
+            elif value < 0 or (path.split(".")[0] in _POSITIVE and value <= 0):
+                errors.append(f"{path}: out of range ({value})")
+        elif default is None or isinstance(value, type(default)):
+            continue
+        else:
+            errors.append(f"{path}: expected {type(default).__name__}")
+    return errors
+
+
+def _validate_list(path, value):
+    if not isinstance(value, list):
+        return [f"{path}: expected a list"]
+    if not all(_is_number(v) for v in value):
+        return [f"{path}: expected a list of numbers"]
+    if _any_match(path, BOUNDS):
+        if len(value) != 2 or value[0] <= 0 or value[0] > value[1]:
+            return [f"{path}: expected [min, max] with 0 < min <= max"]
+    return []
+
+
+def diff_config(live, partial, prefix=""):
+    """Dotted paths whose value in `partial` differs from `live`."""
+    changed = []
+    for key, value in partial.items():
+        path = f"{prefix}.{key}" if prefix else key
+        current = live.get(key) if isinstance(live, dict) else None
+        if isinstance(value, dict) and isinstance(current, dict):
+            changed.extend(diff_config(current, value, path))
+        elif value != current:
+            changed.append(path)
+    return changed
+
+
+def _matches(path, prefix):
+    return path == prefix or path.startswith(prefix + ".")
+
+
+def component_of(path):
+    best = None
+    for prefix, component in COMPONENTS.items():
+        if _matches(path, prefix) and (best is None or len(prefix) > len(best[0])):
+            best = (prefix, component)
+    return best[1] if best else None
+
+
+def needs_reboot(paths):
+    return [p for p in paths if any(_matches(p, r) for r in REBOOT_PATHS) or component_of(p) is None]
+
+
+class _Nested(dict):
+    """Undo record of a nested dict (see record_undo)."""
+
+
+_MISSING = object()
+
+
+def record_undo(live, partial):
+    """What merge_in_place(live, partial) is about to overwrite, for undo_in_place."""
+    undo = {}
+    for key, value in partial.items():
+        current = live.get(key, _MISSING)
+        if isinstance(value, dict) and isinstance(current, dict):
+            undo[key] = _Nested(record_undo(current, value))
+        else:
+            undo[key] = current if current is _MISSING else deepcopy(current)
+    return undo
+
+
+def undo_in_place(live, undo):
+    """Reverse a merge_in_place; nested dicts keep their identity."""
+    for key, old in undo.items():
+        if isinstance(old, _Nested):
+            undo_in_place(live[key], old)
+        elif old is _MISSING:
+            live.pop(key, None)
+        else:
+            live[key] = old
+
+
+def merge_in_place(live, partial):
+    """Deep-merge partial into live without replacing nested dicts (closures keep their refs)."""
+    for key, value in partial.items():
+        if isinstance(value, dict) and isinstance(live.get(key), dict):
+            merge_in_place(live[key], value)
+        else:
+            live[key] = deepcopy(value)
+
+
+class ConfigRuntime:
+    """
+    Owns the live config dict. Appliers are registered per component and
+    called as applier(config, changed_paths) after the merge; they run on
+    whatever thread calls apply() (the main loop, via Scheduler.call_soon).
+    """
+
+    def __init__(self, config, reboot=None):
+        self.config = config
+        self._appliers = {}
+        self._reboot = reboot or (lambda: os.system("sudo reboot"))
+        self._mtime = self._file_mtime()
+
+    def register(self, component, applier):
+        self._appliers.setdefault(component, []).append(applier)
+
+    @staticmethod
+    def _file_mtime():
+        try:
+            return os.path.getmtime(os.path.abspath(config_manager.CONFIG_FILE))
+        except OSError:
+            return None
+
+    def apply(self, partial, persist=True, strict=True):
+        """
+        Validate, diff and hot-apply a partial config.
+        Returns {"changed": [...], "applied": [...], "reboot": [...], "errors": [...]}.
+        """
+        errors = validate_config(partial, strict=strict)
+        result = {"changed": [], "applied": [], "reboot": [], "errors": errors}
+        if result["errors"]:
+            print(f"[CONFIG] Rejected update: {'; '.join(result['errors'])}")
+            return result
+
+        changed = diff_config(self.config, partial)
+        result["changed"] = changed
+        if not changed:
+            return result
+
+        undo = record_undo(self.config, partial)
+        merge_in_place(self.config, partial)
+
+        by_component = {}
+        for path in changed:
+            component = component_of(path)
+            if component is not None:
+                by_component.setdefault(component, []).append(path)
+        self._run_appliers(by_component, result["errors"])
+        if result["errors"]:
+            # Roll back and re-apply the old values; nothing is persisted
+            undo_in_place(self.config, undo)
+            self._run_appliers(by_component, [])
+            print(f"[CONFIG] Update rolled back: {'; '.join(result['errors'])}")
+            return result
+
+        result["reboot"] = needs_reboot(changed)
+        for paths in by_component.values():
+            result["applied"].extend(paths)
+
+        print(f"[CONFIG] Changed: {', '.join(changed)}")
+        if persist:
+            config_manager.save_config(self.config)
+            self._mtime = self._file_mtime()
+        if result["reboot"]:
+            print(f"[CONFIG] Reboot required for: {', '.join(result['reboot'])}")
+            self._reboot()
+        return result
+
+    def _run_appliers(self, by_component, errors):
+        for component, paths in by_component.items():
+            for applier in self._appliers.get(component, ()):
+                try:
+                    applier(self.config, paths)
+                except Exception as e:
+                    errors.append(f"{component}: {e}")
+                    print(f"[CONFIG] Applying {component} failed: {e}")
+
+    def check_file(self):
+        """Apply config.json if it changed on disk (e.g. saved by config_gui)."""
+        mtime = self._file_mtime()
+        if mtime is None or mtime == self._mtime:
+            return None
+        self._mtime = mtime
+        print("[CONFIG] config.json changed on disk; applying")
+        return self.apply(config_manager.load_config(), persist=False, strict=False)
@@ -0,0 +1,51 @@
+# utils/deadband.py
+#
+# Report-by-exception for publish windows: a window is only sent when one of
+# its avg/min/max values moved by at least the channel's threshold since the
+# last *published* window, or when max_silence seconds passed without one.
+
+FIELDS = ("avg", "min", "max")
+
+
+class Deadband:
+    """
+    thresholds: {key: absolute change} for the channel's keys, e.g.
+    {"temperature": 0.2, "humidity": 1.0}. Keys without a threshold are not
+    compared; no thresholds at all means every window is published.
+    """
+
+    def __init__(self, thresholds=None, max_silence=900.0):
+        self.configure(thresholds, max_silence)
+        self.suppressed = 0        # total windows held back
+        self._last = None          # {key: (avg, min, max)} of the last published window
+        self._last_time = None
+
+    def configure(self, thresholds=None, max_silence=900.0):
+        self.thresholds = {k: float(v) for k, v in (thresholds or {}).items()}
+        self.max_silence = float(max_silence)
+
+    def _values(self, final):
+        return {key: tuple(final.get(key, {}).get(f) for f in FIELDS) for key in self.thresholds}
+
+    def _moved(self, values):
+        for key, threshold in self.thresholds.items():
+            for old, new in zip(self._last.get(key, ()), values[key]):
+                if old is None or new is None:
+                    if old is not new:
+                        return True
+                elif abs(new - old) >= threshold:
+                    return True
+        return False
+
+    def should_publish(self, final, now):
+        """True if this finalized window must be sent; records it as the new reference."""
+        if not self.thresholds:
+            return True
+        values = self._values(final)
+        due = self._last is None or now - self._last_time >= self.max_silence
+        if not due and not self._moved(values):
+            self.suppressed += 1
+            return False
+        self._last = values
+        self._last_time = now
+        return True
@@ -0,0 +1,211 @@
+# utils/disk_queue.py
+
+import os
+import sqlite3
+from collections import deque
+
+from .clock import get_clock
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_QUEUE_FILE = os.path.join(BASE_DIR, "..", "uplink_queue.db")  # next to config.json
+
+DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+DEFAULT_COMMIT_EVERY = 50        # pending inserts/deletes before a forced commit
+DEFAULT_COMMIT_INTERVAL = 5.0    # seconds a pending change may wait for its commit
+
+_KIND_TEXT = 0
+_KIND_BYTES = 1
+
+
+class DiskQueue:
+    """
+    Crash-safe uplink queue backed by SQLite (WAL journal).
+
+    Behaves like the collections.deque used by main.py/flush_buffer
+    (append, popleft, [0], [i] = m, del [i], len, iteration), so it is a drop-in
+    replacement. An in-memory mirror serves all reads; disk writes are
+    grouped into one transaction (= one fsync) every `commit_every`
+    changes or `commit_interval` seconds, so the SD card is not written
+    on every sample. A power cut loses at most the last uncommitted group.
+
+    When the stored payloads exceed `max_bytes` the oldest entries are
+    evicted, and counted in `dropped`.
+    """
+
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES,
+                 commit_every=DEFAULT_COMMIT_EVERY, commit_interval=DEFAULT_COMMIT_INTERVAL):
+        self.path = os.path.abspath(path or DEFAULT_QUEUE_FILE)
+        self.max_bytes = int(max_bytes)
+        self.commit_every = max(1, int(commit_every))
+        self.commit_interval = float(commit_interval)
+        self.dropped = 0
+
+        self._ids = deque()        # row ids, in lockstep with _items
+        self._items = deque()      # message objects (str or bytes)
+        self._bytes = 0
+        self._pending_inserts = {}  # id -> message, not yet on disk
+        self._pending_deletes = []  # ids already on disk that must go
+        self._pending_updates = {}  # id -> new message for rows already on disk
+        self._last_commit = get_clock().monotonic()
+
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")   # fsync per (batched) commit
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS queue ("
+            "id INTEGER PRIMARY KEY, kind INTEGER NOT NULL, payload BLOB NOT NULL)"
+        )
+        self._conn.commit()
+        self._load()
+
+    # -------- restart scan --------
+    def _load(self):
+        """Single sequential primary-key scan rebuilds the in-memory mirror."""
+        next_id = 0
+        for row_id, kind, payload in self._conn.execute(
+                "SELECT id, kind, payload FROM queue ORDER BY id"):
+            message = bytes(payload) if kind == _KIND_BYTES else payload.decode("utf-8")
+            self._ids.append(row_id)
+            self._items.append(message)
+            self._bytes += len(payload)
+            next_id = row_id + 1
+        self._next_id = next_id
+        self._enforce_cap()
+        if self._items:
+            print(f"[QUEUE] Restored {len(self._items)} queued messages ({self._bytes}B) from {self.path}")
+
+    # -------- deque-compatible API --------
+    def __len__(self):
+        return len(self._items)
+
+    def __bool__(self):
+        return bool(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def __setitem__(self, index, message):
+        """Replace an entry in place; it keeps its row id (and so its position after a restart)."""
+        row_id = self._ids[index]
+        self._bytes += _size(message) - _size(self._items[index])
+        self._items[index] = message
+        if row_id in self._pending_inserts:
+            self._pending_inserts[row_id] = message
+        else:
+            self._pending_updates[row_id] = message
+        self.maybe_commit()
+
+    def __delitem__(self, index):
+        row_id = self._ids[index]
+        message = self._items[index]
+        del self._ids[index]
+        del self._items[index]
+        self._forget(row_id, message)
+
+    @property
+    def nbytes(self):
+        """Payload bytes currently queued (what max_bytes caps)."""
+        return self._bytes
+
+    def append(self, message):
+        row_id = self._next_id
+        self._next_id += 1
+        self._ids.append(row_id)
+        self._items.append(message)
+        self._bytes += _size(message)
+        self._pending_inserts[row_id] = message
+        self._enforce_cap()
+        self.maybe_commit()
+
+    def popleft(self):
+        if not self._items:
+            raise IndexError("pop from an empty queue")
+        row_id = self._ids.popleft()
+        message = self._items.popleft()
+        self._forget(row_id, message)
+        return message
+
+    def remove(self, message):
+        """Remove the first entry equal to message (deque.remove semantics)."""
+        for i, m in enumerate(self._items):
+            if m is message or m == message:
+                del self[i]
+                return
+        raise ValueError("message not in queue")
+
+    # -------- persistence --------
+    def _forget(self, row_id, message):
+        self._bytes -= _size(message)
+        self._pending_updates.pop(row_id, None)
+        if self._pending_inserts.pop(row_id, None) is None:
+            self._pending_deletes.append(row_id)   # already on disk
+        self.maybe_commit()
+
+    def _enforce_cap(self):
+        while self._bytes > self.max_bytes and len(self._items) > 1:
+            self.popleft()
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 100 == 0:
+                print(f"[QUEUE] Byte cap {self.max_bytes}B reached; dropped {self.dropped} oldest messages so far")
+
+    def maybe_commit(self):
+        """Commit the pending group if it is large or old enough."""
+        pending = len(self._pending_inserts) + len(self._pending_deletes) + len(self._pending_updates)
+        if not pending:
+            return
+        if (pending >= self.commit_every or
+                get_clock().monotonic() - self._last_commit >= self.commit_interval):
+            self.sync()
+
+    def sync(self):
+        """Write all pending changes in one transaction."""
+        inserts = [(row_id,) + _row(m) for row_id, m in self._pending_inserts.items()]
+        updates = [_row(m) + (row_id,) for row_id, m in self._pending_updates.items()]
+        deletes = [(row_id,) for row_id in self._pending_deletes]
+        try:
+            with self._conn:
+                if inserts:
+                    self._conn.executemany("INSERT INTO queue (id, kind, payload) VALUES (?, ?, ?)", inserts)
+                if updates:
+                    self._conn.executemany("UPDATE queue SET kind = ?, payload = ? WHERE id = ?", updates)
+                if deletes:
+                    self._conn.executemany("DELETE FROM queue WHERE id = ?", deletes)
+        except sqlite3.Error as e:
+            print(f"[QUEUE] Commit failed, will retry: {e}")
+            return
+        self._pending_inserts.clear()
+        self._pending_updates.clear()
+        self._pending_deletes.clear()
+        self._last_commit = get_clock().monotonic()
+
+    def close(self):
+        self.sync()
+        self._conn.close()
+
+
+def _size(message):
+    if isinstance(message, (bytes, bytearray)):
+        return len(message)
+    return len(message.encode("utf-8"))
+
+
+def _row(message):
+    """(kind, payload blob) of a message as stored in the queue table."""
+    if isinstance(message, (bytes, bytearray)):
+        return _KIND_BYTES, message
+    return _KIND_TEXT, message.encode("utf-8")
+
+
+def create_buffer(buffer_cfg):
+    """Build the uplink buffer selected by config["buffer"]["backend"]."""
+    if buffer_cfg.get("backend", "memory") == "sqlite":
+        return DiskQueue(
+            path=buffer_cfg.get("path") or None,
+            max_bytes=buffer_cfg.get("max_bytes", DEFAULT_MAX_BYTES),
+            commit_every=buffer_cfg.get("commit_every", DEFAULT_COMMIT_EVERY),
+            commit_interval=buffer_cfg.get("commit_interval", DEFAULT_COMMIT_INTERVAL),
+        )
+    return deque(maxlen=int(buffer_cfg["maxlen"]))
@@ -0,0 +1,137 @@
+# utils/log.py
+#
+# Small logging layer for the hot paths: levels, per-key rate limiting and
+# an in-memory ring of the records that were NOT printed (below the level or
+# rate-limited). The ring is dumped on the next ERROR, or on demand with
+# flush(), so the context before a failure is not lost while day-to-day
+# output stays quiet on SD-card-backed journald.
+#
+#   log.warning("uplink.offline", "Not connected; %d messages buffered", len(buffer))
+#
+# Messages are %-formatted only when printed.
+
+import threading
+import time
+from collections import deque
+
+from .clock import get_clock
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LEVELS = {"DEBUG": DEBUG, "INFO": INFO, "WARNING": WARNING, "ERROR": ERROR}
+_NAMES = {v: k for k, v in LEVELS.items()}
+
+_level = INFO
+_rate_limit = 10.0        # min seconds between printed records with the same key
+_rate_limits = {}         # per-key overrides
+_ring = deque(maxlen=200)
+_last = {}                # key -> clock time of the last printed record
+_suppressed = {}          # key -> records dropped by the rate limit since then
+_lock = threading.Lock()
+
+
+def configure(log_cfg):
+    """Apply config["logging"]."""
+    global _level, _rate_limit, _ring
+    _level = LEVELS.get(str(log_cfg.get("level", "INFO")).upper(), INFO)
+    _rate_limit = float(log_cfg.get("rate_limit", 10.0))
+    _rate_limits.clear()
+    _rate_limits.update({k: float(v) for k, v in log_cfg.get("rate_limits", {}).items()})
+    size = int(log_cfg.get("ring_size", 200))
+    if size != _ring.maxlen:
+        _ring = deque(_ring, maxlen=size)
+
+
+def enabled(level):
+    return level >= _level
+
+
+def should_log(key, level=INFO):
+    """
+    True if a record for `key` would be printed now; claims the slot.
+    For hot paths that only build their (counter) message when it will be shown.
+    """
+    if level < _level:
+        return False
+    now = get_clock().monotonic()
+    with _lock:
+        return _claim(key, now, level)
+
+
+def _claim(key, now, level):
+    if level >= ERROR:
+        interval = 0.0
+    else:
+        interval = _rate_limits.get(key, _rate_limit)
+    last = _last.get(key)
+    if interval and last is not None and now - last < interval:
+        _suppressed[key] = _suppressed.get(key, 0) + 1
+        return False
+    _last[key] = now
+    return True
+
+
+def _format(record):
+    ts, level, key, msg, args = record
+    if args:
+        try:
+            msg = msg % args
+        except Exception:
+            msg = f"{msg} {args!r}"
+    stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
+    return f"{stamp} {_NAMES.get(level, level)} [{key}] {msg}"
+
+
+def _log(level, key, msg, args):
+    clock = get_clock()
+    record = (clock.time(), level, key, msg, args)
+    with _lock:
+        if level < _level or not _claim(key, clock.monotonic(), level):
+            _ring.append(record)
+            return
+        suppressed = _suppressed.pop(key, 0)
+        context = list(_ring) if level >= ERROR else ()
+        if context:
+            _ring.clear()
+    for old in context:
+        print(f"  [ring] {_format(old)}")
+    line = _format(record)
+    if suppressed:
+        line += f" (+{suppressed} similar suppressed)"
+    print(line)
+
+
+def debug(key, msg, *args):
+    _log(DEBUG, key, msg, args)
+
+
+def info(key, msg, *args):
+    _log(INFO, key, msg, args)
+
+
+def warning(key, msg, *args):
+    _log(WARNING, key, msg, args)
+
+
+def error(key, msg, *args):
+    _log(ERROR, key, msg, args)
+
+
+def recent(n=None):
+    """Formatted ring contents, oldest first (without clearing)."""
+    with _lock:
+        records = list(_ring)
+    if n is not None:
+        records = records[-int(n):]
+    return [_format(r) for r in records]
+
+
+def flush(reason="on demand"):
+    """Print and clear the ring; returns how many records were written."""
+    with _lock:
+        records = list(_ring)
+        _ring.clear()
+    if records:
+        print(f"----- log ring ({len(records)} records, {reason}) -----")
+        for record in records:
+            print(f"  [ring] {_format(record)}")
+    return len(records)
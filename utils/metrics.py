@@ -0,0 +1,118 @@
+# utils/metrics.py
+#
+# Node self-instrumentation: fixed-bucket latency histograms per hot-path
+# stage, message age at publish per stream, plus counters and gauges. Everything is module-level and cheap
+# (one bisect and a few integer adds per observation); snapshot() renders
+# and resets it for the periodic NodeMetrics message.
+
+import json
+from bisect import bisect_left
+
+from .clock import get_clock
+
+# Upper bucket bounds in microseconds; one overflow bucket follows the last
+BUCKETS_US = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000, 1000000)
+_BOUNDS_S = tuple(b / 1e6 for b in BUCKETS_US)
+
+STAGES = ("read", "stats", "build", "enqueue", "publish", "ack", "callback")
+
+# Age of a message at publish time (now - generatedDate), per stream, in seconds
+AGE_BUCKETS_S = (1, 2, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 21600, 86400)
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "count", "total", "max")
+
+    def __init__(self, bounds=_BOUNDS_S):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.reset()
+
+    def reset(self):
+        for i in range(len(self.counts)):
+            self.counts[i] = 0
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def as_dict(self, unit="us", scale=1e6):
+        return {
+            "count": self.count,
+            f"sum_{unit}": round(self.total * scale, 1),
+            f"max_{unit}": round(self.max * scale, 1),
+            "counts": list(self.counts),
+        }
+
+
+_histograms = {name: Histogram() for name in STAGES}
+_ages = {}                # stream label -> Histogram(AGE_BUCKETS_S)
+_counters = {}
+_gauges = {}
+_since = None             # clock time of the last snapshot
+
+
+def observe(stage, seconds):
+    """Record one duration (seconds) for a stage."""
+    h = _histograms.get(stage)
+    if h is None:
+        h = _histograms[stage] = Histogram()
+    h.observe(seconds)
+
+
+def observe_age(stream, seconds):
+    """Record the age (seconds since generatedDate) of one message as it is published."""
+    h = _ages.get(stream)
+    if h is None:
+        h = _ages[stream] = Histogram(AGE_BUCKETS_S)
+    h.observe(seconds)
+
+
+def incr(name, n=1):
+    _counters[name] = _counters.get(name, 0) + n
+
+
+def gauge(name, value):
+    _gauges[name] = value
+
+
+def counter(name):
+    return _counters.get(name, 0)
+
+
+def snapshot(reset=True):
+    """Histograms, counters and gauges since the last snapshot."""
+    global _since
+    now = get_clock().monotonic()
+    if _since is None:
+        _since = now
+    out = {
+        "window_s": round(now - _since, 1),
+        "buckets_us": list(BUCKETS_US),
+        "stages": {name: h.as_dict() for name, h in _histograms.items() if h.count},
+        "age_buckets_s": list(AGE_BUCKETS_S),
+        "ages": {name: h.as_dict("s", 1) for name, h in _ages.items() if h.count},
+        "counters": dict(_counters),
+        "gauges": dict(_gauges),
+    }
+    if reset:
+        for h in _histograms.values():
+            h.reset()
+        for h in _ages.values():
+            h.reset()
+        _counters.clear()
+        _since = now
+    return out
+
+
+def build_metrics_payload(nodeId, generatedDate, reset=True):
+    """NodeMetrics message for the metrics topic."""
+    payload = {"dataType": "NodeMetrics", "nodeId": nodeId, "generatedDate": generatedDate}
+    payload.update(snapshot(reset))
+    return json.dumps(payload)
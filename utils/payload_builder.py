@@ -1,13 +1,90 @@
 # utils/payload_builder.py
 
 import json
+import re
+import time
 
 from datetime import datetime, timezone
 
+from .clock import get_clock
+from .compact_codec import build_dictionary, encode_compact, is_compact, peek_compact
+from .sequence import next_seq, add_range
+
+# Selected wire encoding (see configure_encoding); JSON unless config says otherwise
+_encoding = {"format": "json", "compress": False, "decimals": 2, "report": False}
+_dictionary = []
+_dictionary_index = {}
+
 def get_utc_timestamp():
     #return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
     #return datetime.now(timezone.utc).astimezone().isoformat()
-    return int(datetime.now(timezone.utc).timestamp())
+    #return int(datetime.now(timezone.utc).timestamp())
+    return int(get_clock().time())
+
+
+def configure_encoding(payload_cfg, sensorIds):
+    """Select the wire encoding from config["payload"]; JSON stays the default."""
+    global _dictionary, _dictionary_index
+    _encoding["format"] = payload_cfg.get("encoding", "json")
+    _encoding["compress"] = bool(payload_cfg.get("compress", False))
+    _encoding["decimals"] = int(payload_cfg.get("decimals", 2))
+    _encoding["report"] = bool(payload_cfg.get("report_stats", False))
+    _dictionary = build_dictionary(sensorIds)
+    _dictionary_index = {sid: i for i, sid in enumerate(_dictionary)}
+
+
+def serialize_payload(payload, stamp=True):
+    """
+    Encode a SensorData dict with the configured encoding and record size/time.
+    stamp: number the message (boot epoch + seq, see utils/sequence.py).
+    """
+    t0 = time.perf_counter()
+    if stamp:
+        seq = next_seq()
+        if seq is not None:
+            payload["epoch"], payload["seq"] = seq
+    if _encoding["format"] == "compact":
+        out = encode_compact(payload, _dictionary_index,
+                             decimals=_encoding["decimals"], compress=_encoding["compress"])
+    else:
+        out = json.dumps(payload)
+    record_encode(_encoding["format"], out, t0)
+    return out
+
+
+def record_encode(fmt, out, t0):
+    """Report size and encode time (since perf_counter() t0) of one message, if enabled."""
+    if _encoding["report"]:
+        print(f"[PAYLOAD] {fmt}: {len(out)}B, {(time.perf_counter() - t0) * 1e6:.0f}us")
+
+
+def current_encoding():
+    return _encoding["format"]
+
+
+# stats key -> (sensorIds prefix, sensorType) for percentile slots such as "sound_p90"
+QUANTILE_SLOTS = {
+    "temperature": ("temp", "Temperature"),
+    "humidity":    ("hum", "Humidity"),
+    "pressure":    ("press", "Pressure"),
+    "gas":         ("gas", "Gas"),
+    "lux":         ("lux", "Light"),
+    "dB":          ("sound", "Sound"),
+}
+
+
+def quantile_entries(nodeId, stats, sensorIds, gdt):
+    """Entries for every pNN statistic in stats that has a non-empty sensorId slot."""
+    entries = []
+    for key, fields in stats.items():
+        if key not in QUANTILE_SLOTS:
+            continue
+        prefix, sensor_type = QUANTILE_SLOTS[key]
+        for field, value in fields.items():
+            sid = sensorIds.get(f"{prefix}_{field}") if field[0] == "p" else None
+            if sid:
+                entries.append({"nodeId": nodeId, "sensorType": sensor_type, "sensorId": sid, "value": value, "generatedDate": gdt})
+    return entries
 
 
 def build_bme_payload(nodeId, bme_stats, ip, myMac, aq_scores, aq_labels, sensorIds):
@@ -55,7 +132,7 @@ def build_bme_payload(nodeId, bme_stats, ip, myMac, aq_scores, aq_labels, sensor
             # AirQuality numeric
             {"nodeId": nodeId, "sensorType": "AirQuality", "sensorId": s["aq_avg"], "value": aq_scores["avg"], "generatedDate": gdt},
             {"nodeId": nodeId, "sensorType": "AirQuality", "sensorId": s["aq_min"], "value": aq_scores["min"], "generatedDate": gdt},
-            {"nodeId": nodeId, "sensorType": "AirQuality", "sensorId": s["aq_max"], "value": aq_scores["max"]},
+            {"nodeId": nodeId, "sensorType": "AirQuality", "sensorId": s["aq_max"], "value": aq_scores["max"], "generatedDate": gdt},
 
             # AirQuality labels (Message type)
             {"nodeId": nodeId, "sensorType": "Message", "sensorId": s["aq_label_avg"], "value": aq_labels["avg"], "generatedDate": gdt},
@@ -63,7 +140,8 @@ def build_bme_payload(nodeId, bme_stats, ip, myMac, aq_scores, aq_labels, sensor
             {"nodeId": nodeId, "sensorType": "Message", "sensorId": s["aq_label_max"], "value": aq_labels["max"], "generatedDate": gdt},
         ]
     }
-    return json.dumps(payload)
+    payload["data"] += quantile_entries(nodeId, bme_stats, s, gdt)
+    return serialize_payload(payload)
 
 
 def build_veml_payload(nodeId, veml_stats, ip, myMac, sensorIds):
@@ -85,7 +163,8 @@ def build_veml_payload(nodeId, veml_stats, ip, myMac, sensorIds):
             {"nodeId": nodeId, "sensorType": "Light", "sensorId": s["lux_max"], "value": veml_stats["lux"]["max"], "generatedDate": gdt},
         ]
     }
-    return json.dumps(payload)
+    payload["data"] += quantile_entries(nodeId, veml_stats, s, gdt)
+    return serialize_payload(payload)
 
 
 def build_sound_payload(nodeId, sound_stats, ip, myMac, sensorIds):
@@ -106,7 +185,8 @@ def build_sound_payload(nodeId, sound_stats, ip, myMac, sensorIds):
             {"nodeId": nodeId, "sensorType": "Sound", "sensorId": s["sound_max"], "value": sound_stats["dB"]["max"], "generatedDate": gdt},
         ]
     }
-    return json.dumps(payload)
+    payload["data"] += quantile_entries(nodeId, sound_stats, s, gdt)
+    return serialize_payload(payload)
 
 
 def build_IPMAC_payload(nodeId, ip, myMac, sensorIds):
@@ -124,7 +204,7 @@ def build_IPMAC_payload(nodeId, ip, myMac, sensorIds):
             {"nodeId": nodeId, "sensorType": "Message", "sensorId": s["mac_msg"], "value": myMac, "generatedDate": gdt},
         ]
     }
-    return json.dumps(payload)
+    return serialize_payload(payload)
 
 
 def build_IamAlive_payload(nodeId, sensorIds):
@@ -141,4 +221,87 @@ def build_IamAlive_payload(nodeId, sensorIds):
             {"nodeId": nodeId, "sensorType": "Message", "sensorId": s["alive_msg"], "value": "I am Alive", "generatedDate": gdt},
         ]
     }
-    return json.dumps(payload)
+    return serialize_payload(payload)
+
+
+# ---------------------------------------------------------------------------
+# Coalescing: several queued SensorData messages -> one publish
+# ---------------------------------------------------------------------------
+ENVELOPE_HEAD = '{"dataType": "SensorData", "data": ['
+ENVELOPE_TAIL = ']}'
+ENVELOPE_OVERHEAD = len(ENVELOPE_HEAD) + len(ENVELOPE_TAIL)
+_PLAIN_TAIL = "}" + ENVELOPE_TAIL     # last data entry, then the envelope; not "seqs"/"window" endings
+_SEQ_TAIL = re.compile(r'\], "epoch": (\d+), "seq": (\d+)\}$')
+
+
+def _seq_tail(message):
+    """Match of a numbered message's '], "epoch": E, "seq": N}' ending, or None."""
+    return _SEQ_TAIL.search(message, max(0, len(message) - 64))
+
+
+def is_mergeable(message):
+    """True for a SensorData JSON message as produced by the builders above."""
+    return (isinstance(message, str)
+            and message.startswith(ENVELOPE_HEAD)
+            and (message.endswith(_PLAIN_TAIL) or _seq_tail(message) is not None))
+
+
+def merge_payloads(messages):
+    """
+    Concatenate the data arrays of mergeable messages into one envelope.
+    Same bytes as json.dumps of the merged dict, without re-parsing; the
+    messages' sequence numbers move into one "seqs" list of ranges.
+    """
+    if len(messages) == 1:
+        return messages[0]
+    head = len(ENVELOPE_HEAD)
+    parts, ranges = [], []
+    for m in messages:
+        match = _seq_tail(m)
+        if match is None:
+            parts.append(m[head:-len(ENVELOPE_TAIL)])
+        else:
+            parts.append(m[head:match.start()])
+            seq = int(match.group(2))
+            add_range(ranges, int(match.group(1)), seq, seq)
+    out = ENVELOPE_HEAD + ", ".join(parts) + "]"
+    if ranges:
+        out += ', "seqs": ' + json.dumps(ranges)
+    return out + "}"
+
+
+# ---------------------------------------------------------------------------
+# Message metadata for the uplink (drain policies, age at publish)
+# ---------------------------------------------------------------------------
+_DATE_KEY = '"generatedDate": '
+_ID_KEY = '"sensorId": "'
+_TYPE_KEY = '"sensorType": "'
+
+
+def _quoted_after(message, key):
+    start = message.find(key)
+    if start < 0:
+        return None
+    start += len(key)
+    return message[start:message.find('"', start)]
+
+
+def message_info(message):
+    """
+    (generatedDate, sensorId, sensorType) of a queued message's first entry,
+    read without parsing the whole payload; None if it has none.
+    The first sensorId identifies the stream (one per message layout).
+    """
+    try:
+        if is_compact(message):
+            return peek_compact(message, _dictionary)
+        start = message.find(_DATE_KEY)
+        if start < 0:
+            return None
+        start += len(_DATE_KEY)
+        end = start
+        while end < len(message) and message[end] in "0123456789.-":
+            end += 1
+        return float(message[start:end]), _quoted_after(message, _ID_KEY), _quoted_after(message, _TYPE_KEY)
+    except (ValueError, IndexError, TypeError):
+        return None
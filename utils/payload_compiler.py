@@ -0,0 +1,181 @@
+# utils/payload_compiler.py
+
+import json
+import time
+
+from . import payload_builder
+from .payload_builder import get_utc_timestamp, QUANTILE_SLOTS
+from .sequence import next_seq
+
+_encode_str = json.encoder.encode_basestring_ascii
+_float_repr = float.__repr__
+_int_repr = int.__repr__
+
+
+def _json_value(v):
+    """Same text json.dumps would produce for a scalar value."""
+    t = type(v)
+    if t is float:
+        if v != v or v in (float("inf"), float("-inf")):
+            return json.dumps(v)
+        return _float_repr(v)
+    if t is int:
+        return _int_repr(v)
+    if v is None:
+        return "null"
+    if t is str:
+        return _encode_str(v)
+    if t is bool:
+        return "true" if v else "false"
+    return json.dumps(v)
+
+
+# Message layouts: (sensorType, sensorIds key) per entry, in payload order
+BME_LAYOUT = [
+    ("Temperature", "temp_avg"), ("Temperature", "temp_min"), ("Temperature", "temp_max"),
+    ("Humidity", "hum_avg"), ("Humidity", "hum_min"), ("Humidity", "hum_max"),
+    ("Pressure", "press_avg"), ("Pressure", "press_min"), ("Pressure", "press_max"),
+    ("Gas", "gas_avg"), ("Gas", "gas_min"), ("Gas", "gas_max"),
+    ("AirQuality", "aq_avg"), ("AirQuality", "aq_min"), ("AirQuality", "aq_max"),
+    ("Message", "aq_label_avg"), ("Message", "aq_label_min"), ("Message", "aq_label_max"),
+]
+VEML_LAYOUT = [("Light", "lux_avg"), ("Light", "lux_min"), ("Light", "lux_max")]
+SOUND_LAYOUT = [("Sound", "sound_avg"), ("Sound", "sound_min"), ("Sound", "sound_max")]
+IPMAC_LAYOUT = [("Message", "ip_msg"), ("Message", "mac_msg")]
+ALIVE_LAYOUT = [("Message", "alive_msg")]
+
+# Stats keys per channel, in the order the quantile entries follow the base layout
+CHANNEL_KEYS = {
+    "BME680": ["temperature", "humidity", "pressure", "gas"],
+    "VEML7700": ["lux"],
+    "SOUND": ["dB"],
+}
+
+
+def quantile_layout(sensorIds, keys, percentiles):
+    """Layout + (stats key, field) value paths of the provisioned pNN slots."""
+    layout, paths = [], []
+    for key in keys:
+        prefix, sensor_type = QUANTILE_SLOTS[key]
+        for pct in percentiles:
+            slot = f"{prefix}_p{pct}"
+            if sensorIds.get(slot):
+                layout.append((sensor_type, slot))
+                paths.append((key, f"p{pct}"))
+    return layout, paths
+
+
+def compile_template(nodeId, sensorIds, layout):
+    """
+    Pre-serialize everything constant in a SensorData message.
+    Returns a %-format string with two slots per entry: value, generatedDate.
+    """
+    node = json.dumps(nodeId).replace("%", "%%")
+    entries = []
+    for sensor_type, key in layout:
+        sid = json.dumps(sensorIds[key]).replace("%", "%%")
+        st = json.dumps(sensor_type).replace("%", "%%")
+        entries.append(
+            '{"nodeId": ' + node + ', "sensorType": ' + st + ', "sensorId": ' + sid +
+            ', "value": %s, "generatedDate": %s}'
+        )
+    return '{"dataType": "SensorData", "data": [' + ", ".join(entries) + "]}"
+
+
+def _emit(template, values):
+    """Fill a compiled template: JSON-encoded values interleaved with one shared timestamp, then the sequence number."""
+    t0 = time.perf_counter()
+    gdt = str(get_utc_timestamp())
+    args = []
+    for v in values:
+        args.append(_json_value(v))
+        args.append(gdt)
+    out = template % tuple(args)
+    seq = next_seq()
+    if seq is not None:
+        out = out[:-1] + ', "epoch": %d, "seq": %d}' % seq
+    payload_builder.record_encode("json", out, t0)
+    return out
+
+
+class PayloadCompiler:
+    """
+    Byte-for-byte equivalent of the payload_builder functions, with the
+    nodeId/sensorType/sensorId parts serialized once per config.
+    Falls back to the builders when a non-JSON encoding is selected.
+    """
+
+    def __init__(self, nodeId, sensorIds, quantiles=None):
+        self.compile(nodeId, sensorIds, quantiles)
+
+    @staticmethod
+    def _identity(nodeId, sensorIds, quantiles):
+        return (nodeId, tuple(sorted(sensorIds.items())),
+                tuple(sorted((k, tuple(v)) for k, v in (quantiles or {}).items())))
+
+    def compile(self, nodeId, sensorIds, quantiles=None):
+        """(Re)build the templates, e.g. after nodeId, sensorIds or quantiles changed."""
+        quantiles = quantiles or {}
+        self.nodeId = nodeId
+        self.sensorIds = sensorIds
+        self._key = self._identity(nodeId, sensorIds, quantiles)
+
+        bme_q, self._bme_q = quantile_layout(sensorIds, CHANNEL_KEYS["BME680"], quantiles.get("BME680", []))
+        veml_q, self._veml_q = quantile_layout(sensorIds, CHANNEL_KEYS["VEML7700"], quantiles.get("VEML7700", []))
+        sound_q, self._sound_q = quantile_layout(sensorIds, CHANNEL_KEYS["SOUND"], quantiles.get("SOUND", []))
+
+        self._bme = compile_template(nodeId, sensorIds, BME_LAYOUT + bme_q)
+        self._veml = compile_template(nodeId, sensorIds, VEML_LAYOUT + veml_q)
+        self._sound = compile_template(nodeId, sensorIds, SOUND_LAYOUT + sound_q)
+        self._ipmac = compile_template(nodeId, sensorIds, IPMAC_LAYOUT)
+        self._alive = compile_template(nodeId, sensorIds, ALIVE_LAYOUT)
+
+    def refresh(self, nodeId, sensorIds, quantiles=None):
+        """Recompile only if the identity mapping actually changed."""
+        if self._identity(nodeId, sensorIds, quantiles) != self._key:
+            self.compile(nodeId, sensorIds, quantiles)
+
+    @staticmethod
+    def _json():
+        return payload_builder.current_encoding() == "json"
+
+    def bme(self, bme_stats, ip, myMac, aq_scores, aq_labels):
+        if not self._json():
+            return payload_builder.build_bme_payload(
+                self.nodeId, bme_stats, ip, myMac, aq_scores, aq_labels, self.sensorIds)
+        t, h = bme_stats["temperature"], bme_stats["humidity"]
+        p, g = bme_stats["pressure"], bme_stats["gas"]
+        values = (
+            t["avg"], t["min"], t["max"],
+            h["avg"], h["min"], h["max"],
+            p["avg"], p["min"], p["max"],
+            g["avg"], g["min"], g["max"],
+            aq_scores["avg"], aq_scores["min"], aq_scores["max"],
+            aq_labels["avg"], aq_labels["min"], aq_labels["max"],
+        ) + tuple(bme_stats[k][f] for k, f in self._bme_q)
+        return _emit(self._bme, values)
+
+    def _stat_message(self, template, quantile_paths, builder, stats, key, ip, myMac):
+        if not self._json():
+            return builder(self.nodeId, stats, ip, myMac, self.sensorIds)
+        s = stats[key]
+        values = (s["avg"], s["min"], s["max"]) + tuple(stats[k][f] for k, f in quantile_paths)
+        return _emit(template, values)
+
+    def veml(self, veml_stats, ip, myMac):
+        return self._stat_message(self._veml, self._veml_q, payload_builder.build_veml_payload,
+                                  veml_stats, "lux", ip, myMac)
+
+    def sound(self, sound_stats, ip, myMac):
+        return self._stat_message(self._sound, self._sound_q, payload_builder.build_sound_payload,
+                                  sound_stats, "dB", ip, myMac)
+
+    def ipmac(self, ip, myMac):
+        if not self._json():
+            return payload_builder.build_IPMAC_payload(self.nodeId, ip, myMac, self.sensorIds)
+        return _emit(self._ipmac, (ip, myMac))
+
+    def alive(self):
+        if not self._json():
+            return payload_builder.build_IamAlive_payload(self.nodeId, self.sensorIds)
+        return _emit(self._alive, ("I am Alive",))
@@ -0,0 +1,129 @@
+# utils/scheduler.py
+
+import heapq
+import threading
+
+from .clock import get_clock
+
+
+class _Task:
+    __slots__ = ("name", "interval", "callback", "deadline", "version")
+
+    def __init__(self, name, interval, callback, deadline):
+        self.name = name
+        self.interval = interval
+        self.callback = callback
+        self.deadline = deadline
+        self.version = 0
+
+
+class Scheduler:
+    """
+    Periodic tasks on a heap of next-deadlines.
+
+    The main thread sleeps exactly until the earliest deadline; trigger()
+    and wake() (safe from any thread, e.g. paho callbacks) cut the sleep
+    short. Heap entries are invalidated lazily through a per-task version.
+    """
+
+    def __init__(self, clock=None):
+        self._clock = clock or get_clock()
+        self._tasks = {}
+        self._heap = []            # (deadline, seq, name, version)
+        self._seq = 0
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._triggered = set()    # names to run ASAP, filled from other threads
+        self._calls = []           # one-shot callables queued by call_soon()
+
+    def add(self, name, interval, callback, delay=0.0):
+        """Run callback every `interval` seconds, first after `delay` seconds."""
+        task = _Task(name, float(interval), callback, self._clock.monotonic() + delay)
+        self._tasks[name] = task
+        self._push(task)
+
+    def set_interval(self, name, interval):
+        """Change a task's period; the next run is re-planned from its last run."""
+        task = self._tasks[name]
+        interval = float(interval)
+        if interval == task.interval:
+            return
+        last_run = task.deadline - task.interval
+        task.interval = interval
+        task.deadline = max(last_run + interval, self._clock.monotonic())
+        self._push(task)
+
+    def remove(self, name):
+        """Stop a task (its heap entries become stale)."""
+        self._tasks.pop(name, None)
+
+    def has(self, name):
+        return name in self._tasks
+
+    def interval(self, name):
+        return self._tasks[name].interval
+
+    def trigger(self, name):
+        """Run the task as soon as possible (thread-safe)."""
+        with self._lock:
+            self._triggered.add(name)
+        self._wake.set()
+
+    def call_soon(self, callback):
+        """Run callback once on the scheduler thread, as soon as possible (thread-safe)."""
+        with self._lock:
+            self._calls.append(callback)
+        self._wake.set()
+
+    def wake(self):
+        """Interrupt the current sleep (thread-safe)."""
+        self._wake.set()
+
+    def _push(self, task):
+        task.version += 1
+        self._seq += 1
+        heapq.heappush(self._heap, (task.deadline, self._seq, task.name, task.version))
+
+    def _apply_triggers(self, now):
+        with self._lock:
+            names, self._triggered = self._triggered, set()
+            calls, self._calls = self._calls, []
+        for callback in calls:
+            callback()
+        for name in names:
+            task = self._tasks.get(name)
+            if task is not None and task.deadline > now:
+                task.deadline = now
+                self._push(task)
+
+    def run_pending(self):
+        """Run every task whose deadline has passed; return seconds until the next one."""
+        now = self._clock.monotonic()
+        self._apply_triggers(now)
+        while self._heap:
+            deadline, _, name, version = self._heap[0]
+            task = self._tasks.get(name)
+            if task is None or version != task.version:
+                heapq.heappop(self._heap)   # stale entry
+                continue
+            if deadline > now:
+                return deadline - now
+            heapq.heappop(self._heap)
+            task.callback()
+            now = self._clock.monotonic()
+            task.deadline = deadline + task.interval
+            if task.deadline <= now:        # fell behind: don't burst to catch up
+                task.deadline = now + task.interval
+            self._push(task)
+        return None
+
+    def run_forever(self, until=None):
+        """Run tasks until `until` (clock monotonic seconds), or forever if None."""
+        clock = self._clock
+        while until is None or clock.monotonic() < until:
+            self._wake.clear()
+            timeout = self.run_pending()
+            if until is not None:
+                remaining = until - clock.monotonic()
+                timeout = remaining if timeout is None else min(timeout, remaining)
+            clock.wait(self._wake, timeout)
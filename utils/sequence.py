@@ -0,0 +1,236 @@
+# utils/sequence.py
+#
+# Message identity for idempotent ingestion: every SensorData message
+# carries (epoch, seq). The boot epoch is a counter persisted on disk and
+# bumped once per start; seq counts messages from 0 within the epoch, so
+# (nodeId, epoch, seq) is unique and ordered across restarts without writing
+# to the SD card per message.
+#
+# Wire form (see payload_builder / compact_codec):
+#   single message        ..."data": [...], "epoch": 7, "seq": 1234}
+#   batch / merged window ..."data": [...], "seqs": [[7, 1230, 1239], [8, 0, 3]]}   (inclusive ranges)
+#
+# SequenceTracker is the ingestion-side companion: duplicates and gaps in
+# O(1) per sequence number, with a fixed-size window per (node, epoch).
+#
+#   python -m utils.sequence captured.jsonl    (one decoded payload per line)
+
+import json
+import os
+import sys
+
+from .clock import get_clock
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_EPOCH_FILE = os.path.join(BASE_DIR, "..", "boot_epoch")   # next to config.json
+
+_state = {"epoch": None, "seq": 0}     # epoch None -> messages are not numbered
+
+
+# -------- node side --------
+def start_epoch(path=None):
+    """Bump and persist the boot epoch; numbering restarts at 0. Returns the new epoch."""
+    path = os.path.abspath(path or DEFAULT_EPOCH_FILE)
+    try:
+        with open(path) as f:
+            epoch = int(f.read().strip() or 0) + 1
+    except FileNotFoundError:
+        epoch = 1
+    except (OSError, ValueError) as e:
+        print(f"?? Boot epoch file {path} unreadable ({e}); starting from the clock")
+        epoch = int(get_clock().time())
+    try:
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(str(epoch))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except OSError as e:
+        # Still unique if the clock is sane; the next boot reads the old file again
+        print(f"?? Could not persist boot epoch to {path}: {e}")
+        epoch = max(epoch, int(get_clock().time()))
+    _state["epoch"] = epoch
+    _state["seq"] = 0
+    print(f"[SEQ] Boot epoch {epoch}")
+    return epoch
+
+
+def configure_sequence(seq_cfg):
+    """config["sequence"]: start numbering (new boot epoch) or switch it off."""
+    if seq_cfg.get("enabled", True):
+        return start_epoch(seq_cfg.get("path") or None)
+    _state["epoch"] = None
+    return None
+
+
+def next_seq():
+    """(epoch, seq) for the next message, or None when numbering is off."""
+    if _state["epoch"] is None:
+        return None
+    seq = _state["seq"]
+    _state["seq"] = seq + 1
+    return _state["epoch"], seq
+
+
+def add_range(ranges, epoch, first, last):
+    """Append an inclusive [epoch, first, last] range, extending the previous one when contiguous."""
+    if ranges and ranges[-1][0] == epoch and ranges[-1][2] + 1 == first:
+        ranges[-1][2] = last
+    else:
+        ranges.append([epoch, first, last])
+    return ranges
+
+
+def payload_seqs(payload):
+    """[[epoch, first, last], ...] carried by a decoded payload (single or batch form)."""
+    if "seqs" in payload:
+        return [list(r) for r in payload["seqs"]]
+    if "seq" in payload and "epoch" in payload:
+        return [[payload["epoch"], payload["seq"], payload["seq"]]]
+    return []
+
+
+# -------- ingestion side --------
+class _Window:
+    """Seen-bitmap over the last `size` sequence numbers of one (node, epoch)."""
+
+    __slots__ = ("size", "seen", "high", "low", "missing", "lost")
+
+    def __init__(self, size):
+        self.size = size
+        self.seen = bytearray(size)
+        self.high = -1         # highest seq seen
+        self.low = 0           # lowest seq still inside the window
+        self.missing = 0       # unseen numbers in [low, high]
+        self.lost = 0          # unseen numbers that slid out of the window
+
+
+class SequenceTracker:
+    """
+    observe(node, epoch, seq) -> "new", "late" (fills a gap), "duplicate" or
+    "stale" (older than the window, or from an epoch older than every tracked
+    one; cannot be told apart, treat as duplicate).
+
+    Per (node, epoch) a ring of `window` flags is kept, so each number costs
+    O(1) amortized (advancing the head clears each slot once). Gaps still open
+    are `missing`; gaps that left the window are `lost`. Only the newest
+    `epochs` epochs per node are kept: messages of a node's previous boot may
+    still arrive from its disk queue after it restarted.
+    """
+
+    def __init__(self, window=65536, epochs=4):
+        self.window = int(window)
+        self.epochs = int(epochs)
+        self._streams = {}     # node -> {epoch: _Window}
+        self.received = 0
+        self.duplicates = 0
+
+    def _stream(self, node, epoch):
+        """Window of (node, epoch), or None for an epoch older than every tracked one."""
+        epochs = self._streams.setdefault(node, {})
+        w = epochs.get(epoch)
+        if w is None:
+            if len(epochs) >= self.epochs:
+                oldest = min(epochs)
+                if epoch < oldest:
+                    return None         # would be evicted straight away
+                del epochs[oldest]
+            w = epochs[epoch] = _Window(self.window)
+        return w
+
+    def observe(self, node, epoch, seq):
+        w = self._stream(node, epoch)
+        if w is None:
+            self.duplicates += 1
+            return "stale"
+        if seq > w.high:
+            self._advance(w, seq)
+            self.received += 1
+            return "new"
+        if seq < w.low:
+            self.duplicates += 1
+            return "stale"
+        slot = seq % w.size
+        if w.seen[slot]:
+            self.duplicates += 1
+            return "duplicate"
+        w.seen[slot] = 1
+        w.missing -= 1
+        self.received += 1
+        return "late"
+
+    @staticmethod
+    def _advance(w, seq):
+        """Move the head to seq; every number enters and leaves the window once."""
+        size = w.size
+        low = max(w.low, seq - size + 1)
+        for n in range(w.low, min(low, w.high + 1)):      # leaving the window unseen -> lost
+            if not w.seen[n % size]:
+                w.missing -= 1
+                w.lost += 1
+        if low > w.high + 1:                               # skipped past without ever entering
+            w.lost += low - (w.high + 1)
+        for n in range(max(w.high + 1, low), seq):         # gap behind the new head
+            w.seen[n % size] = 0
+            w.missing += 1
+        w.seen[seq % size] = 1
+        w.low = low
+        w.high = seq
+
+    def observe_payload(self, payload):
+        """Every sequence number a decoded SensorData payload carries -> {status: count}."""
+        data = payload.get("data") or [{}]
+        node = data[0].get("nodeId")
+        counts = {}
+        for epoch, first, last in payload_seqs(payload):
+            for seq in range(first, last + 1):
+                status = self.observe(node, epoch, seq)
+                counts[status] = counts.get(status, 0) + 1
+        return counts
+
+    def gaps(self, node, epoch):
+        """Inclusive [first, last] ranges still missing inside the window."""
+        w = self._streams.get(node, {}).get(epoch)
+        if w is None:
+            return []
+        ranges = []
+        for n in range(w.low, w.high + 1):
+            if not w.seen[n % w.size]:
+                if ranges and ranges[-1][1] == n - 1:
+                    ranges[-1][1] = n
+                else:
+                    ranges.append([n, n])
+        return ranges
+
+    def report(self):
+        """{node: {epoch: {"high", "missing", "lost"}}} plus totals."""
+        nodes = {}
+        for node, epochs in self._streams.items():
+            nodes[node] = {e: {"high": w.high, "missing": w.missing, "lost": w.lost}
+                           for e, w in sorted(epochs.items())}
+        return {"received": self.received, "duplicates": self.duplicates, "nodes": nodes}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("usage: python -m utils.sequence captured.jsonl [...]")
+        return 2
+    tracker = SequenceTracker()
+    for path in argv:
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    tracker.observe_payload(json.loads(line))
+    report = tracker.report()
+    for node, epochs in report["nodes"].items():
+        for epoch in epochs:
+            epochs[epoch]["gaps"] = tracker.gaps(node, epoch)[:20]
+    print(json.dumps(report, indent=2, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
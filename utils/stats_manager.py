@@ -1,8 +1,95 @@
 # utils/stats_manager.py
 
-def init_stats(keys):
-    """Initialize stats accumulator for given keys."""
-    return {k: {"sum": 0.0, "count": 0, "min": float("inf"), "max": float("-inf")} for k in keys}
+import math
+
+
+class P2Quantile:
+    """
+    Streaming quantile estimate in constant memory (P² algorithm, Jain & Chlamtac 1985).
+    Keeps five markers instead of the samples; exact until five samples are seen.
+    """
+
+    __slots__ = ("p", "n", "q", "np", "dn", "count")
+
+    def __init__(self, p):
+        self.p = p
+        self.q = []                                   # marker heights
+        self.n = [0, 1, 2, 3, 4]                      # marker positions
+        self.np = [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0]  # desired positions
+        self.dn = [0.0, p / 2, p, (1 + p) / 2, 1.0]    # desired position increments
+        self.count = 0
+
+    def reset(self):
+        """Start a new window, reusing the marker lists."""
+        p = self.p
+        self.q.clear()
+        self.n[:] = (0, 1, 2, 3, 4)
+        self.np[:] = (0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0)
+        self.count = 0
+
+    def add(self, x):
+        self.count += 1
+        q = self.q
+        if self.count <= 5:
+            q.append(x)
+            if self.count == 5:
+                q.sort()
+            return
+
+        n = self.n
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        np_, dn = self.np, self.dn
+        for i in range(5):
+            np_[i] += dn[i]
+
+        # Adjust the three middle markers
+        for i in (1, 2, 3):
+            d = np_[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                qp = self._parabolic(i, d)
+                if not q[i - 1] < qp < q[i + 1]:
+                    qp = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = qp
+                n[i] += d
+
+    def _parabolic(self, i, d):
+        q, n = self.q, self.n
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+            (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def value(self):
+        if self.count == 0:
+            return None
+        if self.count <= 5:
+            s = sorted(self.q)
+            return s[max(0, math.ceil(self.p * len(s)) - 1)]
+        return self.q[2]
+
+
+def init_stats(keys, quantiles=None):
+    """
+    Initialize stats accumulator for given keys.
+    quantiles: optional list of percentiles (e.g. [10, 50, 90]) tracked for every key.
+    """
+    stats = {k: {"sum": 0.0, "count": 0, "min": float("inf"), "max": float("-inf")} for k in keys}
+    if quantiles:
+        for k in keys:
+            stats[k]["q"] = {pct: P2Quantile(pct / 100.0) for pct in quantiles}
+    return stats
 
 def update_stats(stats, values):
     """Update stats accumulator with new values."""
@@ -15,9 +102,12 @@ def update_stats(stats, values):
             stats[k]["min"] = v
         if v > stats[k]["max"]:
             stats[k]["max"] = v
+        if "q" in stats[k]:
+            for est in stats[k]["q"].values():
+                est.add(v)
 
 def finalize_stats(stats):
-    """Compute avg, min, max from accumulated stats."""
+    """Compute avg, min, max (and pNN for tracked quantiles) from accumulated stats."""
     out = {}
     for k, s in stats.items():
         if s["count"] > 0:
@@ -29,4 +119,113 @@ def finalize_stats(stats):
             }
         else:
             out[k] = {"avg": None, "min": None, "max": None}
+        for pct, est in s.get("q", {}).items():
+            v = est.value()
+            out[k][f"p{pct}"] = round(v, 2) if v is not None else None
     return out
+
+
+class StatsAccumulator:
+    """
+    Per-window statistics for a fixed set of keys, without per-window allocation.
+
+    Same avg/min/max (+ pNN) output as finalize_stats, plus Welford running
+    mean/variance: finalize() also reports "std" and "count". Values live in
+    preallocated lists indexed by key position (faster than array.array for
+    scalar access in CPython); reset() clears them in place.
+    """
+
+    __slots__ = ("keys", "_index", "count", "mean", "m2", "min", "max", "sketches")
+
+    def __init__(self, keys, quantiles=None):
+        self.keys = tuple(keys)
+        self._index = {k: i for i, k in enumerate(self.keys)}
+        n = len(self.keys)
+        self.count = [0] * n
+        self.mean = [0.0] * n
+        self.m2 = [0.0] * n
+        self.min = [math.inf] * n
+        self.max = [-math.inf] * n
+        self.sketches = [
+            {pct: P2Quantile(pct / 100.0) for pct in quantiles} if quantiles else None
+            for _ in self.keys
+        ]
+
+    def reset(self):
+        for i in range(len(self.keys)):
+            self.count[i] = 0
+            self.mean[i] = 0.0
+            self.m2[i] = 0.0
+            self.min[i] = math.inf
+            self.max[i] = -math.inf
+            if self.sketches[i]:
+                for est in self.sketches[i].values():
+                    est.reset()
+
+    def update(self, values):
+        """Add one sample per key (same input as update_stats); unknown keys are ignored."""
+        index = self._index
+        count, mean, m2, lo, hi, sketches = self.count, self.mean, self.m2, self.min, self.max, self.sketches
+        for k, v in values.items():
+            i = index.get(k)
+            if i is None:
+                continue
+            c = count[i] + 1
+            count[i] = c
+            m = mean[i]
+            d = v - m
+            m += d / c
+            mean[i] = m
+            m2[i] += d * (v - m)
+            if v < lo[i]:
+                lo[i] = v
+            if v > hi[i]:
+                hi[i] = v
+            if sketches[i]:
+                for est in sketches[i].values():
+                    est.add(v)
+
+    def update_many(self, key, samples):
+        """Add a batch of samples for one key (Chan et al. parallel variance merge)."""
+        i = self._index[key]
+        n = len(samples)
+        if n == 0:
+            return
+        b_mean = math.fsum(samples) / n
+        b_m2 = math.fsum((x - b_mean) * (x - b_mean) for x in samples)
+        c = self.count[i]
+        total = c + n
+        d = b_mean - self.mean[i]
+        self.mean[i] += d * n / total
+        self.m2[i] += b_m2 + d * d * c * n / total
+        self.count[i] = total
+        lo, hi = min(samples), max(samples)
+        if lo < self.min[i]:
+            self.min[i] = lo
+        if hi > self.max[i]:
+            self.max[i] = hi
+        if self.sketches[i]:
+            for est in self.sketches[i].values():
+                for x in samples:
+                    est.add(x)
+
+    def finalize(self):
+        """Same shape as finalize_stats, plus "std" (sample stddev) and "count"."""
+        out = {}
+        for i, k in enumerate(self.keys):
+            c = self.count[i]
+            if c > 0:
+                out[k] = {
+                    "avg": round(self.mean[i], 2),
+                    "min": round(self.min[i], 2),
+                    "max": round(self.max[i], 2),
+                    "std": round(math.sqrt(self.m2[i] / (c - 1)), 2) if c > 1 else 0.0,
+                    "count": c,
+                }
+            else:
+                out[k] = {"avg": None, "min": None, "max": None, "std": None, "count": 0}
+            if self.sketches[i]:
+                for pct, est in self.sketches[i].items():
+                    v = est.value()
+                    out[k][f"p{pct}"] = round(v, 2) if v is not None else None
+        return out